@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+current_detection.py
+
+Description:
+Overcurrent detection for current_monitor.py, working on windows of samples
+instead of single raw readings:
+
+- Filtering (median or EWMA) so a single I2C glitch neither starts nor resets
+  the shutdown timer.
+- I²t thermal accumulation: heat builds while current is above the motor's
+  rated continuous current and bleeds off below it.
+- Stall prediction: the slope of the filtered current over a short window is
+  used to estimate when the threshold will be crossed, so a slowly rising
+  stall is flagged before it gets there.
+
+OvercurrentDetector is the incremental O(1)-per-sample version used live by
+the monitor. detect() computes the same signals over whole NumPy arrays and
+backs the replay mode, which runs telemetry dumps (current_telemetry.py)
+thousands of times faster than real time so thresholds can be tuned offline.
+
+Usage:
+python3 current_detection.py logs/telemetry/current_20260301_101500.bin --max-current 2.5
+python3 current_detection.py trip.bin --max-current 2.0 2.5 3.0 --delay 0.5 1.0 --filter ewma --alpha 0.1
+
+Dependencies:
+- numpy (replay / batch detection only)
+"""
+
+import sys
+import time
+import argparse
+import itertools
+from bisect import insort
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# --- CONFIGURATION ---
+DEFAULT_FILTER = "median"
+MEDIAN_WINDOW = 5          # Samples. Odd, so one glitch can never be the median.
+EWMA_ALPHA = 0.2
+RATED_FRACTION = 0.8       # Rated continuous current as a fraction of max. <--- CONFIRM WITH EE
+I2T_BUDGET_S = 5.0         # Seconds at max current before the thermal trip. <--- CONFIRM WITH EE
+SLOPE_WINDOW = 50          # Samples used for the stall slope estimate.
+STALL_HORIZON_S = 0.5      # Warn if the threshold will be crossed within this time.
+FILTERS = ("none", "median", "ewma")
+EWMA_CHUNK_RANGE = 20.0    # Max exponent per chunk in the vectorized EWMA (keeps b**-k finite).
+
+
+class DetectorConfig:
+    """Thresholds and filter settings shared by the live and batch detectors."""
+    def __init__(self, max_current, shutdown_delay_s, filter=DEFAULT_FILTER, median_window=MEDIAN_WINDOW,
+                 ewma_alpha=EWMA_ALPHA, rated_current=None, i2t_budget_s=I2T_BUDGET_S,
+                 slope_window=SLOPE_WINDOW, stall_horizon_s=STALL_HORIZON_S):
+        if filter not in FILTERS:
+            raise ValueError(f"filter must be one of {FILTERS}, got {filter!r}")
+        if not 0 < ewma_alpha <= 1:
+            raise ValueError("ewma_alpha must be in (0, 1]")
+        self.max_current = max_current
+        self.shutdown_delay_s = shutdown_delay_s
+        self.filter = filter
+        self.median_window = max(1, median_window)
+        self.ewma_alpha = ewma_alpha
+        self.rated_current = max_current * RATED_FRACTION if rated_current is None else rated_current
+        # Heat (A²s above rated) that running at max_current accrues in i2t_budget_s.
+        self.i2t_limit = (max_current ** 2 - self.rated_current ** 2) * i2t_budget_s if i2t_budget_s else None
+        self.half_window = max(1, slope_window // 2)
+        self.stall_horizon_s = stall_horizon_s
+
+    def describe(self):
+        window = {"median": f" ({self.median_window})", "ewma": f" (alpha {self.ewma_alpha})"}.get(self.filter, "")
+        i2t = f"{self.i2t_limit:.1f} A²s" if self.i2t_limit else "off"
+        return (f"filter {self.filter}{window} | rated {self.rated_current:.2f} A | I²t limit {i2t} | "
+                f"stall horizon {self.stall_horizon_s} s over {2 * self.half_window} samples")
+
+
+class OvercurrentDetector:
+    """
+    Incremental detector. update() returns None or one (kind, detail) event:
+    "TRIP" (detail "sustained" or "i2t"), "OVER" (shutdown timer started),
+    "CLEAR" (timer reset) or "STALL" (threshold crossing predicted).
+    """
+    def __init__(self, config):
+        self.config = config
+        self.filtered = None
+        self.heat = 0.0
+        self.slope = 0.0
+        self.over_since = None
+        self.stall_warned = False
+        self._last_t = None
+        self._median = deque(maxlen=config.median_window)
+        self._sorted = []
+        # Two-half window for the slope: running sums of t and y per half.
+        self._window = deque()
+        self._sums = [0.0, 0.0, 0.0, 0.0]  # first-half t, first-half y, second-half t, second-half y
+
+    def _filter(self, current_a):
+        c = self.config
+        if c.filter == "median":
+            if len(self._median) == self._median.maxlen:
+                self._sorted.remove(self._median[0])
+            self._median.append(current_a)
+            insort(self._sorted, current_a)
+            n = len(self._sorted)
+            mid = n // 2
+            return self._sorted[mid] if n % 2 else (self._sorted[mid - 1] + self._sorted[mid]) / 2
+        if c.filter == "ewma" and self.filtered is not None:
+            return c.ewma_alpha * current_a + (1 - c.ewma_alpha) * self.filtered
+        return current_a
+
+    def _update_slope(self, t, y):
+        h = self.config.half_window
+        w, s = self._window, self._sums
+        if len(w) == 2 * h:
+            t0, y0 = w.popleft()
+            tm, ym = w[h - 1]  # Oldest sample of the second half moves to the first.
+            s[0] += tm - t0
+            s[1] += ym - y0
+            s[2] += t - tm
+            s[3] += y - ym
+        elif len(w) < h:
+            s[0] += t
+            s[1] += y
+        else:
+            s[2] += t
+            s[3] += y
+        w.append((t, y))
+        dt = s[2] - s[0]
+        self.slope = (s[3] - s[1]) / dt if len(w) == 2 * h and dt > 0 else 0.0
+
+    def update(self, t, current_a):
+        """Feeds one sample (t in seconds, monotonic)."""
+        c = self.config
+        y = self.filtered = self._filter(current_a)
+        dt = t - self._last_t if self._last_t is not None else 0.0
+        self._last_t = t
+        self.heat = max(0.0, self.heat + (current_a * current_a - c.rated_current ** 2) * dt)
+        self._update_slope(t, y)
+
+        if c.i2t_limit and self.heat >= c.i2t_limit:
+            return ("TRIP", "i2t")
+        if y > c.max_current:
+            if self.over_since is None:
+                self.over_since = t
+                event = ("OVER", f"{y:.2f} A")
+            else:
+                event = None
+            if t - self.over_since >= c.shutdown_delay_s:
+                return ("TRIP", "sustained")
+            return event
+        if self.over_since is not None:
+            self.over_since = None
+            return ("CLEAR", f"{y:.2f} A")
+
+        stalling = y > c.rated_current and self.slope > 0 and (c.max_current - y) / self.slope <= c.stall_horizon_s
+        if stalling and not self.stall_warned:
+            self.stall_warned = True
+            return ("STALL", f"{self.slope:.2f} A/s, crossing in {(c.max_current - y) / self.slope:.2f} s")
+        if not stalling:
+            self.stall_warned = False
+        return None
+
+
+# --- BATCH / REPLAY ---
+
+def _ewma(x, alpha):
+    """Vectorized EWMA seeded with x[0]; chunked so the b**-k weights stay finite."""
+    if alpha >= 1 or not len(x):
+        return x.astype(np.float64)
+    b = 1.0 - alpha
+    chunk = max(1, min(4096, int(EWMA_CHUNK_RANGE / -np.log(b))))
+    out = np.empty(len(x), dtype=np.float64)
+    prev = float(x[0])
+    for start in range(0, len(x), chunk):
+        seg = x[start:start + chunk].astype(np.float64)
+        k = np.arange(len(seg))
+        p = b ** k
+        out[start:start + len(seg)] = b * p * prev + alpha * p * np.cumsum(seg / p)
+        prev = out[start + len(seg) - 1]
+    return out
+
+
+def _median(x, window):
+    if window <= 1:
+        return x.astype(np.float64)
+    if len(x) < window:
+        return np.asarray([np.median(x[:i + 1]) for i in range(len(x))], dtype=np.float64)
+    out = np.empty(len(x), dtype=np.float64)
+    out[window - 1:] = np.median(np.lib.stride_tricks.sliding_window_view(x, window), axis=1)
+    for i in range(window - 1):
+        out[i] = np.median(x[:i + 1])
+    return out
+
+
+def filter_signal(current, config):
+    if config.filter == "median":
+        return _median(current, config.median_window)
+    if config.filter == "ewma":
+        return _ewma(current, config.ewma_alpha)
+    return current.astype(np.float64)
+
+
+def _half_slopes(t, y, h):
+    """Slope between the means of two adjacent h-sample halves ending at each index."""
+    slope = np.zeros(len(y))
+    if len(y) < 2 * h:
+        return slope
+    ct = np.concatenate(([0.0], np.cumsum(t - t[0])))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    end = np.arange(2 * h - 1, len(y)) + 1
+    mid, start = end - h, end - 2 * h
+    dt = (ct[end] - ct[mid]) - (ct[mid] - ct[start])
+    dy = (cy[end] - cy[mid]) - (cy[mid] - cy[start])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope[2 * h - 1:] = np.where(dt > 0, dy / np.where(dt > 0, dt, 1), 0.0)
+    return slope
+
+
+def detect(t, current, config):
+    """
+    Runs the detector over whole arrays (t in seconds). Returns a dict with the
+    filtered signal, heat, slope, boolean trip/stall masks and the first trip
+    as (index, reason) or None. Matches OvercurrentDetector sample for sample.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    current = np.asarray(current, dtype=np.float64)
+    y = filter_signal(current, config)
+
+    # I²t with a floor at zero: Lindley recursion in closed form.
+    dt = np.diff(t, prepend=t[:1])
+    steps = np.cumsum((current * current - config.rated_current ** 2) * dt)
+    heat = steps - np.minimum(np.minimum.accumulate(steps), 0.0)
+
+    # Time since the current run of above-threshold samples began.
+    over = y > config.max_current
+    idx = np.arange(len(y))
+    run_start = np.maximum.accumulate(np.where(over & ~np.r_[False, over[:-1]], idx, 0))
+    sustained = over & (t - t[run_start] >= config.shutdown_delay_s)
+    thermal = heat >= config.i2t_limit if config.i2t_limit else np.zeros(len(y), bool)
+
+    slope = _half_slopes(t, y, config.half_window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        eta = np.where(slope > 0, (config.max_current - y) / np.where(slope > 0, slope, 1), np.inf)
+    stall = ~over & (y > config.rated_current) & (eta <= config.stall_horizon_s)
+
+    trip = sustained | thermal
+    first_trip = None
+    if trip.any():
+        i = int(np.argmax(trip))
+        first_trip = (i, "i2t" if thermal[i] else "sustained")
+    return {"filtered": y, "heat": heat, "slope": slope, "trip": trip, "stall": stall,
+            "first_trip": first_trip}
+
+
+def _float_list(value):
+    return [float(v) for v in value]
+
+
+def replay(path, max_currents, delays, channel=None, **options):
+    """Runs every (max_current, delay) combination over a telemetry dump."""
+    import current_telemetry
+    data = current_telemetry.load(path)
+    t_all = data["t_ns"]
+    channels = np.unique(data["channel"]) if channel is None else np.asarray([channel])
+    rows = []
+    samples = 0
+    started = time.perf_counter()
+    for ch in channels:
+        sel = (data["channel"] == ch) & np.isfinite(data["current"])
+        t = (t_all[sel] - t_all[0]) / 1e9
+        current = data["current"][sel]
+        if not len(current):
+            continue
+        for max_a, delay in itertools.product(max_currents, delays):
+            config = DetectorConfig(max_a, delay, **options)
+            result = detect(t, current, config)
+            samples += len(current)
+            first_stall = int(np.argmax(result["stall"])) if result["stall"].any() else None
+            trip = result["first_trip"]
+            rows.append({"channel": int(ch), "max_current": max_a, "delay": delay,
+                         "trip_at_s": float(t[trip[0]]) if trip else None,
+                         "reason": trip[1] if trip else None,
+                         "stall_at_s": float(t[first_stall]) if first_stall is not None else None,
+                         "peak_heat": float(result["heat"].max())})
+    elapsed = time.perf_counter() - started
+    recorded_s = (t_all[-1] - t_all[0]) / 1e9 if data["rows"] else 0.0
+    return rows, samples, elapsed, recorded_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay current telemetry through the overcurrent detector")
+    parser.add_argument("path", help="Telemetry .bin file written by current_monitor.py.")
+    parser.add_argument("-c", "--max-current", type=float, nargs="+", required=True, help="Threshold(s) to try (A).")
+    parser.add_argument("-d", "--delay", type=float, nargs="+", default=[1.0], help="Shutdown delay(s) to try (s).")
+    parser.add_argument("--channel", type=int, help="Only replay this channel index.")
+    parser.add_argument("--filter", choices=FILTERS, default=DEFAULT_FILTER)
+    parser.add_argument("--median-window", type=int, default=MEDIAN_WINDOW)
+    parser.add_argument("--alpha", type=float, default=EWMA_ALPHA, help="EWMA smoothing factor.")
+    parser.add_argument("--rated-current", type=float, help="Continuous rating for I²t (default: 80%% of max).")
+    parser.add_argument("--i2t-budget", type=float, default=I2T_BUDGET_S, help="Seconds at max before the thermal trip (0 disables).")
+    parser.add_argument("--stall-horizon", type=float, default=STALL_HORIZON_S)
+    args = parser.parse_args()
+
+    if np is None:
+        print("ERROR: numpy is required for replay (pip3 install numpy).")
+        sys.exit(1)
+
+    rows, samples, elapsed, recorded_s = replay(
+        args.path, args.max_current, args.delay, args.channel, filter=args.filter,
+        median_window=args.median_window, ewma_alpha=args.alpha, rated_current=args.rated_current,
+        i2t_budget_s=args.i2t_budget, stall_horizon_s=args.stall_horizon)
+
+    print(f"--- Replay: {args.path} ---")
+    combos = len(args.max_current) * len(args.delay)
+    print(f"  {samples} samples, {combos} threshold combination(s) in {elapsed:.3f} s "
+          f"({recorded_s * combos / max(elapsed, 1e-9):,.0f}x real time)")
+    print(f"  {'ch':>3} {'max A':>6} {'delay':>6} {'trip at':>9} {'reason':>10} {'stall at':>9} {'peak I²t':>9}")
+    for r in rows:
+        trip = f"{r['trip_at_s']:.3f}s" if r["trip_at_s"] is not None else "-"
+        stall = f"{r['stall_at_s']:.3f}s" if r["stall_at_s"] is not None else "-"
+        print(f"  {r['channel']:>3} {r['max_current']:>6.2f} {r['delay']:>6.2f} {trip:>9} "
+              f"{r['reason'] or '-':>10} {stall:>9} {r['peak_heat']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
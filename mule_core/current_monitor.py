@@ -13,15 +13,50 @@ Date: 2023-10-27
 
 Usage:
 python3 current_monitor.py --max-current 2.5 --sample-rate 10
+python3 current_monitor.py --max-current 2.5 --sample-rate 1000 --display-rate 5
+python3 current_monitor.py --multi --sample-rate 500
+python3 current_monitor.py --channel 0x40:2.5:1.0:18 --channel 0x41:3.0:0.5:19 --simulate
+python3 current_monitor.py --max-current 2.5 --sample-rate 100 --simulate
+
+Sampling runs on absolute monotonic deadlines. Terminal output happens on a
+separate low-priority display thread fed through a lock-free ring buffer, so
+printing never delays the next sample.
+
+In multi-channel mode every INA219 is polled in the same scheduled cycle.
+With smbus2 installed all register reads for all channels go out as one
+I2C_RDWR transaction; otherwise the busio bus is locked once per cycle.
+
+Every reading is also kept in a preallocated telemetry ring (see
+current_telemetry.py). It is dumped to logs/telemetry/ on exit, including an
+overcurrent shutdown, and on demand with `kill -USR1 <pid>`.
+
+The monitor is also a safety bus participant (safety_bus.py): its own trips
+are published as E-stops, and E-stops raised by other monitors disable its
+motors until they are cleared.
+
+Hardware access and timing go through mule_hal.py: on a HAL VirtualClock
+the same sampling loop runs far faster than real time for load tests.
+
+Limits are enforced on filtered current with I²t thermal accumulation and a
+stall predictor (see current_detection.py), not on single raw readings.
 
 Dependencies:
 - adafruit-circuitpython-ina219
 - RPi.GPIO (or equivalent for your platform, e.g., Jetson.GPIO)
+- smbus2 (optional, batched multi-channel reads)
 """
 
-import time
+import os
 import argparse
+import signal
 import sys
+import threading
+
+import mule_hal
+import current_telemetry
+import current_detection
+import safety_bus
+from mule_hal import REG_BUS_VOLTAGE, REG_CURRENT, REG_CALIBRATION, CALIBRATION_32V_2A, CURRENT_LSB_A
 
 # H/W INTERFACE PLACEHOLDERS - REQUIRE EE CONFIRMATION
 # =================================================================
@@ -32,6 +67,16 @@ I2C_ADDRESS = 0x40  # <--- CONFIRM WITH EE
 # Assume motor driver enable is connected to a GPIO pin
 # Using BCM numbering for Raspberry Pi as a placeholder
 MOTOR_ENABLE_PIN = 18 # <--- CONFIRM WITH EE
+
+# Multi-channel layout: one INA219 per drive motor controller (BOM: 4x).
+# (I2C address, max current A, shutdown delay s, motor enable pin)
+CHANNELS = [
+    (0x40, 2.5, 1.0, 18),  # <--- CONFIRM WITH EE
+    (0x41, 2.5, 1.0, 19),  # <--- CONFIRM WITH EE
+    (0x44, 2.5, 1.0, 20),  # <--- CONFIRM WITH EE
+    (0x45, 2.5, 1.0, 21),  # <--- CONFIRM WITH EE
+]
+I2C_BUS_NUMBER = 1  # /dev/i2c-1 on the Pi header
 # =================================================================
 
 # Attempt to import hardware-specific libraries
@@ -39,55 +84,274 @@ try:
     import board
     import busio
     from adafruit_ina219 import INA219
+    HARDWARE_LIBS = True
 except ImportError:
-    print("ERROR: Hardware libraries not found. Please install them:")
-    print("pip3 install adafruit-circuitpython-ina219 RPi.GPIO")
-    sys.exit(1)
+    HARDWARE_LIBS = False
 
 try:
-    import RPi.GPIO as GPIO
+    from smbus2 import SMBus, i2c_msg
 except ImportError:
-    # Create a dummy GPIO object for testing on non-Pi platforms
-    class DummyGPIO:
-        BCM = 0
-        OUT = 0
-        HIGH = 1
-        LOW = 0
-        def setmode(self, mode): print(f"DummyGPIO: Set mode to {mode}")
-        def setup(self, pin, mode): print(f"DummyGPIO: Setup pin {pin} to mode {mode}")
-        def output(self, pin, state): print(f"DummyGPIO: Set pin {pin} to state {state}")
-        def cleanup(self): print("DummyGPIO: Cleanup")
-    GPIO = DummyGPIO()
-    print("WARNING: RPi.GPIO not found. Using dummy interface.")
+    SMBus = None
+
+# RPi.GPIO on the Pi, the HAL's simulated GPIO everywhere else.
+GPIO = mule_hal.gpio()
 
 
 class MotorController:
     """A simple class to abstract motor control via GPIO."""
-    def __init__(self, enable_pin):
+    def __init__(self, enable_pin, gpio=None):
         self._pin = enable_pin
-        GPIO.setmode(GPIO.BCM)
+        self._gpio = gpio or GPIO
+        self._clock = mule_hal.clock_of(self._gpio)
+        self.disabled_ns = None  # When the enable pin last went low (reflex latency measurements).
+        self._gpio.setmode(self._gpio.BCM)
         # Set pin as output and start with motor enabled
-        GPIO.setup(self._pin, GPIO.OUT)
-        GPIO.output(self._pin, GPIO.HIGH)
+        self._gpio.setup(self._pin, self._gpio.OUT)
+        self._gpio.output(self._pin, self._gpio.HIGH)
         print(f"Motor controller initialized on GPIO pin {self._pin}. Motor ENABLED.")
 
+    def enable(self):
+        """Re-enables the motor driver."""
+        self._gpio.output(self._pin, self._gpio.HIGH)
+        print(f"Motor ENABLED on GPIO pin {self._pin}.")
+
     def disable(self):
         """Disables the motor driver."""
-        GPIO.output(self._pin, GPIO.LOW)
+        self._gpio.output(self._pin, self._gpio.LOW)
+        self.disabled_ns = self._clock.now_ns()
         print(f"CRITICAL: Motor DISABLED on GPIO pin {self._pin}.")
 
     def cleanup(self):
         """Clean up GPIO resources."""
-        GPIO.cleanup()
+        self._gpio.cleanup()
+
+
+class SMBusBatchReader:
+    """
+    Batches register reads with the Linux I2C_RDWR ioctl: every
+    (address, register) pair becomes a write+read message pair, and all
+    pairs go to the kernel in a single call per cycle.
+    """
+    MAX_MSGS = 42  # I2C_RDWR_IOCTL_MAX_MSGS
+
+    def __init__(self, bus_number=I2C_BUS_NUMBER):
+        self._bus = SMBus(bus_number)
+
+    def write_word(self, address, register, value):
+        self._bus.write_i2c_block_data(address, register, [(value >> 8) & 0xFF, value & 0xFF])
+
+    def _transfer(self, requests):
+        msgs = []
+        for address, register in requests:
+            msgs += [i2c_msg.write(address, [register]), i2c_msg.read(address, 2)]
+        self._bus.i2c_rdwr(*msgs)
+        return [(hi << 8) | lo for hi, lo in (list(m) for m in msgs[1::2])]
+
+    def read_words(self, requests):
+        words = []
+        per_call = self.MAX_MSGS // 2
+        for i in range(0, len(requests), per_call):
+            chunk = requests[i:i + per_call]
+            try:
+                words += self._transfer(chunk)
+            except OSError:
+                # One NACKing sensor fails the whole batch; retry per request
+                # so the healthy channels still get read this cycle.
+                for request in chunk:
+                    try:
+                        words += self._transfer([request])
+                    except OSError:
+                        words.append(None)
+        return words
+
+    def close(self):
+        self._bus.close()
+
+
+class BusioBatchReader:
+    """Fallback for busio.I2C: one bus lock per cycle, one transfer per register."""
+    def __init__(self, i2c):
+        self._i2c = i2c
+        self._buf = bytearray(2)
+
+    def _locked(self, fn):
+        while not self._i2c.try_lock():
+            pass
+        try:
+            return fn()
+        finally:
+            self._i2c.unlock()
+
+    def write_word(self, address, register, value):
+        self._locked(lambda: self._i2c.writeto(address, bytes([register, (value >> 8) & 0xFF, value & 0xFF])))
+
+    def read_words(self, requests):
+        def read_all():
+            words = []
+            for address, register in requests:
+                try:
+                    self._i2c.writeto_then_readfrom(address, bytes([register]), self._buf)
+                    words.append((self._buf[0] << 8) | self._buf[1])
+                except OSError:
+                    words.append(None)
+            return words
+        return self._locked(read_all)
+
+    def close(self):
+        self._i2c.deinit()
+
+
+class CurrentChannel:
+    """One INA219 and the motor enable pin it protects."""
+    def __init__(self, address, max_current, shutdown_delay_s, enable_pin, current_lsb_a=CURRENT_LSB_A,
+                 detector_options=None, gpio=None):
+        self.address = address
+        self.max_current_a = max_current
+        self.shutdown_delay_s = shutdown_delay_s
+        self.enable_pin = enable_pin
+        self.current_lsb_a = current_lsb_a
+        self.detector = current_detection.OvercurrentDetector(
+            current_detection.DetectorConfig(max_current, shutdown_delay_s, **(detector_options or {})))
+        self.tripped = False
+        self.motor = MotorController(enable_pin, gpio)
+
+    def current_from_raw(self, raw):
+        # The current register is two's complement.
+        return (raw - 0x10000 if raw & 0x8000 else raw) * self.current_lsb_a
+
+    @staticmethod
+    def bus_voltage_from_raw(raw):
+        return (raw >> 3) * 0.004
+
+
+class SampleRing:
+    """
+    Single-producer / single-consumer ring buffer.
+
+    The sampler only ever advances `_head` and the display thread only ever
+    advances `_tail`, so neither side takes a lock. Slots are preallocated;
+    if the reader falls behind by more than `capacity` it skips ahead and
+    counts the dropped entries instead of blocking the writer.
+    """
+    def __init__(self, capacity=1024):
+        self._capacity = capacity
+        self._slots = [None] * capacity
+        self._head = 0
+        self._tail = 0
+        self.dropped = 0
+
+    def push(self, item):
+        self._slots[self._head % self._capacity] = item
+        self._head += 1
+
+    def drain(self):
+        """Returns every item written since the last drain, oldest first."""
+        head = self._head
+        if head - self._tail > self._capacity:
+            self.dropped += head - self._tail - self._capacity
+            self._tail = head - self._capacity
+        items = [self._slots[i % self._capacity] for i in range(self._tail, head)]
+        self._tail = head
+        return items
+
+
+class SamplerStats:
+    """Achieved rate, overruns and deadline jitter of the sampling loop."""
+    def __init__(self, period_ns, clock=mule_hal.REAL_CLOCK):
+        self.period_ns = period_ns
+        self._clock = clock
+        self.samples = 0
+        self.overruns = 0
+        self.max_jitter_ns = 0
+        self.total_jitter_ns = 0
+        self.started_ns = clock.now_ns()
+
+    def record(self, jitter_ns):
+        self.samples += 1
+        self.total_jitter_ns += jitter_ns
+        if jitter_ns > self.max_jitter_ns:
+            self.max_jitter_ns = jitter_ns
+
+    def achieved_rate(self):
+        elapsed_s = (self._clock.now_ns() - self.started_ns) / 1e9
+        return self.samples / elapsed_s if elapsed_s > 0 else 0.0
+
+    def summary(self):
+        mean_us = self.total_jitter_ns / self.samples / 1000 if self.samples else 0.0
+        return (f"rate {self.achieved_rate():.1f}/{1e9 / self.period_ns:.1f} Hz | "
+                f"jitter mean {mean_us:.0f} us, max {self.max_jitter_ns / 1000:.0f} us | "
+                f"overruns {self.overruns}")
+
+
+class DisplayThread(threading.Thread):
+    """Low-priority consumer that owns all periodic terminal output."""
+    def __init__(self, samples, events, stats, refresh_hz=10, telemetry=None):
+        super().__init__(name="current-display", daemon=True)
+        self._samples = samples
+        self._events = events
+        self._stats = stats
+        self._telemetry = telemetry
+        self._refresh_s = 1.0 / refresh_hz
+        self._halt = threading.Event()
+        self._dump = threading.Event()
+
+    def request_dump(self):
+        """Asks the display thread to write a telemetry snapshot (signal-safe)."""
+        self._dump.set()
+
+    def run(self):
+        try:
+            # On Linux this renices only this thread, not the sampler.
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+        while not self._halt.wait(self._refresh_s):
+            self.flush()
+            if self._dump.is_set() and self._telemetry is not None:
+                self._dump.clear()
+                path = self._telemetry.dump()
+                print(f"\nTelemetry snapshot written to {path}", flush=True)
+
+    def flush(self):
+        for message in self._events.drain():
+            print(f"\n{message}", flush=True)
+        latest = self._samples.drain()
+        if latest:
+            _, reading = latest[-1]
+            if isinstance(reading, list):
+                text = " ".join("  n/a" if r is None else f"{r: 5.2f}" for r in reading)
+            else:
+                text = f"{reading: 5.2f}"
+            print(f"  Current: {text} A | {self._stats.summary()}", end='\r', flush=True)
+
+    def stop(self):
+        self._halt.set()
+        self.join(timeout=1.0)
+        self.flush()
 
 
 class CurrentMonitor:
     """A class to monitor current and trigger a shutdown if it exceeds a limit."""
-    def __init__(self, max_current, sample_rate, shutdown_delay_s):
+    def __init__(self, max_current, sample_rate, shutdown_delay_s, display_rate=10, spin_us=0,
+                 telemetry_s=current_telemetry.RING_SECONDS, detector_options=None, safety=None,
+                 i2c=None, gpio=None):
+        """i2c/gpio: HAL devices (e.g. mule_hal.simulator()) instead of the board's INA219 and RPi.GPIO."""
         self._max_current_a = max_current
-        self._sample_period_s = 1.0 / sample_rate
         self._shutdown_delay_s = shutdown_delay_s
-        self._overcurrent_start_time = None
+        self._detector = current_detection.OvercurrentDetector(
+            current_detection.DetectorConfig(max_current, shutdown_delay_s, **(detector_options or {})))
+        self._init_sampler(sample_rate, display_rate, spin_us, telemetry_s=telemetry_s, safety=safety,
+                           clock=mule_hal.clock_of(i2c))
+
+        if i2c is not None:
+            self._sensor = mule_hal.INA219Reader(i2c, I2C_ADDRESS)
+            self._motor = MotorController(MOTOR_ENABLE_PIN, gpio)
+            return
+
+        if not HARDWARE_LIBS:
+            print("ERROR: Hardware libraries not found. Please install them:")
+            print("pip3 install adafruit-circuitpython-ina219 RPi.GPIO  (or run with --simulate)")
+            sys.exit(1)
 
         print("Initializing I2C and INA219 sensor...")
         try:
@@ -102,61 +366,262 @@ class CurrentMonitor:
 
         self._motor = MotorController(MOTOR_ENABLE_PIN)
 
-    def run(self):
-        """Starts the monitoring loop."""
-        print("\n--- Starting Current Monitor ---")
+    def _init_sampler(self, sample_rate, display_rate, spin_us, channels=1,
+                      telemetry_s=current_telemetry.RING_SECONDS, safety=None, clock=mule_hal.REAL_CLOCK):
+        self._clock = clock
+        self._stopped = False
+        self.exit_code = None   # 2 after a trip; main() turns it into the process exit status.
+        self._sample_period_s = 1.0 / sample_rate
+        self._period_ns = int(1e9 / sample_rate)
+        self._spin_ns = int(spin_us * 1000)
+        self._stats = SamplerStats(self._period_ns, clock)
+        self._samples = SampleRing()
+        self._events = SampleRing(64)
+        self._telemetry = None
+        if telemetry_s > 0:
+            self._telemetry = current_telemetry.TelemetryRing(int(telemetry_s * sample_rate) * channels, sample_rate)
+        self._display = DisplayThread(self._samples, self._events, self._stats, display_rate, self._telemetry)
+        self._safety = safety
+        self._estop = safety.subscribe("current_monitor") if safety else None
+        self._estop_active = False
+
+    def _dump_telemetry(self):
+        if self._telemetry is not None and len(self._telemetry):
+            print(f"Telemetry ({len(self._telemetry)} rows) written to {self._telemetry.dump()}")
+
+    def _describe(self):
         print(f"  Max Current Threshold: {self._max_current_a:.2f} A")
-        print(f"  Sample Rate: {1.0/self._sample_period_s:.1f} Hz")
         print(f"  Shutdown Delay: {self._shutdown_delay_s} s")
+        print(f"  Detection: {self._detector.config.describe()}")
+
+    def _wait_until(self, deadline_ns):
+        """Sleeps until an absolute monotonic deadline, optionally spinning
+        for the last `spin_us` to beat scheduler wake-up latency."""
+        clock = self._clock
+        remaining = deadline_ns - clock.now_ns()
+        if remaining > self._spin_ns:
+            clock.sleep((remaining - self._spin_ns) / 1e9)
+        while clock.now_ns() < deadline_ns:
+            clock.spin()
+
+    def _read_current(self):
+        try:
+            current_ma = self._sensor.current
+            # The INA219 library returns current in mA. Convert to A.
+            return current_ma / 1000.0 if current_ma is not None else 0.0
+        except OSError:
+            # This can happen if the I2C bus has a momentary glitch
+            return -1.0 # Use a negative value to indicate read error
+
+    def run(self, duration_s=None):
+        """Starts the monitoring loop (until interrupted, or for duration_s on the monitor's clock)."""
+        print("\n--- Starting Current Monitor ---")
+        self._describe()
+        print(f"  Sample Rate: {1.0/self._sample_period_s:.1f} Hz")
         print("----------------------------------\n")
 
+        if self._telemetry is not None and hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self._display.request_dump())
+        self._display.start()
+        clock = self._clock
+        period = self._period_ns
+        self._stats.started_ns = clock.now_ns()
+        deadline = self._stats.started_ns + period
+        end = None if duration_s is None else self._stats.started_ns + int(duration_s * 1e9)
         try:
-            while True:
-                try:
-                    current_ma = self._sensor.current
-                    # The INA219 library returns current in mA. Convert to A.
-                    current_a = current_ma / 1000.0 if current_ma is not None else 0.0
-                except OSError:
-                    # This can happen if the I2C bus has a momentary glitch
-                    current_a = -1.0 # Use a negative value to indicate read error
-                
-                if current_a < 0:
-                    print("WARN: Failed to read from I2C sensor.", flush=True)
-                else:
-                    self._check_current(current_a)
+            while not self._stopped and (end is None or deadline <= end):
+                self._wait_until(deadline)
+                now = clock.now_ns()
+                self._stats.record(now - deadline)
+                self._sample(now)
+                if self._estop is not None:
+                    self._poll_safety()
 
-                time.sleep(self._sample_period_s)
+                # Absolute schedule: the next deadline never depends on how long
+                # this iteration took. If we fell a whole period behind, skip the
+                # missed slots (counted as overruns) rather than bursting to catch up.
+                deadline += period
+                late = clock.now_ns() - deadline
+                if late > 0:
+                    missed = late // period + 1
+                    self._stats.overruns += missed
+                    deadline += missed * period
 
         except KeyboardInterrupt:
             print("\nMonitoring stopped by user.")
         finally:
-            self._motor.cleanup()
+            self._stop_display()
+            print(f"\nSampler: {self._stats.summary()} | display drops {self._samples.dropped}")
+            self._dump_telemetry()
+            self._cleanup()
             print("GPIO resources cleaned up.")
 
-    def _check_current(self, current_a):
+    def stop(self):
+        """Ends run() after the current cycle (for monitors hosted on a thread)."""
+        self._stopped = True
+
+    def _stop_display(self):
+        # Hosted monitors (mule_runtime) never start the display thread.
+        if self._display.ident is not None:
+            self._display.stop()
+
+    def _sample(self, now_ns):
+        """One scheduled cycle: read, publish for display, check limits."""
+        current_a = self._read_current()
+        if self._telemetry is not None:
+            self._telemetry.push(now_ns, current_a if current_a >= 0 else float("nan"))
+        if current_a < 0:
+            self._events.push("WARN: Failed to read from I2C sensor.")
+        else:
+            self._samples.push((now_ns, current_a))
+            self._check_current(current_a, now_ns / 1e9)
+
+    def _cleanup(self):
+        self._motor.cleanup()
+
+    def _set_motors(self, enabled):
+        self._motor.enable() if enabled else self._motor.disable()
+
+    def _poll_safety(self):
+        """Reacts to E-stops raised elsewhere on the bus (one shared-memory read per cycle)."""
+        state = self._estop.check()
+        if state and state["source"] != "current_monitor":
+            self._estop_active = True
+            self._set_motors(False)
+            self._events.push(f"CRITICAL: E-stop from {state['source']}: {state['reason']}. Motors disabled.")
+        elif self._estop_active and not self._safety.is_estopped():
+            self._estop_active = False
+            self._set_motors(True)
+            self._events.push("INFO: E-stop cleared. Motors re-enabled.")
+
+    def _publish_trip(self, reason):
+        if self._safety is not None:
+            self._safety.raise_estop("current_monitor", reason)
+
+    def _check_current(self, current_a, now=None):
         """Checks the current against the threshold and manages shutdown logic."""
-        
-        # Using a carriage return to keep the output on a single line
-        print(f"  Current: {current_a: 5.2f} A", end='\r', flush=True)
-
-        if current_a > self._max_current_a:
-            if self._overcurrent_start_time is None:
-                # First time we've seen an overcurrent condition
-                self._overcurrent_start_time = time.monotonic()
-                print(f"\nWARNING: Current {current_a:.2f} A exceeds threshold of {self._max_current_a:.2f} A. Starting shutdown timer...", flush=True)
+        now = self._clock.now() if now is None else now
+        detector = self._detector
+        event = detector.update(now, current_a)
+        if event is None:
+            return
+        kind, detail = event
+
+        if kind == "TRIP":
+            # Disable first; reporting can wait.
+            self._motor.disable()
+            self._publish_trip(f"overcurrent ({detail})")
+            if detail == "i2t":
+                self._events.push(f"CRITICAL SHUTDOWN: I²t thermal limit reached ({detector.heat:.1f} A²s).")
             else:
-                # Overcurrent condition persists, check timer
-                elapsed = time.monotonic() - self._overcurrent_start_time
-                if elapsed >= self._shutdown_delay_s:
-                    print(f"\nCRITICAL SHUTDOWN: Overcurrent condition persisted for {elapsed:.1f}s.")
-                    self._motor.disable()
-                    self._motor.cleanup()
-                    sys.exit(2) # Exit with a specific error code
-        else:
-            # Current is normal, reset the timer if it was running
-            if self._overcurrent_start_time is not None:
-                print("\nINFO: Current has returned to normal levels. Resetting shutdown timer.", flush=True)
-                self._overcurrent_start_time = None
+                self._events.push(f"CRITICAL SHUTDOWN: Overcurrent condition persisted for {now - detector.over_since:.1f}s.")
+            # run() stops the display and cleans up; main() exits with this code.
+            self.exit_code = 2
+            self.stop()
+        elif kind == "OVER":
+            self._events.push(f"WARNING: Current {detail} exceeds threshold of {self._max_current_a:.2f} A. Starting shutdown timer...")
+        elif kind == "CLEAR":
+            self._events.push("INFO: Current has returned to normal levels. Resetting shutdown timer.")
+        elif kind == "STALL":
+            self._events.push(f"WARNING: Possible stall, current rising at {detail}.")
+
+
+class MultiCurrentMonitor(CurrentMonitor):
+    """
+    Polls several INA219 channels in one scheduled cycle. Each channel has its
+    own threshold, shutdown delay and motor enable pin; a trip latches that
+    channel's motor off. With a safety bus the first trip is also published as
+    an E-stop, which holds the healthy channels off until it is cleared. run()
+    ends (exit_code 2) once every channel has tripped.
+    """
+    def __init__(self, channels, bus, sample_rate, display_rate=10, spin_us=0,
+                 telemetry_s=current_telemetry.RING_SECONDS, safety=None):
+        self._channels = channels
+        self._bus = bus
+        self._init_sampler(sample_rate, display_rate, spin_us, len(channels), telemetry_s, safety,
+                           mule_hal.clock_of(bus))
+        # Current + bus voltage for every channel, read back in one batch.
+        self._requests = [(c.address, reg) for c in channels for reg in (REG_CURRENT, REG_BUS_VOLTAGE)]
+        for channel in channels:
+            bus.write_word(channel.address, REG_CALIBRATION, CALIBRATION_32V_2A)
+        self.last_bus_voltages = [None] * len(channels)
+
+    def _describe(self):
+        for c in self._channels:
+            print(f"  INA219 {hex(c.address)}: max {c.max_current_a:.2f} A, delay {c.shutdown_delay_s} s, pin {c.enable_pin}")
+        if self._channels:
+            print(f"  Detection: {self._channels[0].detector.config.describe()}")
+
+    def _sample(self, now_ns):
+        words = self._bus.read_words(self._requests)
+        telemetry = self._telemetry
+        readings = []
+        for i, channel in enumerate(self._channels):
+            raw_current, raw_bus = words[2 * i], words[2 * i + 1]
+            if raw_current is None:
+                self._events.push(f"WARN: Failed to read INA219 at {hex(channel.address)}.")
+                readings.append(None)
+                if telemetry is not None:
+                    telemetry.push(now_ns, float("nan"), float("nan"), i)
+                continue
+            current_a = channel.current_from_raw(raw_current)
+            bus_v = float("nan")
+            if raw_bus is not None:
+                bus_v = self.last_bus_voltages[i] = channel.bus_voltage_from_raw(raw_bus)
+            if telemetry is not None:
+                telemetry.push(now_ns, current_a, bus_v, i)
+            readings.append(current_a)
+            self._check_channel(channel, current_a, now_ns / 1e9)
+        self._samples.push((now_ns, readings))
+
+    def _check_channel(self, channel, current_a, now):
+        if channel.tripped:
+            return
+        event = channel.detector.update(now, current_a)
+        if event is None:
+            return
+        kind, detail = event
+        name = hex(channel.address)
+
+        if kind == "TRIP":
+            channel.motor.disable()
+            channel.tripped = True
+            if detail == "i2t":
+                self._events.push(f"CRITICAL: {name} I²t thermal limit reached ({channel.detector.heat:.1f} A²s). Motor disabled.")
+            else:
+                self._events.push(f"CRITICAL: {name} overcurrent persisted for {now - channel.detector.over_since:.1f}s. Motor disabled.")
+            # One motor's trip is already an E-stop for the pump, runtime and docking.
+            self._publish_trip(f"{name} overcurrent ({detail})")
+            if all(c.tripped for c in self._channels):
+                self._events.push("CRITICAL SHUTDOWN: All monitored channels tripped.")
+                self.exit_code = 2
+                self.stop()
+            elif self._safety is not None:
+                # Healthy channels obey the stop too, until it is cleared on the bus.
+                self._estop_active = True
+                self._set_motors(False)
+        elif kind == "OVER":
+            self._events.push(f"WARNING: {name} at {detail} exceeds {channel.max_current_a:.2f} A. Starting shutdown timer...")
+        elif kind == "CLEAR":
+            self._events.push(f"INFO: {name} returned to normal levels. Resetting shutdown timer.")
+        elif kind == "STALL":
+            self._events.push(f"WARNING: {name} possible stall, current rising at {detail}.")
+
+    def _set_motors(self, enabled):
+        for channel in self._channels:
+            if not channel.tripped:
+                channel.motor.enable() if enabled else channel.motor.disable()
+
+    def _cleanup(self):
+        # GPIO.cleanup() is global, so one call releases every channel's pin.
+        self._channels[0].motor.cleanup()
+        self._bus.close()
+
+
+def _parse_channel(spec):
+    """ADDR:MAX_A:DELAY_S:PIN, e.g. 0x41:2.5:1.0:19"""
+    address, max_a, delay_s, pin = spec.split(":")
+    return int(address, 0), float(max_a), float(delay_s), int(pin)
 
 
 def main():
@@ -164,14 +629,25 @@ def main():
     parser.add_argument(
         '-c', '--max-current',
         type=float,
-        required=True,
-        help="Maximum allowed current in Amps before triggering shutdown timer."
+        help="Maximum allowed current in Amps before triggering shutdown timer (single-channel mode)."
     )
     parser.add_argument(
         '-r', '--sample-rate',
         type=int,
         default=10,
-        help="Samples per second to read the current sensor (Hz)."
+        help="Samples per second to read the current sensor (Hz). Deadline-scheduled; 100-1000 Hz is supported."
+    )
+    parser.add_argument(
+        '--display-rate',
+        type=float,
+        default=10,
+        help="Terminal refresh rate of the display thread (Hz). Independent of the sample rate."
+    )
+    parser.add_argument(
+        '--spin-us',
+        type=float,
+        default=0,
+        help="Busy-wait this many microseconds before each deadline to cut wake-up jitter (costs CPU)."
     )
     parser.add_argument(
         '-d', '--delay',
@@ -179,18 +655,87 @@ def main():
         default=1.0,
         help="Duration in seconds the current must exceed the max before shutdown."
     )
+    parser.add_argument(
+        '--multi',
+        action='store_true',
+        help="Monitor every channel in CHANNELS (0x40/0x41/0x44/0x45) in one cycle."
+    )
+    parser.add_argument(
+        '--channel',
+        action='append',
+        type=_parse_channel,
+        metavar='ADDR:MAX_A:DELAY_S:PIN',
+        help="Monitor this channel (repeatable). Implies multi-channel mode."
+    )
+    parser.add_argument(
+        '--simulate',
+        action='store_true',
+        help="Run against the HAL simulator (simulated INA219s and GPIO; no hardware needed)."
+    )
+    parser.add_argument(
+        '--filter',
+        choices=current_detection.FILTERS,
+        default=current_detection.DEFAULT_FILTER,
+        help="Filter applied to readings before the threshold check."
+    )
+    parser.add_argument(
+        '--i2t-budget',
+        type=float,
+        default=current_detection.I2T_BUDGET_S,
+        help="Seconds at max current before the I²t thermal trip (0 disables)."
+    )
+    parser.add_argument(
+        '--no-safety-bus',
+        action='store_true',
+        help="Run standalone: do not publish or obey E-stops on the shared safety bus."
+    )
+    parser.add_argument(
+        '--telemetry-seconds',
+        type=float,
+        default=current_telemetry.RING_SECONDS,
+        help="Seconds of samples kept in the telemetry ring and dumped on exit (0 disables)."
+    )
     args = parser.parse_args()
+    detector_options = {"filter": args.filter, "i2t_budget_s": args.i2t_budget}
+    safety = None if args.no_safety_bus else safety_bus.SafetyBus()
+
+    if args.multi or args.channel:
+        specs = args.channel or CHANNELS
+        if args.sample_rate <= 0 or any(m <= 0 or d <= 0 for _, m, d, _ in specs):
+            print("ERROR: All arguments must be positive values.")
+            sys.exit(1)
+        if args.simulate:
+            bus = mule_hal.SimINA219Bus([a for a, _, _, _ in specs])
+        elif SMBus is not None:
+            bus = SMBusBatchReader()
+        elif HARDWARE_LIBS:
+            bus = BusioBatchReader(busio.I2C(board.SCL, board.SDA))
+        else:
+            print("ERROR: No I2C library found. Please install smbus2 or adafruit-blinka.")
+            sys.exit(1)
+        channels = [CurrentChannel(*spec, detector_options=detector_options) for spec in specs]
+        monitor = MultiCurrentMonitor(channels, bus, args.sample_rate, args.display_rate, args.spin_us,
+                                      args.telemetry_seconds, safety)
+        monitor.run()
+        sys.exit(monitor.exit_code or 0)
 
-    if args.max_current <= 0 or args.sample_rate <= 0 or args.delay <= 0:
+    if args.max_current is None or args.max_current <= 0 or args.sample_rate <= 0 or args.delay <= 0:
         print("ERROR: All arguments must be positive values.")
         sys.exit(1)
 
     monitor = CurrentMonitor(
         max_current=args.max_current,
         sample_rate=args.sample_rate,
-        shutdown_delay_s=args.delay
+        shutdown_delay_s=args.delay,
+        display_rate=args.display_rate,
+        spin_us=args.spin_us,
+        telemetry_s=args.telemetry_seconds,
+        detector_options=detector_options,
+        safety=safety,
+        i2c=mule_hal.SimINA219Bus([I2C_ADDRESS]) if args.simulate else None
     )
     monitor.run()
+    sys.exit(monitor.exit_code or 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+current_telemetry.py
+
+Description:
+Flight recorder for current_monitor.py. The sampler writes every reading into
+a preallocated ring of (timestamp, current, bus voltage, channel) columns, so
+recording costs a few array stores per sample and never allocates. On shutdown
+(including an overcurrent trip) or on SIGUSR1 the ring is dumped to a binary
+file through mmap; this script reads those files back zero-copy.
+
+File layout (little-endian):
+    header  64 bytes  magic, version, rows, sample rate, wall-clock start
+    t_ns    int64[rows]    monotonic timestamp
+    current float32[rows]  A (NaN = failed read)
+    bus_v   float32[rows]  V (NaN = not sampled)
+    channel uint16[rows]   index into the monitor's channel list
+
+Usage:
+python3 current_telemetry.py logs/telemetry/current_20260301_101500.bin
+python3 current_telemetry.py logs/telemetry/current_20260301_101500.bin --tail 20 --channel 1
+python3 current_telemetry.py logs/telemetry/current_20260301_101500.bin --csv trip.csv
+
+Dependencies:
+- numpy (optional for recording, required for the reader's statistics)
+"""
+
+import os
+import sys
+import mmap
+import time
+import struct
+import argparse
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TELEMETRY_DIR = os.path.join(BASE_DIR, "logs", "telemetry")
+RING_SECONDS = 600  # Ten minutes of history at the configured sample rate.
+
+MAGIC = b"MULETLM\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQdd")  # magic, version, reserved, rows, sample_rate, wall_start
+HEADER_SIZE = 64
+# (name, array typecode, numpy dtype) in file order; widest first keeps every column aligned.
+COLUMNS = (("t_ns", "q", "<i8"), ("current", "f", "<f4"), ("bus_v", "f", "<f4"), ("channel", "H", "<u2"))
+
+
+class TelemetryRing:
+    """
+    Fixed-capacity column store written only by the sampler thread. Once full
+    it overwrites the oldest row; `written` keeps counting so readers can tell
+    how much was lost.
+    """
+    def __init__(self, capacity, sample_rate=0.0):
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self.written = 0
+        self.wall_start = time.time()
+        self._mono_start = time.monotonic_ns()
+        self._columns = [array(code, bytes(array(code).itemsize * capacity)) for _, code, _ in COLUMNS]
+        self._t, self._current, self._bus_v, self._channel = self._columns
+
+    def push(self, t_ns, current_a, bus_v=float("nan"), channel=0):
+        i = self.written % self.capacity
+        self._t[i] = t_ns
+        self._current[i] = current_a
+        self._bus_v[i] = bus_v
+        self._channel[i] = channel
+        self.written += 1
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def snapshot(self):
+        """Chronological copy of every column. Safe to call from another
+        thread: rows the sampler overwrote during the copy are dropped."""
+        before = self.written
+        start = before % self.capacity
+        columns = [col[start:] + col[:start] if before > self.capacity else col[:before]
+                   for col in self._columns]
+        overwritten = min(self.written - before, len(columns[0]))
+        return [col[overwritten:] for col in columns]
+
+    def dump(self, path=None):
+        """Writes the ring to a telemetry file through mmap. Returns the path."""
+        columns = self.snapshot()
+        rows = len(columns[0])
+        if path is None:
+            os.makedirs(TELEMETRY_DIR, exist_ok=True)
+            stamp = time.strftime("%Y%m%d_%H%M%S")
+            path = os.path.join(TELEMETRY_DIR, f"current_{stamp}.bin")
+        # Map the wall clock to the first row so readers can print real times.
+        first_ns = columns[0][0] if rows else self._mono_start
+        wall_start = self.wall_start + (first_ns - self._mono_start) / 1e9
+        size = HEADER_SIZE + sum(col.itemsize * rows for col in columns)
+
+        with open(path, "w+b") as f:
+            f.truncate(size)
+            with mmap.mmap(f.fileno(), size) as mm:
+                HEADER.pack_into(mm, 0, MAGIC, VERSION, 0, rows, float(self.sample_rate), wall_start)
+                offset = HEADER_SIZE
+                for col in columns:
+                    data = memoryview(col).cast("B")
+                    mm[offset:offset + len(data)] = data
+                    offset += len(data)
+                mm.flush()
+        return path
+
+
+def load(path):
+    """
+    Opens a telemetry file without copying. Returns a dict with the header
+    fields and one read-only NumPy view (or memoryview) per column.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, _, rows, sample_rate, wall_start = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or version != VERSION:
+        mm.close()
+        raise ValueError(f"{path} is not a version {VERSION} telemetry file")
+
+    data = {"path": path, "rows": rows, "sample_rate": sample_rate, "wall_start": wall_start}
+    offset = HEADER_SIZE
+    for name, code, dtype in COLUMNS:
+        if np is not None:
+            data[name] = np.frombuffer(mm, dtype=dtype, count=rows, offset=offset)
+        else:
+            data[name] = memoryview(mm)[offset:offset + rows * array(code).itemsize].cast(code)
+        offset += rows * array(code).itemsize
+    return data
+
+
+def summarize(data, channel=None):
+    """Per-channel statistics over a loaded telemetry file."""
+    t, current, bus_v, channels = data["t_ns"], data["current"], data["bus_v"], data["channel"]
+    ids = np.unique(channels) if channel is None else np.asarray([channel])
+    stats = []
+    for ch in ids:
+        sel = channels == ch
+        c, v, ts = current[sel], bus_v[sel], t[sel]
+        valid = np.isfinite(c)
+        peak = int(np.nanargmax(c)) if valid.any() else None
+        stats.append({
+            "channel": int(ch),
+            "rows": int(sel.sum()),
+            "failed_reads": int((~valid).sum()),
+            "mean_a": float(np.nanmean(c)) if valid.any() else float("nan"),
+            "max_a": float(c[peak]) if peak is not None else float("nan"),
+            "peak_at_s": float((ts[peak] - t[0]) / 1e9) if peak is not None else float("nan"),
+            "mean_bus_v": float(np.nanmean(v)) if np.isfinite(v).any() else float("nan"),
+        })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect current_monitor telemetry dumps")
+    parser.add_argument("path", help="Telemetry .bin file written by current_monitor.py.")
+    parser.add_argument("--channel", type=int, help="Only report this channel index.")
+    parser.add_argument("--tail", type=int, default=0, help="Print the last N rows.")
+    parser.add_argument("--csv", help="Also write the (filtered) rows to this CSV file.")
+    args = parser.parse_args()
+
+    if np is None:
+        print("ERROR: numpy is required to analyse telemetry (pip3 install numpy).")
+        sys.exit(1)
+
+    data = load(args.path)
+    rows = data["rows"]
+    if not rows:
+        print(f"{args.path}: empty recording.")
+        return
+    t = data["t_ns"]
+    duration = (t[-1] - t[0]) / 1e9
+    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(data["wall_start"]))
+    print(f"{args.path}")
+    print(f"  Rows: {rows} | Duration: {duration:.2f} s | Started: {started} | Sample rate: {data['sample_rate']:.1f} Hz")
+    for s in summarize(data, args.channel):
+        print(f"  ch{s['channel']}: {s['rows']} rows, mean {s['mean_a']:.3f} A, max {s['max_a']:.3f} A "
+              f"at +{s['peak_at_s']:.3f} s, bus {s['mean_bus_v']:.2f} V, failed reads {s['failed_reads']}")
+
+    sel = np.ones(rows, bool) if args.channel is None else data["channel"] == args.channel
+    idx = np.flatnonzero(sel)
+    for i in idx[-args.tail:] if args.tail else ():
+        print(f"  +{(t[i] - t[0]) / 1e9:10.4f} s  ch{data['channel'][i]}  {data['current'][i]: 7.3f} A  {data['bus_v'][i]: 6.2f} V")
+    if args.csv:
+        out = np.column_stack([(t[idx] - t[0]) / 1e9, data["channel"][idx], data["current"][idx], data["bus_v"][idx]])
+        np.savetxt(args.csv, out, delimiter=",", header="t_s,channel,current_a,bus_v", comments="", fmt=["%.6f", "%d", "%.4f", "%.3f"])
+        print(f"  Wrote {len(idx)} rows to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
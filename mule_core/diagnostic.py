@@ -1,6 +1,8 @@
 import os
 import sqlite3
 
+import mule_store
+
 def run_diagnostics():
     print("🔍 [DIAGNOSTIC] Starting MuleLab System Check...")
     
@@ -11,16 +13,16 @@ def run_diagnostics():
         print(f"{status} Directory: {d}")
 
     # 2. Check Database Connectivity
-    db_path = 'logs/mule_results.db'
+    db_path = mule_store.DB_PATH
     if os.path.exists(db_path):
         try:
-            conn = sqlite3.connect(db_path)
-            print("✅ Database: Connection Successful.")
-            conn.close()
-        except Exception as e:
+            conn = mule_store.get_connection()
+            version = mule_store.schema_version(conn)
+            print(f"✅ Database: Connection Successful. Schema v{version}/{mule_store.SCHEMA_VERSION} ({db_path})")
+        except sqlite3.Error as e:
             print(f"❌ Database: Connection Failed. Error: {e}")
     else:
-        print("⚠️ Database: Not found. Run 'python3 mule.py setup' first.")
+        print("⚠️ Database: Not found. Run 'python3 mule_core/mule_store.py' first.")
 
     # 3. Check API Key
     if os.path.exists('api_key.txt'):
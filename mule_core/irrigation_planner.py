@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+irrigation_planner.py
+
+Description:
+Runs a day of irrigation from a declarative plan instead of one-shot calls to
+run_pump()/pulse_pump_for_aeration(). Each zone names its pump pin, how long
+to water, how many aeration pulses to finish with, the current its pump draws
+and the time-of-day windows it is allowed to run in.
+
+Zone jobs sit in a priority queue. A job starts once its window is open, its
+pump pin is free and its current fits in the bus budget; zones whose windows
+overlap run concurrently when the budget allows, otherwise the lower priority
+one waits for a running job to finish. A job that cannot finish inside its
+current window moves to its next window, or is reported as missed.
+
+The budget comes from the requirements table (ELEC-BUS-MAIN 24 V,
+ELEC-BRK-MAIN 80 A), derated for continuous load and less the base load of
+everything else on the bus.
+
+Live pumps subscribe to the safety bus (safety_bus.py): an E-stop cuts their
+output at once, and the planner stops, reporting every unfinished zone as
+missed.
+
+--dry-run swaps the pumps for recorders and runs the schedule on a
+compressed clock, so a full day plays out in seconds (or instantly with
+--speed 0).
+
+Usage:
+python3 irrigation_planner.py --dry-run
+python3 irrigation_planner.py --dry-run --speed 0 --plan garden.json
+python3 irrigation_planner.py --plan garden.json
+
+Dependencies:
+- water_pump_controller.py (live runs only)
+"""
+
+import os
+import json
+import time
+import heapq
+import argparse
+import datetime
+
+import mule_mrd
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUS_REQ_ID = "ELEC-BUS-MAIN"
+BREAKER_REQ_ID = "ELEC-BRK-MAIN"
+DEFAULT_BUS_V = 24.0
+DEFAULT_BREAKER_A = 80.0
+CONTINUOUS_DERATE = 0.8   # Breakers are rated for 80% continuous load.
+BASE_LOAD_A = 15.0        # Compute, sensors and idle drive controllers. <--- CONFIRM WITH EE
+AERATION_ON_S = 0.1       # Matches pulse_pump_for_aeration()
+AERATION_OFF_S = 0.4
+RAMP_ALLOWANCE_S = 1.0    # Soft start + soft stop, rounded up.
+DRY_RUN_SPEED = 10000     # 24 h in ~8.6 s
+
+DEFAULT_PLAN = {
+    "zones": [
+        {"name": "tomatoes",   "pin": 17, "current_a": 18.0, "duration_s": 900,  "aeration_cycles": 5,
+         "windows": ["05:30-08:00", "19:00-21:00"], "priority": 0},
+        {"name": "herbs",      "pin": 27, "current_a": 12.0, "duration_s": 600,  "aeration_cycles": 0,
+         "windows": ["05:30-08:00"], "priority": 1},
+        {"name": "orchard",    "pin": 22, "current_a": 30.0, "duration_s": 1800, "aeration_cycles": 10,
+         "windows": ["05:00-07:00", "20:00-22:00"], "priority": 2},
+        {"name": "lawn_north", "pin": 23, "current_a": 25.0, "duration_s": 1200, "aeration_cycles": 0,
+         "windows": ["04:00-06:00"], "priority": 3},
+    ]
+}
+
+
+def load_power_limits(requirements=mule_mrd.CACHE):
+    """(bus_v, breaker_a) from the requirements table (defaults if missing)."""
+    return (mule_mrd.threshold(BUS_REQ_ID, DEFAULT_BUS_V, requirements),
+            mule_mrd.threshold(BREAKER_REQ_ID, DEFAULT_BREAKER_A, requirements))
+
+
+def parse_window(text):
+    """'HH:MM-HH:MM' -> (start_s, end_s) seconds after midnight."""
+    def seconds(hhmm):
+        hours, minutes = hhmm.strip().split(":")
+        return int(hours) * 3600 + int(minutes) * 60
+    start, end = text.split("-")
+    start_s, end_s = seconds(start), seconds(end)
+    if end_s <= start_s:
+        raise ValueError(f"Window {text!r} must end after it starts (split windows that cross midnight).")
+    return start_s, end_s
+
+
+def clock_text(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class Zone:
+    def __init__(self, name, pin, current_a, duration_s, windows, aeration_cycles=0, priority=10):
+        self.name = name
+        self.pin = pin
+        self.current_a = float(current_a)
+        self.duration_s = float(duration_s)
+        self.aeration_cycles = int(aeration_cycles)
+        self.priority = priority
+        self.windows = sorted(parse_window(w) for w in windows)
+
+    @property
+    def run_s(self):
+        return self.duration_s + self.aeration_cycles * (AERATION_ON_S + AERATION_OFF_S) + RAMP_ALLOWANCE_S
+
+
+def load_plan(plan):
+    """Zones from a plan dict or a path to a JSON plan file."""
+    if isinstance(plan, str):
+        with open(plan, encoding="utf-8") as f:
+            plan = json.load(f)
+    return [Zone(**z) for z in plan["zones"]]
+
+
+class SimClock:
+    """Plan-day clock for dry runs. speed=N plays N plan seconds per real
+    second; speed=0 jumps straight to each event."""
+    def __init__(self, start_s=0.0, speed=DRY_RUN_SPEED):
+        self.speed = speed
+        self._start = start_s
+        self._t0 = time.monotonic()
+        self._virtual = start_s
+
+    def now(self):
+        if not self.speed:
+            return self._virtual
+        return self._start + (time.monotonic() - self._t0) * self.speed
+
+    def sleep_until(self, t):
+        if not self.speed:
+            self._virtual = max(self._virtual, t)
+            return
+        time.sleep(max(0.0, (t - self.now()) / self.speed))
+
+
+class WallClock:
+    """Seconds since local midnight on the day the plan started."""
+    def __init__(self):
+        midnight = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        self._midnight = midnight.timestamp()
+
+    def now(self):
+        return time.time() - self._midnight
+
+    def sleep_until(self, t):
+        time.sleep(max(0.0, t - self.now()))
+
+
+class DryRunPump:
+    """Stands in for PwmPumpController in dry runs; records what it was asked to do."""
+    def __init__(self, pin, log):
+        self.pin = pin
+        self._log = log
+
+    def run_async(self, duration_s, aeration_cycles=0):
+        self._log.append((self.pin, "run", duration_s, aeration_cycles))
+
+    def emergency_stop(self):
+        self._log.append((self.pin, "estop"))
+
+    def cleanup(self, release_gpio=True):
+        pass
+
+
+class IrrigationPlanner:
+    def __init__(self, zones, bus_v=None, breaker_a=None, base_load_a=BASE_LOAD_A, derate=CONTINUOUS_DERATE):
+        if bus_v is None or breaker_a is None:
+            req_v, req_a = load_power_limits()
+            bus_v = req_v if bus_v is None else bus_v
+            breaker_a = req_a if breaker_a is None else breaker_a
+        self.zones = zones
+        self.bus_v = bus_v
+        self.breaker_a = breaker_a
+        self.budget_a = breaker_a * derate - base_load_a
+        self.timeline = []   # (zone, start_s, end_s)
+        self.missed = []     # (zone, reason)
+        self.deferrals = 0
+        self.peak_a = 0.0
+        for zone in zones:
+            if zone.current_a > self.budget_a:
+                raise ValueError(f"Zone {zone.name} draws {zone.current_a:.1f} A; "
+                                 f"the irrigation budget is only {self.budget_a:.1f} A.")
+
+    def _next_window(self, zone, after):
+        """(earliest start >= after, window end) for the first window long
+        enough for the whole job, else None."""
+        for start, end in zone.windows:
+            begin = max(start, after)
+            if begin + zone.run_s <= end:
+                return begin, end
+        return None
+
+    def run(self, clock, pumps, safety=None):
+        """Executes the plan. pumps maps pin -> PwmPumpController (or DryRunPump).
+        With a safety bus, an E-stop ends the run. Returns the timeline."""
+        queue = []  # (priority, earliest start, seq, zone, window end)
+        for seq, zone in enumerate(self.zones):
+            window = self._next_window(zone, clock.now())
+            if window is None:
+                self.missed.append((zone, "no window left today"))
+                continue
+            heapq.heappush(queue, (zone.priority, window[0], seq, zone, window[1]))
+
+        running = []  # (end_s, seq, zone, start_s)
+        load_a = 0.0
+        while queue or running:
+            now = clock.now()
+            if safety is not None and safety.is_estopped():
+                self._abort(now, pumps, running, queue, "stopped by E-stop")
+                break
+
+            while running and running[0][0] <= now:
+                end, _, zone, start = heapq.heappop(running)
+                load_a -= zone.current_a
+                self.timeline.append((zone, start, end))
+                print(f"[{clock_text(end)}] {zone.name}: done")
+
+            busy = {zone.pin for _, _, zone, _ in running}
+            waiting = []
+            while queue:
+                item = heapq.heappop(queue)
+                priority, earliest, seq, zone, window_end = item
+                if earliest > now:
+                    waiting.append(item)
+                    continue
+                if now + zone.run_s > window_end:
+                    window = self._next_window(zone, now)
+                    if window is None:
+                        self.missed.append((zone, "window closed while waiting for budget"))
+                        print(f"[{clock_text(now)}] {zone.name}: MISSED (window closed)")
+                    else:
+                        waiting.append((priority, window[0], seq, zone, window[1]))
+                    continue
+                if zone.pin in busy or load_a + zone.current_a > self.budget_a:
+                    self.deferrals += 1
+                    waiting.append(item)
+                    continue
+                # The whole job (hold, aeration, soft stop) is queued on the pump's ramp engine.
+                pumps[zone.pin].run_async(zone.duration_s, zone.aeration_cycles)
+                load_a += zone.current_a
+                self.peak_a = max(self.peak_a, load_a)
+                busy.add(zone.pin)
+                heapq.heappush(running, (now + zone.run_s, seq, zone, now))
+                print(f"[{clock_text(now)}] {zone.name}: start ({zone.current_a:.1f} A, bus load {load_a:.1f}/{self.budget_a:.1f} A)")
+            for item in waiting:
+                heapq.heappush(queue, item)
+
+            wake = [running[0][0]] if running else []
+            wake += [item[1] for item in queue if item[1] > now]
+            if not wake:
+                # Everything left is blocked on budget with nothing running: cannot happen
+                # (each zone fits alone), but never spin, and never drop a zone unreported.
+                self._give_up(now, [zone for _, _, _, zone, _ in sorted(queue)], "never fit the bus budget")
+                break
+            try:
+                clock.sleep_until(min(wake))
+            except KeyboardInterrupt:
+                # main() stops the pumps; the report still lists what never finished.
+                self._give_up(clock.now(), [zone for _, _, zone, _ in sorted(running)] +
+                              [zone for _, _, _, zone, _ in sorted(queue)], "interrupted by user")
+                raise
+        return self.timeline
+
+    def _give_up(self, now, zones, reason):
+        for zone in zones:
+            self.missed.append((zone, reason))
+            print(f"[{clock_text(now)}] {zone.name}: MISSED ({reason})")
+
+    def _abort(self, now, pumps, running, queue, reason):
+        print(f"[{clock_text(now)}] CRITICAL: {reason}. Stopping all pumps.")
+        for pump in pumps.values():
+            pump.emergency_stop()
+        self._give_up(now, [zone for _, _, zone, _ in sorted(running)] +
+                      [zone for _, _, _, zone, _ in sorted(queue)], reason)
+
+    def report(self):
+        print("\n--- Irrigation Report ---")
+        print(f"  Budget: {self.budget_a:.1f} A of {self.breaker_a:.0f} A breaker on {self.bus_v:.0f} V bus "
+              f"({self.budget_a * self.bus_v:.0f} W)")
+        for zone, start, end in sorted(self.timeline, key=lambda r: r[1]):
+            print(f"  {zone.name:<12} {clock_text(start)} - {clock_text(end)}  {zone.current_a:5.1f} A")
+        for zone, reason in self.missed:
+            print(f"  {zone.name:<12} MISSED: {reason}")
+        print(f"  Peak load: {self.peak_a:.1f} A ({self.peak_a * self.bus_v:.0f} W) | deferrals: {self.deferrals}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aegis Gardener irrigation planner")
+    parser.add_argument("--plan", help="JSON plan file (default: built-in demo plan).")
+    parser.add_argument("--dry-run", action="store_true", help="Record pump commands on a compressed clock.")
+    parser.add_argument("--speed", type=float, default=DRY_RUN_SPEED,
+                        help="Dry-run plan seconds per real second (0 = instant).")
+    parser.add_argument("--start", default="00:00", help="Dry-run plan time to start from (HH:MM).")
+    parser.add_argument("--no-safety-bus", action="store_true",
+                        help="Live runs: do not obey E-stops on the shared safety bus.")
+    args = parser.parse_args()
+
+    zones = load_plan(args.plan or DEFAULT_PLAN)
+    planner = IrrigationPlanner(zones)
+    pins = sorted({z.pin for z in zones})
+
+    gpio = safety = None
+    if args.dry_run:
+        log = []
+        pumps = {pin: DryRunPump(pin, log) for pin in pins}
+        clock = SimClock(parse_window(f"{args.start}-23:59")[0], args.speed)
+    else:
+        import safety_bus
+        import water_pump_controller
+        gpio = water_pump_controller.GPIO
+        safety = None if args.no_safety_bus else safety_bus.SafetyBus()
+        pumps = {pin: water_pump_controller.PwmPumpController(pin=pin, gpio=gpio, safety=safety)
+                 for pin in pins}
+        clock = WallClock()
+
+    started = time.monotonic()
+    try:
+        planner.run(clock, pumps, safety)
+    except KeyboardInterrupt:
+        print("\nIrrigation interrupted by user. Stopping all pumps.")
+        for pump in pumps.values():
+            pump.emergency_stop()
+    finally:
+        for pump in pumps.values():
+            pump.cleanup(release_gpio=False)
+        if gpio is not None:
+            gpio.cleanup()
+    planner.report()
+    if args.dry_run:
+        print(f"  Dry run took {time.monotonic() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,17 @@
 import os
 import sys
-import sqlite3
 import argparse
-import datetime
-import time
 import warnings
 import re
 
+import mule_store
+import mule_governor
+import mule_personas
+
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOG_DIR = os.path.join(BASE_DIR, "logs")
-DB_PATH = os.path.join(LOG_DIR, os.path.join("data", "mule_results.db"))
+DB_PATH = mule_store.DB_PATH
 PROMPTS_DIR = os.path.join(BASE_DIR, "prompts")
 
 warnings.filterwarnings("ignore")
@@ -25,11 +26,7 @@ except ImportError:
 os.makedirs(LOG_DIR, exist_ok=True)
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute('''CREATE TABLE IF NOT EXISTS mule_audit
-                    (timestamp TEXT, prompt TEXT, status TEXT, iterations INTEGER, 
-                     specialist_feedback TEXT, proposal TEXT, model_used TEXT)''')
-    return conn
+    return mule_store.get_connection()
 
 def configure_genai():
     api_key = os.environ.get("GOOGLE_API_KEY")
@@ -105,6 +102,11 @@ def apply_code_changes(proposal):
     return True
 
 def run_orchestrator(prompt):
+    # Pre-flight: MRD violations are rejected locally, before any API call.
+    verdict = mule_governor.preflight(prompt)
+    if not verdict.ok:
+        return
+
     configure_genai()
     print(f"✅ [SETUP] DB: {DB_PATH}")
     
@@ -125,10 +127,7 @@ def run_orchestrator(prompt):
     feedback_history = []
     final_proposal = ""
     
-    try:
-        pe_persona = open(os.path.join(PROMPTS_DIR, "pe.txt")).read()
-    except:
-        pe_persona = "You are the Principal Engineer."
+    pe_persona = mule_personas.get_registry().system_instruction("PE") or "You are the Principal Engineer."
 
     chat = model.start_chat(history=[])
     chat.history.append({"role": "user", "parts": [pe_persona]})
@@ -137,7 +136,7 @@ def run_orchestrator(prompt):
     # Mission Logic
     flow = "Me -> SW -> PE -> Me (Direct)" if is_override else "Me -> SW -> PE -> Team -> PE -> Me"
     
-    current_input = f"TASK: {prompt}\nFLOW: {flow}\n{file_context}"
+    current_input = f"TASK: {prompt}\nFLOW: {flow}\n{file_context}{verdict.context()}"
     current_input += """
     INSTRUCTION: 
     1. READ the injected file context.
@@ -188,16 +187,7 @@ def run_orchestrator(prompt):
             
         current_input = f"Refine plan: {response}"
 
-    conn = get_db_connection()
-    try:
-        conn.execute("INSERT INTO mule_audit VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                     (str(datetime.datetime.now()), prompt, status, iterations, str(feedback_history), final_proposal, model_name))
-        conn.commit()
-    except:
-        conn.execute("DROP TABLE mule_audit")
-        get_db_connection().execute("INSERT INTO mule_audit VALUES (?, ?, ?, ?, ?, ?, ?)", 
-                     (str(datetime.datetime.now()), prompt, status, iterations, str(feedback_history), final_proposal, model_name)).commit()
-    conn.close()
+    mule_store.insert_audit(prompt, status, iterations, feedback_history, final_proposal, model_name)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+mule_context_cache.py
+
+Description:
+Provider-side context caching for a static prompt prefix: a role's
+persona, its MRD constraints (both from mule_personas) and the project
+files listed in PROJECT_FILES. This module uploads that prefix once per
+(model, role) as an explicit cached-content resource and refers to it by
+name on every later hop and session.
+
+Not wired into mule_orchestrator.py. Its models (gemini-2.0-flash,
+gemini-2.5-pro) only cache prefixes of 4096 tokens or more, and even the
+full MRD plus the project files and tool declarations comes to roughly
+1.3k tokens, so every hop would fall back to inline anyway. Run --sim
+with --model set to an orchestrator model to re-check the sizes as the
+MRD and docs/ grow.
+
+- The prefix is versioned by hash. A persona or MRD edit creates a new
+  cache and deletes the stale one.
+- A new session adopts a live cache an earlier session left for the same
+  (model, role, version), found by display name, instead of uploading again.
+- The TTL is extended (not re-uploaded) when a hop lands within
+  REFRESH_MARGIN_S of expiry.
+- Prefixes under the model's minimum cacheable size, and backends that
+  reject the cache, fall back to sending the prefix inline.
+- A hop that fails against its cache (evicted, expired or deleted on the
+  server) drops the handle with drop() and is retried inline by the caller.
+- Every hop records its prompt tokens, tokens served from the cache and
+  latency. summary() reports input tokens and latency saved per hop.
+
+The Gemini API does not allow tools on a request that uses cached content,
+so the tool declarations live in the cache and generate_cached() runs the
+read_file/write_file calls itself (automatic function calling needs the
+callables on the request).
+
+SimCacheBackend is an in-process stand-in with the same size and expiry
+rules, used by the tests and --sim.
+
+Usage:
+python3 mule_context_cache.py --sim
+python3 mule_context_cache.py --model gemini-2.5-flash --hops 4
+
+Dependencies:
+- google-genai (real backend only), api_key.txt
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    genai = None
+    types = None
+
+import mule_personas
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Static reference material sent with every role (paths relative to BASE_DIR).
+PROJECT_FILES = [os.path.join("docs", "system_specs.txt")]
+TTL_S = 3600
+REFRESH_MARGIN_S = 300       # Extend the TTL when a hop lands this close to expiry.
+RETRY_AFTER_S = 600          # Back off this long after the backend refuses a cache.
+MAX_TOOL_CALLS = 10          # Same budget as the SDK's automatic function calling.
+CHARS_PER_TOKEN = 4          # Estimate used for the minimum-size check.
+MIN_CACHE_TOKENS = 1024
+MIN_CACHE_TOKENS_BY_MODEL = {"gemini-2.0-flash": 4096, "gemini-2.5-pro": 4096}
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+def min_tokens(model):
+    return MIN_CACHE_TOKENS_BY_MODEL.get(model, MIN_CACHE_TOKENS)
+
+
+def load_project_files(paths=PROJECT_FILES):
+    """Project files as one context block, read once."""
+    blocks = []
+    for rel in paths:
+        try:
+            with open(os.path.join(BASE_DIR, rel), "r", encoding="utf-8") as f:
+                blocks.append(f"FILE: {rel}\n```\n{f.read()}\n```\n")
+        except OSError as e:
+            print(f"⚠️ [CACHE] Skipping project file {rel}: {e}")
+    if not blocks:
+        return ""
+    return "\n\n=== PROJECT FILES ===\n" + "".join(blocks)
+
+
+class CacheHandle:
+    def __init__(self, name, expires_at, tokens, version):
+        self.name = name
+        self.expires_at = expires_at
+        self.tokens = tokens
+        self.version = version
+        self.refreshes = 0
+
+
+class GenaiCacheBackend:
+    """client.caches from google-genai."""
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, model, prefix, functions, ttl_s, display_name=""):
+        tools = None
+        if functions:
+            tools = [types.Tool(function_declarations=[
+                types.FunctionDeclaration.from_callable_with_api_option(callable=f) for f in functions])]
+        cache = self.client.caches.create(model=model, config=types.CreateCachedContentConfig(
+            display_name=display_name, system_instruction=prefix, tools=tools, ttl=f"{ttl_s}s"))
+        usage = cache.usage_metadata
+        tokens = usage.total_token_count if usage and usage.total_token_count else estimate_tokens(prefix)
+        return cache.name, cache.expire_time.timestamp(), tokens
+
+    def find(self, model, display_name):
+        for cache in self.client.caches.list():
+            if cache.display_name == display_name and (cache.model or "").split("/")[-1] == model:
+                usage = cache.usage_metadata
+                return cache.name, cache.expire_time.timestamp(), (usage.total_token_count or 0) if usage else 0
+        return None
+
+    def update(self, name, ttl_s):
+        cache = self.client.caches.update(name=name, config=types.UpdateCachedContentConfig(ttl=f"{ttl_s}s"))
+        return cache.expire_time.timestamp()
+
+    def delete(self, name):
+        self.client.caches.delete(name=name)
+
+
+class SimCacheBackend:
+    """In-process stand-in for client.caches: same minimum size and expiry rules."""
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.entries = {}
+        self.labels = {}
+        self.calls = {"create": 0, "find": 0, "update": 0, "delete": 0}
+
+    def create(self, model, prefix, functions, ttl_s, display_name=""):
+        self.calls["create"] += 1
+        tokens = estimate_tokens(prefix)
+        if tokens < min_tokens(model):
+            raise ValueError(f"Cached content is too small: {tokens} < {min_tokens(model)} tokens")
+        name = f"cachedContents/sim-{self.calls['create']}"
+        self.entries[name] = self.clock() + ttl_s
+        self.labels[name] = (model, display_name, tokens)
+        return name, self.entries[name], tokens
+
+    def find(self, model, display_name):
+        self.calls["find"] += 1
+        for name, (m, label, tokens) in self.labels.items():
+            if (m, label) == (model, display_name) and self.entries.get(name, 0) > self.clock():
+                return name, self.entries[name], tokens
+        return None
+
+    def update(self, name, ttl_s):
+        self.calls["update"] += 1
+        if self.entries.get(name, 0) <= self.clock():
+            raise KeyError(f"{name} not found or expired")
+        self.entries[name] = self.clock() + ttl_s
+        return self.entries[name]
+
+    def delete(self, name):
+        self.calls["delete"] += 1
+        self.entries.pop(name, None)
+        self.labels.pop(name, None)
+
+
+class ContextCache:
+    """Cached-content handles per (model, role), plus per-hop savings.
+
+    backend=None disables caching: every hop sends its prefix inline but is
+    still measured, which is the baseline summary() compares against."""
+    def __init__(self, backend=None, functions=(), project_files=PROJECT_FILES,
+                 ttl_s=TTL_S, refresh_margin_s=REFRESH_MARGIN_S, clock=time.time):
+        self.backend = backend
+        self.functions = list(functions)
+        self.project_context = load_project_files(project_files)
+        self.ttl_s = ttl_s
+        self.refresh_margin_s = refresh_margin_s
+        self.clock = clock
+        self.hops = []
+        self._handles = {}
+        self._skip = {}
+
+    def prefix(self, instruction):
+        """The full static prefix for a role's system instruction."""
+        return instruction + self.project_context
+
+    def handle_for(self, model, role, instruction):
+        """A live cache handle for this prefix, or None to send it inline."""
+        if self.backend is None or not instruction:
+            return None
+        prefix = self.prefix(instruction)
+        version = hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:12]
+        key, now = (model, role), self.clock()
+        display_name = f"aegis-{role}-{version}"
+        handle = self._handles.get(key)
+        if handle is not None and handle.version != version:
+            # The persona or the MRD changed: the old prefix is dead weight.
+            self.drop(model, role)
+            handle = None
+        if handle is None and self._skip.get((model, version), 0) <= now:
+            handle = self._adopt(key, display_name, version)
+        if handle is not None:
+            if now < handle.expires_at - self.refresh_margin_s:
+                return handle
+            try:
+                handle.expires_at = self.backend.update(handle.name, self.ttl_s)
+                handle.refreshes += 1
+                return handle
+            except Exception as e:
+                print(f"⚠️ [CACHE] Could not extend {handle.name} ({e}). Re-creating.")
+                del self._handles[key]
+
+        if self._skip.get((model, version), 0) > now:
+            return None
+        if estimate_tokens(prefix) < min_tokens(model):
+            self._skip[(model, version)] = float("inf")
+            return None
+        try:
+            name, expires_at, tokens = self.backend.create(model, prefix, self.functions, self.ttl_s,
+                                                           display_name=display_name)
+        except Exception as e:
+            print(f"⚠️ [CACHE] {model} refused the {role} prefix ({e}). Sending it inline.")
+            self._skip[(model, version)] = now + RETRY_AFTER_S
+            return None
+        handle = CacheHandle(name, expires_at, tokens, version)
+        self._handles[key] = handle
+        return handle
+
+    def _adopt(self, key, display_name, version):
+        """A live cache an earlier session created for this exact prefix, if any."""
+        try:
+            found = self.backend.find(key[0], display_name)
+        except Exception as e:
+            print(f"⚠️ [CACHE] Could not list cached contents ({e}).")
+            return None
+        if found is None:
+            return None
+        handle = self._handles[key] = CacheHandle(*found, version)
+        return handle
+
+    def drop(self, model, role):
+        """Forgets (and deletes, if it still exists) the handle for a role, e.g.
+        after a hop against it failed; the next handle_for() starts over."""
+        handle = self._handles.pop((model, role), None)
+        if handle is not None:
+            try:
+                self.backend.delete(handle.name)
+            except Exception:
+                pass
+
+    def record(self, role, model, handle, usage, latency_ms):
+        """Logs one hop from its response.usage_metadata."""
+        self.hops.append({
+            "role": role, "model": model, "cached": handle is not None,
+            "prompt_tokens": (getattr(usage, "prompt_token_count", None) or 0) if usage else 0,
+            "cached_tokens": (getattr(usage, "cached_content_token_count", None) or 0) if usage else 0,
+            "latency_ms": latency_ms,
+        })
+
+    def summary(self):
+        cached = [h for h in self.hops if h["cached"]]
+        inline = [h for h in self.hops if not h["cached"]]
+        tokens_saved = sum(h["cached_tokens"] for h in self.hops)
+        latency_saved = None
+        if cached and inline:
+            latency_saved = (sum(h["latency_ms"] for h in inline) / len(inline)
+                             - sum(h["latency_ms"] for h in cached) / len(cached))
+        return {
+            "hops": len(self.hops),
+            "cached_hops": len(cached),
+            "prompt_tokens": sum(h["prompt_tokens"] for h in self.hops),
+            "tokens_saved": tokens_saved,
+            "tokens_saved_per_hop": tokens_saved / len(cached) if cached else 0.0,
+            "latency_saved_ms_per_hop": latency_saved,
+        }
+
+    def describe(self):
+        s = self.summary()
+        latency = (f", {s['latency_saved_ms_per_hop']:.0f} ms saved/hop vs inline"
+                   if s["latency_saved_ms_per_hop"] is not None else "")
+        return (f"{s['cached_hops']}/{s['hops']} hops cached, {s['tokens_saved']} of "
+                f"{s['prompt_tokens']} input tokens from cache "
+                f"({s['tokens_saved_per_hop']:.0f}/hop){latency}")
+
+
+def generate_cached(client, model, contents, handle, functions):
+    """generate_content against a cached prefix, running tool calls by hand."""
+    config = types.GenerateContentConfig(
+        cached_content=handle.name,
+        automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True))
+    by_name = {f.__name__: f for f in functions}
+    contents = list(contents)
+    response = None
+    for _ in range(MAX_TOOL_CALLS):
+        response = client.models.generate_content(model=model, contents=contents, config=config)
+        content = response.candidates[0].content if response.candidates else None
+        calls = [p.function_call for p in (content.parts or []) if p.function_call] if content else []
+        if not calls:
+            break
+        parts = []
+        for call in calls:
+            func = by_name.get(call.name)
+            try:
+                result = {"result": func(**(call.args or {}))} if func else {"error": f"Unknown function {call.name}"}
+            except Exception as e:
+                result = {"error": str(e)}
+            parts.append(types.Part.from_function_response(name=call.name, response=result))
+        contents += [content, types.Content(role="user", parts=parts)]
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aegis Gardener context cache: prefix sizes and savings")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--role", default="PE")
+    parser.add_argument("--hops", type=int, default=4, help="Hops to time each way (real backend).")
+    parser.add_argument("--sim", action="store_true", help="Size check against the simulated backend only.")
+    args = parser.parse_args()
+
+    personas = mule_personas.PersonaRegistry()
+    if args.sim:
+        cache = ContextCache(SimCacheBackend())
+        for role in personas.role_files:
+            instruction = personas.system_instruction(role)
+            handle = cache.handle_for(args.model, role, instruction)
+            tokens = estimate_tokens(cache.prefix(instruction))
+            state = f"cached as {handle.name}" if handle else f"inline (< {min_tokens(args.model)})"
+            print(f"  {role:3} ~{tokens:6d} tokens  {state}")
+        return
+
+    if genai is None:
+        print("🛑 [ERROR] google-genai is not installed. Use --sim.")
+        sys.exit(1)
+    with open(os.path.join(BASE_DIR, "api_key.txt"), "r") as f:
+        client = genai.Client(api_key=f.read().strip())
+    cache = ContextCache(GenaiCacheBackend(client))
+    instruction = personas.system_instruction(args.role)
+    contents = [{"role": "user", "parts": [{"text": "Reply with the single word: ready."}]}]
+    for use_cache in (False, True):
+        for _ in range(args.hops):
+            handle = cache.handle_for(args.model, args.role, instruction) if use_cache else None
+            started = time.monotonic()
+            if handle is not None:
+                response = generate_cached(client, args.model, contents, handle, [])
+            else:
+                response = client.models.generate_content(
+                    model=args.model, contents=contents,
+                    config=types.GenerateContentConfig(system_instruction=cache.prefix(instruction)))
+            cache.record(args.role, args.model, handle, response.usage_metadata, (time.monotonic() - started) * 1000)
+    print(f"✅ [CACHE] {args.role} on {args.model}: {cache.describe()}")
+    for handle in cache._handles.values():
+        cache.backend.delete(handle.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,516 @@
+"""
+mule_export.py
+
+Snapshots MuleLab audit data into a columnar store so reports can be computed
+with vectorized NumPy operations instead of re-reading SQLite and CSV rows.
+
+Sources:
+- mule_audit table (mule_store)            -> table "audit"
+- logs/dev_log_*.txt session logs          -> table "sessions"
+- logs/mule_test_audit.csv                 -> table "tests"
+
+Each export only appends what is new since the last run (rowid watermark,
+last session file, CSV byte offset) as a new part file. Parts are Parquet
+when pyarrow is installed, Arrow IPC when only pyarrow.feather is, and a
+compressed NumPy .npz otherwise.
+
+Usage:
+    python3 mule_export.py             # incremental export of all sources
+    python3 mule_export.py --rebuild   # drop the snapshot and start over
+    python3 mule_export.py --compact   # merge part files per table
+"""
+
+import os
+import io
+import re
+import csv
+import sys
+import glob
+import json
+import shutil
+import argparse
+from datetime import datetime
+
+import mule_store
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    try:
+        import pyarrow.parquet as pq
+        FORMAT = "parquet"
+    except ImportError:
+        import pyarrow.feather as feather
+        FORMAT = "arrow"
+except ImportError:
+    pa = None
+    FORMAT = "npz"
+
+# --- CONFIGURATION ---
+BASE_DIR = mule_store.BASE_DIR
+LOG_DIR = mule_store.LOG_DIR
+EXPORT_NAME = "columnar"  # Kept next to the database it snapshots.
+TEST_AUDIT_CSV = os.path.join(LOG_DIR, "mule_test_audit.csv")
+SESSION_GLOB = os.path.join(LOG_DIR, "dev_log_*.txt")
+EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "npz": ".npz"}
+
+# Specialist roles in bit order. A set of roles is stored as one int mask.
+ROLES = ("PE", "ME", "SW", "PM", "QA", "TW")
+ROLE_BITS = {r: 1 << i for i, r in enumerate(ROLES)}
+ROLE_PATTERN = re.compile(r"\b(" + "|".join(ROLES) + r")\b")
+
+# Column kinds: "int"/"float" are plain arrays, "category" is dictionary
+# encoded (codes + categories), "text" is UTF-8 data + offsets.
+SCHEMAS = {
+    "audit": {"rowid": "int", "timestamp": "float", "status": "category",
+              "iterations": "int", "model_used": "category", "prompt": "text",
+              "specialist_feedback": "text", "proposal": "text"},
+    "sessions": {"timestamp": "float", "file": "text", "user": "text",
+                 "expert_path": "text", "roles_mask": "int", "hops": "int",
+                 "model": "category", "latency_ms": "float", "escalated": "int"},
+    "tests": {"timestamp": "float", "prompt": "text", "expected_mask": "int",
+              "actual_mask": "int", "hops": "int", "status": "category",
+              "failure_reason": "text"},
+}
+
+
+def export_dir():
+    """The snapshot directory beside mule_store's resolved database."""
+    return os.path.join(os.path.dirname(mule_store.resolve_db_path()), EXPORT_NAME)
+
+
+def _manifest_path():
+    return os.path.join(export_dir(), "manifest.json")
+
+
+def roles_to_mask(text):
+    """Encodes every known role mentioned in text as a bitmask."""
+    mask = 0
+    for role in ROLE_PATTERN.findall(text or ""):
+        mask |= ROLE_BITS[role]
+    return mask
+
+
+def _parse_ts(value):
+    try:
+        return datetime.fromisoformat(value.strip()).timestamp()
+    except (AttributeError, ValueError):
+        return float("nan")
+
+
+def _require_numpy():
+    if np is None:
+        print("🛑 [ERROR] Missing library: numpy (pip install numpy)")
+        sys.exit(1)
+
+
+# --- IN-MEMORY COLUMNS ---
+
+class Category:
+    """Dictionary-encoded column: int codes into a small category array."""
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def mask(self, value):
+        hit = np.flatnonzero(self.categories == value)
+        if not len(hit):
+            return np.zeros(len(self.codes), dtype=bool)
+        return self.codes == hit[0]
+
+    def counts(self):
+        totals = np.bincount(self.codes, minlength=len(self.categories))
+        return dict(zip(self.categories.tolist(), totals.tolist()))
+
+
+class Text:
+    """Variable-length strings stored as one UTF-8 buffer plus offsets."""
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [(v or "").encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+def _empty(kind, n=0):
+    """Column of n default values; also fills columns added after a part was written."""
+    if kind == "int":
+        return np.zeros(n, dtype=np.int64)
+    if kind == "float":
+        return np.full(n, np.nan)
+    if kind == "category":
+        return Category(np.zeros(n, dtype=np.int32), np.asarray([""] if n else [], dtype=str))
+    return Text(np.zeros(n + 1, dtype=np.int64), np.zeros(0, dtype=np.uint8))
+
+
+def _concat(kind, pieces):
+    if kind in ("int", "float"):
+        return np.concatenate(pieces)
+    if kind == "category":
+        categories = np.unique(np.concatenate([p.categories for p in pieces]))
+        codes = [np.searchsorted(categories, p.categories)[p.codes] for p in pieces]
+        return Category(np.concatenate(codes).astype(np.int32), categories)
+    shifts = np.cumsum([0] + [int(p.offsets[-1]) for p in pieces[:-1]])
+    offsets = [pieces[0].offsets[:1]] + [p.offsets[1:] + s for p, s in zip(pieces, shifts)]
+    return Text(np.concatenate(offsets), np.concatenate([p.data for p in pieces]))
+
+
+# --- PART FILES ---
+
+def _manifest():
+    path = _manifest_path()
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"format": FORMAT, "tables": {}}
+
+
+def _save_manifest(manifest):
+    path = _manifest_path()
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _write_part(manifest, name, columns):
+    """Writes one batch (dict of python lists) as the next part of a table."""
+    state = manifest["tables"].setdefault(name, {"parts": []})
+    part = f"{name}-{len(state['parts']) + 1:05d}{EXTENSIONS[FORMAT]}"
+    path = os.path.join(export_dir(), part)
+    schema = SCHEMAS[name]
+
+    if FORMAT == "npz":
+        arrays = {}
+        for col, kind in schema.items():
+            values = columns[col]
+            if kind == "int":
+                arrays[col] = np.asarray(values, dtype=np.int64)
+            elif kind == "float":
+                arrays[col] = np.asarray(values, dtype=np.float64)
+            elif kind == "category":
+                cats, codes = np.unique(np.asarray([v or "" for v in values], dtype=str), return_inverse=True)
+                arrays[col + ".codes"], arrays[col + ".cats"] = codes.astype(np.int32), cats
+            else:
+                text = Text.from_strings(values)
+                arrays[col + ".offsets"], arrays[col + ".data"] = text.offsets, text.data
+        np.savez_compressed(path, **arrays)
+    else:
+        arrow_cols = {}
+        for col, kind in schema.items():
+            values = columns[col]
+            if kind == "int":
+                arrow_cols[col] = pa.array(values, type=pa.int64())
+            elif kind == "float":
+                arrow_cols[col] = pa.array(values, type=pa.float64())
+            elif kind == "category":
+                arrow_cols[col] = pa.array([v or "" for v in values], type=pa.string()).dictionary_encode()
+            else:
+                arrow_cols[col] = pa.array([v or "" for v in values], type=pa.string())
+        table = pa.table(arrow_cols)
+        if FORMAT == "parquet":
+            pq.write_table(table, path)
+        else:
+            feather.write_feather(table, path)
+
+    state["parts"].append(part)
+    state["rows"] = state.get("rows", 0) + len(columns[next(iter(schema))])
+
+
+def _first_key(files):
+    """An .npz key whose length is the part's row count."""
+    for key in files:
+        if "." not in key or key.endswith(".codes"):
+            return key
+    return files[0]
+
+
+def _read_part(path, name, wanted):
+    schema = SCHEMAS[name]
+    out = {}
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as z:
+            keys = {k.split(".")[0] for k in z.files}
+            rows = len(z[_first_key(z.files)])
+            for col in wanted:
+                kind = schema[col]
+                if col not in keys:
+                    out[col] = _empty(kind, rows)
+                elif kind in ("int", "float"):
+                    out[col] = z[col]
+                elif kind == "category":
+                    out[col] = Category(z[col + ".codes"], z[col + ".cats"])
+                else:
+                    out[col] = Text(z[col + ".offsets"], z[col + ".data"])
+        return out
+
+    reader = pq if path.endswith(".parquet") else feather
+    present = set(pq.read_schema(path).names if reader is pq else pa.ipc.open_file(path).schema.names)
+    table = reader.read_table(path, columns=[c for c in wanted if c in present])
+    for col in wanted:
+        kind = schema[col]
+        if col not in present:
+            out[col] = _empty(kind, table.num_rows)
+            continue
+        column = table.column(col).combine_chunks()
+        if kind in ("int", "float"):
+            out[col] = column.to_numpy()
+        elif kind == "category":
+            if not pa.types.is_dictionary(column.type):
+                column = column.dictionary_encode()
+            out[col] = Category(column.indices.to_numpy().astype(np.int32),
+                                np.asarray(column.dictionary.to_pylist(), dtype=str))
+        else:
+            out[col] = Text.from_strings(column.to_pylist())
+    return out
+
+
+def load_table(name, columns=None):
+    """Loads an exported table as a dict of column arrays (all parts merged)."""
+    _require_numpy()
+    schema = SCHEMAS[name]
+    wanted = list(columns or schema)
+    parts = _manifest()["tables"].get(name, {}).get("parts", [])
+    pieces = [_read_part(os.path.join(export_dir(), p), name, wanted) for p in parts]
+    if not pieces:
+        return {c: _empty(schema[c]) for c in wanted}
+    return {c: _concat(schema[c], [p[c] for p in pieces]) for c in wanted}
+
+
+# --- EXPORTERS ---
+
+def export_audit(manifest):
+    state = manifest["tables"].setdefault("audit", {"parts": []})
+    last_rowid = state.get("last_rowid", 0)
+    conn = mule_store.get_connection()
+    rows = conn.execute('''SELECT rowid, timestamp, status, iterations, model_used, prompt,
+                                  specialist_feedback, proposal
+                           FROM mule_audit WHERE rowid > ? ORDER BY rowid''', (last_rowid,)).fetchall()
+    if not rows:
+        return 0
+    cols = list(SCHEMAS["audit"])
+    batch = {c: [r[i] for r in rows] for i, c in enumerate(cols)}
+    batch["timestamp"] = [_parse_ts(v) for v in batch["timestamp"]]
+    batch["iterations"] = [v or 0 for v in batch["iterations"]]
+    _write_part(manifest, "audit", batch)
+    state["last_rowid"] = rows[-1][0]
+    return len(rows)
+
+
+def _parse_session(path):
+    header = {}
+    with open(path, errors="replace") as f:
+        for line in f:
+            if line.startswith("--- RESPONSE ---"):
+                break
+            key, _, value = line.partition(":")
+            header[key.strip()] = value.strip()
+        body = f.read()
+    match = re.search(r"\[Model:\s*(\w+)\]", body)
+    model = header.get("MODEL") or (match.group(1) if match else "")
+    roles = [r.strip() for r in header.get("EXPERT_PATH", "").split("➔") if r.strip()]
+    try:
+        latency_ms = float(header.get("LATENCY_MS", "nan"))
+    except ValueError:
+        latency_ms = float("nan")
+    return {"timestamp": _parse_ts(header.get("TIMESTAMP", "")), "file": os.path.basename(path),
+            "user": header.get("USER", ""), "expert_path": " ➔ ".join(roles),
+            "roles_mask": roles_to_mask(" ".join(roles)), "hops": len(roles),
+            "model": model, "latency_ms": latency_ms,
+            # Older logs lack the flag; a PRO run there can only have come from escalation.
+            "escalated": int(header.get("ESCALATED", "yes" if model == "PRO" else "no") == "yes")}
+
+
+def export_sessions(manifest, pattern=SESSION_GLOB):
+    state = manifest["tables"].setdefault("sessions", {"parts": []})
+    last_file = state.get("last_file", "")
+    new_files = sorted(p for p in glob.glob(pattern) if os.path.basename(p) > last_file)
+    if not new_files:
+        return 0
+    records = [_parse_session(p) for p in new_files]
+    _write_part(manifest, "sessions", {c: [r[c] for r in records] for c in SCHEMAS["sessions"]})
+    state["last_file"] = os.path.basename(new_files[-1])
+    return len(records)
+
+
+def _complete_records(data):
+    """Yields (values, bytes consumed) for each complete CSV record in data.
+
+    Quoted fields may span lines, so records are cut where csv.reader ends
+    them, not at every newline. A trailing record that is unterminated or
+    still inside quotes (a writer may be mid-row) is left for the next run.
+    """
+    fed = [0]
+    def lines():
+        for line in io.BytesIO(data):
+            if not line.endswith(b"\n"):
+                break
+            fed[0] += len(line)
+            yield line.decode("utf-8", errors="replace")
+        fed[0] = None  # The reader asked past the last whole line.
+    for values in csv.reader(lines()):
+        if fed[0] is None:
+            return
+        yield values, fed[0]
+
+
+def export_tests(manifest, csv_path=TEST_AUDIT_CSV):
+    state = manifest["tables"].setdefault("tests", {"parts": []})
+    if not os.path.exists(csv_path):
+        return 0
+    source = os.path.abspath(csv_path)
+    if state.get("source") not in (None, source) or os.path.getsize(csv_path) < state.get("offset", 0):
+        # Different or truncated file: the snapshot no longer matches, start over.
+        _drop_table(manifest, "tests")
+        state = manifest["tables"].setdefault("tests", {"parts": []})
+    state["source"] = source
+
+    with open(csv_path, "rb") as f:
+        f.seek(state.get("offset", 0))
+        chunk = f.read()
+
+    batch = {c: [] for c in SCHEMAS["tests"]}
+    consumed = 0
+    for values, consumed in _complete_records(chunk):
+        if "header" not in state:
+            state["header"] = values
+            continue
+        if not values:
+            continue
+        row = dict(zip(state["header"], values))
+        actual = row.get("Actual", "")
+        batch["timestamp"].append(_parse_ts(row.get("Timestamp", "")))
+        batch["prompt"].append(row.get("Prompt", ""))
+        batch["expected_mask"].append(roles_to_mask(row.get("Expected", "")))
+        batch["actual_mask"].append(roles_to_mask(actual))
+        batch["hops"].append(len([r for r in actual.split("➔") if r.strip()]))
+        batch["status"].append(row.get("Status", ""))
+        batch["failure_reason"].append(row.get("Failure_Reason", ""))
+    if batch["status"]:
+        _write_part(manifest, "tests", batch)
+    state["offset"] = state.get("offset", 0) + consumed
+    return len(batch["status"])
+
+
+def _drop_table(manifest, name):
+    for part in manifest["tables"].pop(name, {}).get("parts", []):
+        path = os.path.join(export_dir(), part)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def export_all(csv_path=TEST_AUDIT_CSV, sources=("audit", "sessions", "tests")):
+    """Appends everything new since the last export. Returns rows added per table."""
+    _require_numpy()
+    os.makedirs(export_dir(), exist_ok=True)
+    manifest = _manifest()
+    added = {}
+    if "audit" in sources:
+        added["audit"] = export_audit(manifest)
+    if "sessions" in sources:
+        added["sessions"] = export_sessions(manifest)
+    if "tests" in sources:
+        added["tests"] = export_tests(manifest, csv_path)
+    _save_manifest(manifest)
+    return added
+
+
+def compact():
+    """Merges each table's parts into a single part file."""
+    _require_numpy()
+    manifest = _manifest()
+    for name in list(manifest["tables"]):
+        state = manifest["tables"][name]
+        if len(state.get("parts", [])) < 2:
+            continue
+        merged = load_table(name)
+        batch = {}
+        for col, kind in SCHEMAS[name].items():
+            column = merged[col]
+            if kind in ("int", "float"):
+                batch[col] = column.tolist()
+            elif kind == "category":
+                batch[col] = column.categories[column.codes].tolist()
+            else:
+                batch[col] = [column[i] for i in range(len(column))]
+        old_parts = state["parts"]
+        state["parts"], state["rows"] = [], 0
+        _write_part(manifest, name, batch)
+        _save_manifest(manifest)
+        for part in old_parts:
+            path = os.path.join(export_dir(), part)
+            if part not in state["parts"] and os.path.exists(path):
+                os.remove(path)
+
+
+# --- VECTORIZED ANALYTICS ---
+
+def role_counts(masks):
+    """Counts how many masks contain each role."""
+    masks = np.asarray(masks, dtype=np.int64)
+    bits = (masks[:, None] >> np.arange(len(ROLES))) & 1
+    return dict(zip(ROLES, bits.sum(axis=0).tolist()))
+
+
+def audit_summary(table, mask=None):
+    """Success rate and average iterations, optionally over a boolean row mask."""
+    validated = table["status"].mask("VALIDATED")
+    iterations = table["iterations"]
+    if mask is not None:
+        validated, iterations = validated[mask], iterations[mask]
+    total = len(iterations)
+    if not total:
+        return {"total": 0, "success_rate": 0.0, "avg_iterations": 0.0}
+    return {"total": total, "success_rate": int(validated.sum()) / total * 100,
+            "avg_iterations": float(iterations.mean())}
+
+
+def test_summary(table):
+    total = len(table["expected_mask"])
+    passed = table["status"].mask("PASS")
+    failed_missing = (table["expected_mask"] & ~table["actual_mask"])[~passed]
+    passes = int(passed.sum())
+    return {"total": total, "passes": passes, "fails": total - passes,
+            "success_rate": passes / total * 100 if total else 0.0,
+            "missing": role_counts(failed_missing)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export MuleLab audit data to a columnar snapshot")
+    parser.add_argument("--rebuild", action="store_true", help="Discard the snapshot and export from scratch.")
+    parser.add_argument("--compact", action="store_true", help="Merge part files after exporting.")
+    parser.add_argument("--csv", default=TEST_AUDIT_CSV, help="Test audit CSV to export.")
+    args = parser.parse_args()
+
+    _require_numpy()
+    if args.rebuild and os.path.isdir(export_dir()):
+        shutil.rmtree(export_dir())
+    added = export_all(args.csv)
+    for name, count in added.items():
+        print(f"📦 [EXPORT] {name:<9} +{count} rows")
+    if args.compact:
+        compact()
+        print("🗜️  [EXPORT] Parts compacted.")
+    print(f"✅ [EXPORT] {FORMAT} snapshot at {export_dir()}")
+
+
+if __name__ == "__main__":
+    main()
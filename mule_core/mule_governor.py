@@ -0,0 +1,230 @@
+"""
+mule_governor.py - Hardware-Safety-Governor (pre-flight violation check).
+
+Checks a prompt against the Master Requirements Database before any model
+call. All logic_trigger keywords from data/requirements.csv (via the mule_mrd
+cache) are compiled into a single regex, rebuilt only when the file changes,
+so a check is two scans of the prompt and a few comparisons (microseconds,
+not a round-trip).
+
+- Keywords select the requirements the prompt is about ("haul" -> MECH-TOW-01).
+- Quantities with units ("500lbs", "150 kg", "3.5 A") are normalised and
+  compared with the threshold of the requirement they refer to: the nearest
+  trigger in the same clause whose unit is in the same family ("latency under
+  40 ms, runtime 3 hours" checks 40 ms against SOFT-LAT-MAX only). Only a
+  quantity past a max limit is a TECHNICAL_CONSTRAINT_VIOLATION and rejects the
+  prompt locally. Min requirements describe the design ("2 hours of runtime"),
+  not what a task may ask for ("run a 1 hour test"), so they are context only.
+- The matched requirement IDs are rendered as a constraints block to inject
+  into the model context (what prompts/gatekeeper.txt asks the LLM to do).
+
+preflight() is the entry point for callers: it checks the prompt and logs a
+rejection to mule_audit as GOVERNOR_REJECTED.
+
+Usage:
+    python3 mule_governor.py "Haul 500lbs of mulch up the north slope"
+    python3 mule_governor.py --bench
+"""
+
+import re
+import bisect
+import sys
+import time
+import argparse
+
+import mule_mrd
+import mule_store
+
+# --- CONFIGURATION ---
+VIOLATION = "TECHNICAL_CONSTRAINT_VIOLATION"
+
+# unit spelling -> (family, factor to the family's base unit)
+UNITS = {
+    "lbs": ("mass", 1.0), "lb": ("mass", 1.0), "pound": ("mass", 1.0), "pounds": ("mass", 1.0),
+    "kg": ("mass", 2.20462), "kgs": ("mass", 2.20462),
+    "mm": ("length", 1.0), "cm": ("length", 10.0), "m": ("length", 1000.0), "meter": ("length", 1000.0),
+    "meters": ("length", 1000.0), "inch": ("length", 25.4), "inches": ("length", 25.4), '"': ("length", 25.4),
+    "ft": ("length", 304.8), "feet": ("length", 304.8), "foot": ("length", 304.8),
+    "a": ("current", 1.0), "amp": ("current", 1.0), "amps": ("current", 1.0), "ma": ("current", 0.001),
+    "v": ("voltage", 1.0), "volt": ("voltage", 1.0), "volts": ("voltage", 1.0),
+    "percent": ("percent", 1.0), "%": ("percent", 1.0),
+    "ms": ("time", 0.001), "s": ("time", 1.0), "sec": ("time", 1.0), "seconds": ("time", 1.0),
+    "min": ("time", 60.0), "minutes": ("time", 60.0), "h": ("time", 3600.0), "hr": ("time", 3600.0),
+    "hrs": ("time", 3600.0), "hour": ("time", 3600.0), "hours": ("time", 3600.0),
+    "hz": ("frequency", 1.0), "khz": ("frequency", 1e3), "mhz": ("frequency", 1e6),
+    "deg": ("angle", 1.0), "degree": ("angle", 1.0), "degrees": ("angle", 1.0), "°": ("angle", 1.0),
+    "nm": ("torque", 1.0), "acre": ("area", 1.0), "acres": ("area", 1.0),
+    "sq_inch": ("sq_inch", 1.0), "count": ("count", 1.0),
+}
+# Bare single letters that are also words ("a", "s", "m", "h") only count
+# right after a number; amps must be a capital A so "5 a day" is not current.
+_UNIT_PATTERN = "|".join(sorted((re.escape(u) for u in UNITS if u not in ("a", "v")), key=len, reverse=True))
+CLAUSE_RE = re.compile(r"[;,!?\n]|\.(?!\d)|\band\b", re.IGNORECASE)
+QUANTITY_RE = re.compile(
+    r"(?<![\w.])(\d+(?:\.\d+)?)\s?-?\s?(" + _UNIT_PATTERN + r"|(?-i:A)|(?-i:V)|v)(?![\w])", re.IGNORECASE)
+
+# How a threshold limits a request, read from the description's wording.
+# Anything else (targets, nominal values, specs) is injected as context only.
+MIN_WORDS = ("min ", "minimum")
+MAX_WORDS = ("max ", "max.", "capacity", "rating", "up to", "holding", "< ")
+
+
+class Requirement:
+    def __init__(self, req_id, category, threshold, unit, triggers, description):
+        self.req_id = req_id
+        self.category = category
+        self.threshold = threshold
+        self.unit = unit
+        self.triggers = triggers
+        self.description = description
+        self.family, self.factor = UNITS.get(unit.lower(), (None, 1.0))
+        text = description.lower()
+        if any(w in text for w in MIN_WORDS):
+            self.kind = "min"
+        elif any(w in text for w in MAX_WORDS):
+            self.kind = "max"
+        else:
+            self.kind = None
+
+    @classmethod
+    def from_row(cls, row):
+        """From a mule_mrd row: (req_id, category, threshold, unit, logic_trigger, description)."""
+        req_id, category, threshold, unit, logic_trigger, description = row
+        return cls(req_id, category, threshold, unit, logic_trigger.split(","), description)
+
+    def describe(self):
+        limit = {"min": "min ", "max": "max "}.get(self.kind, "")
+        return f"{self.req_id}: {limit}{self.threshold:g} {self.unit} ({self.description})"
+
+
+class Verdict:
+    """Result of Governor.check(): matched requirement IDs, extracted quantities and violations."""
+    def __init__(self, matched, quantities, violations, elapsed_us):
+        self.matched = matched
+        self.quantities = quantities
+        self.violations = violations
+        self.elapsed_us = elapsed_us
+
+    @property
+    def ok(self):
+        return not self.violations
+
+    def context(self):
+        """Constraints block for the model context (empty if nothing matched)."""
+        if not self.matched:
+            return ""
+        lines = [f"- {req.describe()}" for req in self.matched]
+        return "\n\n=== MRD CONSTRAINTS (local governor) ===\n" + "\n".join(lines) + "\n"
+
+    def rejection(self):
+        return f"🛑 [GOVERNOR] {VIOLATION}: " + "; ".join(self.violations)
+
+
+def load_requirements(path=mule_mrd.CSV_PATH):
+    return [Requirement.from_row(row) for row in mule_mrd.parse(path)[0]]
+
+
+class Governor:
+    def __init__(self, requirements):
+        self.requirements = requirements
+        self._by_trigger = {}
+        for req in requirements:
+            for trigger in req.triggers:
+                self._by_trigger.setdefault(trigger, []).append(req)
+        # One alternation for every trigger, longest first so "sensor_fusion" beats "sensor".
+        keywords = sorted(self._by_trigger, key=len, reverse=True)
+        self._keyword_re = re.compile(r"(?<![\w])(" + "|".join(map(re.escape, keywords)) + r")(?![\w])",
+                                      re.IGNORECASE)
+
+    @classmethod
+    def from_csv(cls, path=mule_mrd.CSV_PATH):
+        return cls(load_requirements(path))
+
+    def check(self, prompt):
+        started = time.perf_counter_ns()
+        matched, seen, hits = [], set(), []
+        for m in self._keyword_re.finditer(prompt):
+            reqs = self._by_trigger[m.group(1).lower()]
+            hits.append((m.start(), reqs))
+            for req in reqs:
+                if req.req_id not in seen:
+                    seen.add(req.req_id)
+                    matched.append(req)
+
+        quantities, violations = [], []
+        if not hits:
+            return Verdict(matched, quantities, violations, (time.perf_counter_ns() - started) / 1000)
+        breaks = [b.start() for b in CLAUSE_RE.finditer(prompt)]
+        for m in QUANTITY_RE.finditer(prompt):
+            family, factor = UNITS[m.group(2).lower()]
+            value = float(m.group(1)) * factor
+            quantities.append((m.group(0), family, value))
+            clause = bisect.bisect(breaks, m.start())
+            near = [(abs(pos - m.start()), req) for pos, reqs in hits
+                    if bisect.bisect(breaks, pos) == clause for req in reqs
+                    if req.kind is not None and req.family == family]
+            if not near:
+                continue
+            closest = min(d for d, _ in near)
+            for distance, req in near:
+                if distance != closest:
+                    continue
+                if req.kind == "max" and value > req.threshold * req.factor:
+                    violations.append(f"'{m.group(0)}' exceeds {req.req_id} "
+                                      f"(max {req.threshold:g} {req.unit})")
+        return Verdict(matched, quantities, violations, (time.perf_counter_ns() - started) / 1000)
+
+
+_governor = None
+_governor_version = None
+
+
+def get_governor():
+    """Shared Governor, recompiled when the requirements cache reloads."""
+    global _governor, _governor_version
+    rows = mule_mrd.CACHE.rows()
+    if _governor is None or _governor_version != mule_mrd.CACHE.version:
+        _governor = Governor([Requirement.from_row(row) for row in rows])
+        _governor_version = mule_mrd.CACHE.version
+    return _governor
+
+
+def preflight(prompt, quiet=False):
+    """Verdict for a prompt. A rejection is logged to mule_audit (and printed
+    unless quiet, for callers that return it as their response)."""
+    verdict = get_governor().check(prompt)
+    if not verdict.ok:
+        if not quiet:
+            print(verdict.rejection())
+        mule_store.insert_audit(prompt, mule_store.GOVERNOR_REJECTED, 0, verdict.violations, "", "local-governor")
+    return verdict
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aegis Gardener pre-flight requirements governor")
+    parser.add_argument("prompt", nargs="?", help="Prompt to check.")
+    parser.add_argument("--bench", action="store_true", help="Time checks of a sample prompt.")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    governor = get_governor()
+    print(f"Compiled {len(governor.requirements)} requirements / {len(governor._by_trigger)} triggers "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms.")
+    if args.bench:
+        prompt = "Haul 500lbs of mulch up a 7 degree incline and keep reflex latency under 40 ms."
+        rounds = 10000
+        started = time.perf_counter()
+        for _ in range(rounds):
+            governor.check(prompt)
+        print(f"{rounds} checks: {(time.perf_counter() - started) / rounds * 1e6:.1f} µs per check.")
+    if args.prompt:
+        verdict = governor.check(args.prompt)
+        print(f"Matched: {[r.req_id for r in verdict.matched] or 'none'} | "
+              f"quantities: {[q[0] for q in verdict.quantities] or 'none'} | {verdict.elapsed_us:.1f} µs")
+        print(verdict.rejection() if not verdict.ok else "✅ [GOVERNOR] Clear.")
+        print(verdict.context(), end="")
+        sys.exit(0 if verdict.ok else 2)
+
+
+if __name__ == "__main__":
+    main()
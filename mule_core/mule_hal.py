@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+mule_hal.py
+
+Description:
+One hardware abstraction layer for every mule_core device: GPIO, PWM, the
+INA219 current sensors on I2C, HC-SR04 ultrasonic sensors and the docking
+actuators. On the Pi, gpio() is RPi.GPIO. Everywhere else the simulator
+backend below stands in, so every module fakes hardware the same way.
+
+All simulated devices are driven by a clock:
+
+- RealClock: wall-speed. Echo edges and actuator travel happen on timer
+  threads, the way interrupts arrive on real hardware.
+- VirtualClock: deterministic discrete-event time. Nothing happens between
+  clock calls. sleep() and wait() jump straight to the next scheduled event,
+  so a single-threaded control loop (current monitor, ultrasonic pings,
+  docking moves) runs hundreds of times faster than real time and gives the
+  same result on every run. Device modules take their clock from the GPIO or
+  bus they are given, so handing them simulator(VirtualClock()) devices is
+  all it takes.
+
+Usage:
+python3 mule_hal.py                  (virtual-clock benchmark of the current monitor)
+python3 mule_hal.py --seconds 3600 --rate 1000 --trip-at 1800
+
+Four INA219 channels at 100 Hz simulate ~450x faster than real time on one
+core; at 1 kHz the detector maths dominates and it is ~45x.
+
+Dependencies:
+- RPi.GPIO (optional; simulated without it)
+"""
+
+import time
+import heapq
+import argparse
+import threading
+
+try:
+    import RPi.GPIO as _RPI_GPIO
+except ImportError:
+    _RPI_GPIO = None
+
+SIMULATED = _RPI_GPIO is None
+
+# --- Physical constants shared by the device models ---
+SPEED_OF_SOUND_CM_S = 34300
+ECHO_STARTUP_S = 0.0005      # HC-SR04 burst before the echo pin goes high.
+POLL_COST_S = 0.000001       # Virtual time one busy-poll of a pin costs.
+
+# INA219 registers and the 32V/2A calibration (0.1 ohm shunt, 0.1 mA/bit).
+REG_BUS_VOLTAGE = 0x02
+REG_CURRENT = 0x04
+REG_CALIBRATION = 0x05
+CALIBRATION_32V_2A = 4096
+CURRENT_LSB_A = 0.0001
+
+# Docking actuators and the sensors that verify them: sensor -> (actuator, position).
+ACTUATOR_TRAVEL_S = 1.0
+VERIFY_SENSORS = {
+    "alignment_pin_1_ext": ("alignment_pin_1", "extended"),
+    "alignment_pin_2_ext": ("alignment_pin_2", "extended"),
+    "clamp_1_locked": ("clamp_1", "locked"),
+    "clamp_2_locked": ("clamp_2", "locked"),
+}
+STATIC_SENSORS = {"vehicle_presence_f": 1.0, "vehicle_presence_r": 1.0, "battery_bms_status": "OK"}
+
+
+# --- Clocks ---
+
+class RealClock:
+    virtual = False
+
+    def now_ns(self):
+        return time.monotonic_ns()
+
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def sleep_until_ns(self, deadline_ns):
+        self.sleep((deadline_ns - time.monotonic_ns()) / 1e9)
+
+    def spin(self):
+        """One iteration of a busy-wait. Real time passes on its own."""
+        pass
+
+    def wait(self, event, timeout_s):
+        return event.wait(timeout_s)
+
+    def call_later(self, delay_s, fn):
+        timer = threading.Timer(delay_s, fn)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+
+class VirtualClock:
+    """
+    Discrete-event clock. Scheduled callbacks run, in time order, inside
+    whichever sleep()/wait() carries the clock past them. Meant for one
+    control thread; with several threads the clock stays correct but the
+    interleaving is no longer deterministic.
+    """
+    virtual = True
+
+    def __init__(self, start_s=0.0):
+        self._now_ns = int(start_s * 1e9)
+        self._events = []
+        self._seq = 0
+        self._lock = threading.RLock()
+        self.events_run = 0
+
+    def now_ns(self):
+        return self._now_ns
+
+    def now(self):
+        return self._now_ns / 1e9
+
+    def call_at_ns(self, when_ns, fn):
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._events, (max(when_ns, self._now_ns), self._seq, fn))
+
+    def call_later(self, delay_s, fn):
+        self.call_at_ns(self._now_ns + int(delay_s * 1e9), fn)
+
+    def advance_to_ns(self, when_ns):
+        with self._lock:
+            while self._events and self._events[0][0] <= when_ns:
+                at, _, fn = heapq.heappop(self._events)
+                self._now_ns = max(self._now_ns, at)
+                self.events_run += 1
+                fn()
+            self._now_ns = max(self._now_ns, when_ns)
+
+    def sleep(self, seconds):
+        self.advance_to_ns(self._now_ns + max(0, int(seconds * 1e9)))
+
+    def sleep_until_ns(self, deadline_ns):
+        self.advance_to_ns(deadline_ns)
+
+    def spin(self):
+        self.sleep(POLL_COST_S)
+
+    def wait(self, event, timeout_s):
+        """Runs events until `event` is set or the timeout passes."""
+        deadline = self._now_ns + int(timeout_s * 1e9)
+        with self._lock:
+            while not event.is_set():
+                if not self._events or self._events[0][0] > deadline:
+                    self.advance_to_ns(deadline)
+                    return event.is_set()
+                self.advance_to_ns(self._events[0][0])
+        return True
+
+
+REAL_CLOCK = RealClock()
+
+
+def clock_of(device):
+    """The clock a (possibly simulated) device runs on; RealClock for real hardware."""
+    return getattr(device, "clock", None) or REAL_CLOCK
+
+
+# --- GPIO / PWM ---
+
+class SimGPIO:
+    """
+    Stand-in for RPi.GPIO with attached HC-SR04 models. A falling edge on a
+    sensor's trigger pin produces an echo pulse on its echo pin, delivered to
+    edge callbacks on the clock (timer threads on RealClock, inline on a
+    VirtualClock). watch() observes output changes, e.g. a motor enable pin.
+    """
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, clock=None):
+        self.clock = clock or REAL_CLOCK
+        self._levels = {}
+        self._callbacks = {}
+        self._watchers = {}
+        self._sensors = {}  # trigger pin -> echo pin
+        self.distance_cm = {}  # echo pin -> distance, None = no echo
+
+    def attach_sensor(self, trigger_pin, echo_pin, distance_cm=100.0):
+        self._sensors[trigger_pin] = echo_pin
+        self.distance_cm[echo_pin] = distance_cm
+
+    def watch(self, pin, callback):
+        """callback(pin, level, t_ns) on every output() to pin."""
+        self._watchers.setdefault(pin, []).append(callback)
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, mode):
+        self._levels.setdefault(pin, self.LOW)
+
+    def input(self, pin):
+        return self._levels.get(pin, self.LOW)
+
+    def output(self, pin, state):
+        was = self._levels.get(pin, self.LOW)
+        level = self._levels[pin] = int(bool(state))
+        for callback in self._watchers.get(pin, ()):
+            callback(pin, level, self.clock.now_ns())
+        if was and not state and pin in self._sensors:
+            self._ping(self._sensors[pin])
+
+    def _ping(self, echo_pin):
+        distance = self.distance_cm.get(echo_pin)
+        if distance is None:
+            return
+        width_s = 2 * distance / SPEED_OF_SOUND_CM_S
+
+        if not self.clock.virtual:
+            # One thread times the whole pulse; a second timer for the falling
+            # edge would add its thread start-up to the measured width.
+            def pulse():
+                time.sleep(ECHO_STARTUP_S)
+                self._set(echo_pin, self.HIGH)
+                time.sleep(width_s)
+                self._set(echo_pin, self.LOW)
+            threading.Thread(target=pulse, daemon=True).start()
+            return
+
+        def rise():
+            self._set(echo_pin, self.HIGH)
+            self.clock.call_later(width_s, lambda: self._set(echo_pin, self.LOW))
+
+        self.clock.call_later(ECHO_STARTUP_S, rise)
+
+    def _set(self, pin, level):
+        self._levels[pin] = level
+        callback = self._callbacks.get(pin)
+        if callback:
+            callback(pin)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self._callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        self._callbacks.pop(pin, None)
+
+    def cleanup(self):
+        self._callbacks.clear()
+        self._levels.clear()
+
+    def PWM(self, pin, frequency):
+        return SimPWM(self, pin, frequency)
+
+
+class SimPWM:
+    """RPi.GPIO.PWM stand-in that records the duty cycle."""
+    def __init__(self, gpio, pin, frequency):
+        self._gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0.0
+        self.running = False
+
+    def start(self, duty_cycle):
+        self.running = True
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self._gpio._levels[self.pin] = int(duty_cycle > 0)
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.running = False
+        self.ChangeDutyCycle(0)
+
+
+_default_gpio = None
+
+def gpio():
+    """RPi.GPIO on the Pi; otherwise one process-wide SimGPIO on the real clock."""
+    global _default_gpio
+    if _RPI_GPIO is not None:
+        return _RPI_GPIO
+    if _default_gpio is None:
+        _default_gpio = SimGPIO()
+        print("WARNING: RPi.GPIO not found. Using simulated GPIO.")
+    return _default_gpio
+
+
+# --- I2C: INA219 ---
+
+class SimINA219Bus:
+    """
+    INA219 register model behind the batch-reader interface used by
+    current_monitor (write_word / read_words / close). Readings are either set
+    directly (set_reading) or come from a profile evaluated on the clock at
+    read time (set_profile), so injected faults line up with sample times.
+    """
+    def __init__(self, addresses, current_lsb_a=CURRENT_LSB_A, clock=None):
+        self.clock = clock or REAL_CLOCK
+        self._lsb = current_lsb_a
+        self.registers = {a: {REG_BUS_VOLTAGE: 0, REG_CURRENT: 0, REG_CALIBRATION: 0} for a in addresses}
+        self.profiles = {}
+        self.failing = set()
+        self.transactions = 0
+
+    def set_reading(self, address, current_a, bus_v=24.0):
+        regs = self.registers[address]
+        # The shunt ADC saturates (±320 mV, ~3.2 A on the 0.1 ohm shunt) instead of wrapping.
+        regs[REG_CURRENT] = max(-0x8000, min(0x7FFF, int(round(current_a / self._lsb)))) & 0xFFFF
+        regs[REG_BUS_VOLTAGE] = (int(bus_v * 1000 / 4) << 3) & 0xFFFF
+
+    def set_profile(self, address, profile, bus_v=24.0):
+        """profile(t_s) -> amps, evaluated on every read. None removes it."""
+        if profile is None:
+            self.profiles.pop(address, None)
+        else:
+            self.profiles[address] = (profile, bus_v)
+
+    def write_word(self, address, register, value):
+        self.transactions += 1
+        self.registers[address][register] = value
+
+    def read_words(self, requests):
+        self.transactions += 1
+        if self.profiles:
+            now = self.clock.now()
+            for address, (profile, bus_v) in self.profiles.items():
+                self.set_reading(address, profile(now), bus_v)
+        return [None if a in self.failing or a not in self.registers else self.registers[a].get(r, 0)
+                for a, r in requests]
+
+    def close(self):
+        pass
+
+
+class INA219Reader:
+    """adafruit_ina219.INA219-style `.current` (mA) on top of a batch reader."""
+    def __init__(self, bus, address, current_lsb_a=CURRENT_LSB_A):
+        self._bus = bus
+        self._address = address
+        self._lsb_ma = current_lsb_a * 1000
+        bus.write_word(address, REG_CALIBRATION, CALIBRATION_32V_2A)
+
+    @property
+    def current(self):
+        raw = self._bus.read_words([(self._address, REG_CURRENT)])[0]
+        if raw is None:
+            raise OSError(f"INA219 at {hex(self._address)} did not respond")
+        return (raw - 0x10000 if raw & 0x8000 else raw) * self._lsb_ma
+
+
+# --- Docking actuators ---
+
+class SimActuators:
+    """
+    Linear actuators and their position / presence sensors. move() blocks for
+    the actuator's travel time on the clock. Faults: add an actuator to
+    `stuck` (it never arrives) or override a sensor in `sensor_values`.
+    """
+    def __init__(self, clock=None, travel_s=ACTUATOR_TRAVEL_S):
+        self.clock = clock or REAL_CLOCK
+        self.travel_s = travel_s
+        self.travel_overrides = {}
+        self.positions = {}
+        self.sensor_values = dict(STATIC_SENSORS)
+        self.stuck = set()
+        self.moves = []  # (t_s, actuator_id, position)
+        self._lock = threading.Lock()
+
+    def move(self, actuator_id, position, speed):
+        self.clock.sleep(self.travel_overrides.get(actuator_id, self.travel_s))
+        with self._lock:
+            self.moves.append((self.clock.now(), actuator_id, position))
+            if actuator_id not in self.stuck:
+                self.positions[actuator_id] = position
+        return True
+
+    def read(self, sensor_id):
+        if sensor_id in self.sensor_values:
+            return self.sensor_values[sensor_id]
+        if sensor_id in VERIFY_SENSORS:
+            actuator_id, engaged = VERIFY_SENSORS[sensor_id]
+            return 1.0 if self.positions.get(actuator_id) == engaged else 0.0
+        return 0.0
+
+
+class Simulator:
+    """Every simulated device, sharing one clock."""
+    def __init__(self, clock=None, i2c_addresses=(0x40, 0x41, 0x44, 0x45)):
+        self.clock = clock or VirtualClock()
+        self.gpio = SimGPIO(self.clock)
+        self.i2c = SimINA219Bus(i2c_addresses, clock=self.clock)
+        self.actuators = SimActuators(self.clock)
+
+
+def simulator(clock=None, i2c_addresses=(0x40, 0x41, 0x44, 0x45)):
+    return Simulator(clock, i2c_addresses)
+
+
+# --- Benchmark ---
+
+def benchmark(seconds=600.0, rate=100, trip_at=300.0, overcurrent_a=3.0):
+    """
+    Runs the multi-channel current monitor on a VirtualClock with an injected
+    overcurrent on the first channel. Returns (speedup, trip delay s).
+    """
+    import current_monitor
+    sim = simulator()
+    channels = [current_monitor.CurrentChannel(*spec, gpio=sim.gpio) for spec in current_monitor.CHANNELS]
+    first = channels[0]
+    sim.i2c.set_profile(first.address, lambda t: overcurrent_a if t >= trip_at else 1.0)
+    for channel in channels[1:]:
+        sim.i2c.set_profile(channel.address, lambda t: 1.0)
+    tripped = []
+    sim.gpio.watch(first.enable_pin, lambda pin, level, t_ns: level == 0 and tripped.append(t_ns / 1e9))
+
+    monitor = current_monitor.MultiCurrentMonitor(channels, sim.i2c, rate, display_rate=2, telemetry_s=0)
+    started = time.perf_counter()
+    monitor.run(duration_s=seconds)
+    wall = time.perf_counter() - started
+    delay = tripped[0] - trip_at if tripped else None
+    return seconds / wall, delay
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aegis Gardener HAL simulator benchmark")
+    parser.add_argument("--seconds", type=float, default=600.0, help="Virtual seconds to simulate.")
+    parser.add_argument("--rate", type=int, default=100, help="Current sample rate (Hz).")
+    parser.add_argument("--trip-at", type=float, default=300.0, help="Virtual time of the injected overcurrent (s).")
+    args = parser.parse_args()
+    speedup, delay = benchmark(args.seconds, args.rate, args.trip_at)
+    print(f"\n{args.seconds:.0f} virtual s at {args.rate} Hz ran {speedup:.0f}x real time.")
+    if delay is None:
+        print("Injected overcurrent did NOT disable the motor.")
+    else:
+        print(f"Motor disabled {delay * 1000:.1f} ms (virtual) after the injected overcurrent.")
+
+
+if __name__ == "__main__":
+    main()
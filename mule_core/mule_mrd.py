@@ -0,0 +1,216 @@
+"""
+mule_mrd.py - Master Requirements Database loader.
+
+data/requirements.csv is hand-edited: it has been saved as tab-separated with
+a mangled header, trailing free-text columns and stray quotes. This module is
+the one place that reads it.
+
+- parse() sniffs the delimiter from the header, validates every row and
+  returns clean (req_id, category, threshold, unit, logic_trigger,
+  description) tuples plus the rows it rejected and why.
+- sync() applies the file to the mule_requirements table incrementally: each
+  row carries a content hash, so only new or edited rows are written and
+  rows removed from the file are deleted. Re-seeding an unchanged file
+  performs no writes.
+- CACHE is the in-memory view used by the governor, the persona prompts and
+  the scripts that read a single limit (threshold()). Lookups are served from
+  memory; the file is stat()ed at most once per RECHECK_S and re-parsed only
+  when its mtime or size changed.
+
+Usage:
+    import mule_mrd
+    mule_mrd.CACHE.get("MECH-TOW-01")
+    mule_mrd.threshold("ELEC-BRK-MAIN", 80.0)
+    mule_mrd.sync()
+"""
+
+import os
+import re
+import csv
+import time
+import hashlib
+import threading
+
+import mule_store
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV_PATH = os.path.join(BASE_DIR, "data", "requirements.csv")
+FIELDS = ("req_id", "category", "threshold", "unit", "logic_trigger", "description")
+DELIMITERS = "\t,;|"
+REQ_ID_RE = re.compile(r"^[A-Z0-9]+(?:-[A-Z0-9]+)+$")
+JUNK_RE = re.compile(r'\.,|",')   # Where a description's sentence ends and the pasted columns begin.
+RECHECK_S = 1.0
+
+UPSERT_SQL = '''INSERT INTO mule_requirements
+    (req_id, category, threshold, unit, logic_trigger, description, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (req_id) DO UPDATE SET
+        category = excluded.category, threshold = excluded.threshold, unit = excluded.unit,
+        logic_trigger = excluded.logic_trigger, description = excluded.description,
+        content_hash = excluded.content_hash'''
+
+
+def sniff_dialect(header):
+    """(delimiter, quoting) for a requirements file, from its header line.
+
+    csv.Sniffer picks the comma for the current file (the header's trailing
+    junk is comma-joined), so the delimiter is the one that splits the header
+    into the expected leading columns. Tab and pipe files have no legitimate
+    quoting, so their stray quotes are read as text."""
+    for delimiter in DELIMITERS:
+        cells = [c.strip().strip('"').lower() for c in header.split(delimiter)]
+        if tuple(cells[:5]) == FIELDS[:5]:
+            return delimiter, csv.QUOTE_NONE if delimiter in "\t|" else csv.QUOTE_MINIMAL
+    raise ValueError(f"Unrecognised requirements header: {header.strip()[:80]!r}")
+
+
+def clean_row(cells):
+    """Validated row tuple from raw cells. Raises ValueError on a bad row."""
+    if len(cells) < 5:
+        raise ValueError(f"expected at least 5 columns, got {len(cells)}")
+    req_id = cells[0].strip().strip('"')
+    if not REQ_ID_RE.match(req_id):
+        raise ValueError(f"malformed req_id '{req_id}'")
+    category = cells[1].strip()
+    if not category:
+        raise ValueError("empty category")
+    try:
+        threshold = float(cells[2])
+    except ValueError:
+        raise ValueError(f"threshold '{cells[2]}' is not a number")
+    unit = cells[3].strip()
+    if not unit:
+        raise ValueError("empty unit")
+    triggers = [t.strip().strip('"').lower() for t in cells[4].split(",")]
+    triggers = [t for t in triggers if t]
+    if not triggers:
+        raise ValueError("no logic_trigger keywords")
+    # The description column is followed by a comma-joined copy of earlier
+    # columns in the mangled export; keep the first sentence.
+    description = JUNK_RE.split(cells[5])[0] if len(cells) > 5 else ""
+    description = description.strip().strip('"').replace('""', '"').rstrip(".")
+    return (req_id, category, threshold, unit, ",".join(triggers), description)
+
+
+def parse(path=CSV_PATH):
+    """(rows, rejected) from a requirements file. rejected is [(line, req_id, reason)];
+    a repeated req_id keeps its first row."""
+    rows, rejected, seen = [], [], set()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        delimiter, quoting = sniff_dialect(f.readline())
+        for line, cells in enumerate(csv.reader(f, delimiter=delimiter, quoting=quoting), start=2):
+            if not any(c.strip() for c in cells):
+                continue
+            try:
+                row = clean_row(cells)
+            except ValueError as e:
+                rejected.append((line, cells[0].strip() if cells else "", str(e)))
+                continue
+            if row[0] in seen:
+                rejected.append((line, row[0], "duplicate req_id"))
+                continue
+            seen.add(row[0])
+            rows.append(row)
+    return rows, rejected
+
+
+def row_hash(row):
+    return hashlib.sha1("\x1f".join(map(str, row)).encode("utf-8")).hexdigest()
+
+
+def sync(path=CSV_PATH):
+    """Applies the requirements file to mule_requirements, writing only changed rows.
+
+    Rows rejected by validation are left as they are in the database rather
+    than deleted, so a typo in the file cannot silently drop a requirement.
+    Returns counts: inserted, updated, deleted, unchanged, rejected."""
+    rows, rejected = parse(path)
+    conn = mule_store.get_connection()
+    stored = dict(conn.execute("SELECT req_id, content_hash FROM mule_requirements"))
+
+    changed, inserted = [], 0
+    for row in rows:
+        digest = row_hash(row)
+        if stored.get(row[0]) != digest:
+            inserted += row[0] not in stored
+            changed.append(row + (digest,))
+    keep = {row[0] for row in rows} | {req_id for _, req_id, _ in rejected}
+    removed = [(req_id,) for req_id in stored if req_id not in keep]
+
+    if changed or removed:
+        with mule_store.transaction() as conn:
+            conn.executemany(UPSERT_SQL, changed)
+            conn.executemany("DELETE FROM mule_requirements WHERE req_id = ?", removed)
+    return {"inserted": inserted, "updated": len(changed) - inserted, "deleted": len(removed),
+            "unchanged": len(rows) - len(changed), "rejected": rejected}
+
+
+class RequirementsCache:
+    """In-memory requirements, re-parsed only when the file changes.
+
+    version increments on every reload so consumers (the governor's compiled
+    regex, precomputed persona prompts) can rebuild derived state cheaply."""
+    def __init__(self, path=CSV_PATH, recheck_s=RECHECK_S):
+        self.path = path
+        self.recheck_s = recheck_s
+        self.version = 0
+        self._rows = []
+        self._by_id = {}
+        self._stamp = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._stamp is not None and now - self._checked < self.recheck_s:
+            return
+        with self._lock:
+            if self._stamp is not None and now - self._checked < self.recheck_s:
+                return
+            self._checked = now
+            try:
+                st = os.stat(self.path)
+                stamp = (st.st_mtime_ns, st.st_size)
+                if stamp == self._stamp:
+                    return
+                rows, rejected = parse(self.path)
+            except (OSError, ValueError) as e:
+                if self._stamp is None:
+                    raise
+                print(f"⚠️ [MRD] Could not reload {self.path} ({e}). Keeping {len(self._rows)} cached rows.")
+                return
+            for line, req_id, reason in rejected:
+                print(f"⚠️ [MRD] line {line} ({req_id or '?'}): {reason}. Skipped.")
+            self._rows = rows
+            self._by_id = {row[0]: row for row in rows}
+            self._stamp = stamp
+            self.version += 1
+
+    def rows(self):
+        self._refresh()
+        return self._rows
+
+    def get(self, req_id):
+        self._refresh()
+        return self._by_id.get(req_id)
+
+    def invalidate(self):
+        """Forces the next lookup to re-check the file."""
+        self._checked = 0.0
+
+
+CACHE = RequirementsCache()
+
+
+def threshold(req_id, default, requirements=CACHE):
+    """A requirement's threshold, or `default` (with a warning) if the file or the row is missing."""
+    try:
+        row = requirements.get(req_id)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ [MRD] Requirements unavailable ({e}). Using default {req_id} = {default:g}.")
+        return default
+    if row is None:
+        print(f"⚠️ [MRD] {req_id} not found in {requirements.path}. Using default {default:g}.")
+        return default
+    return row[2]
@@ -7,6 +7,9 @@ except ImportError: Repo = None
 from google import genai
 from google.genai import types
 
+import mule_governor
+import mule_personas
+
 # --- PATH RESOLUTION ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 def get_path(f, sub=""): return os.path.join(BASE_DIR, sub, f)
@@ -17,6 +20,7 @@ class AegisGardener:
             self.client = genai.Client(api_key=f.read().strip())
         self.agents = self._load_roles()
         self.current_role = "PE"
+        self.mrd_context = ""
         self.role_names = {
             "PE": "Principal Engineer", "ME": "Mechanical Engineer", 
             "SW": "Software Engineer", "PM": "Project Manager", 
@@ -30,23 +34,22 @@ class AegisGardener:
             os.makedirs(self.log_dir)
 
     def _load_roles(self):
-        roles = {}
-        mapping = {"PE": "pe.txt", "ME": "me.txt", "SW": "sw.txt", 
-                   "PM": "pm.txt", "QA": "qa.txt", "TW": "tech_writer.txt"}
-        for k, v in mapping.items():
-            path = get_path(v, "prompts")
-            if os.path.exists(path):
-                with open(path, 'r') as f: roles[k] = f.read()
-        return roles
+        # Shared registry: prompts are read once and hot-reloaded by its watcher,
+        # and each role's system instruction already carries its MRD constraints.
+        return mule_personas.get_registry()
 
     # --- SESSION LOGGING METHOD (NEW) ---
-    def _log_session(self, user_input, response, path):
+    def _log_session(self, user_input, response, path, model_key="fast", latency_ms=None, escalated=False):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         log_file = os.path.join(self.log_dir, f"dev_log_{timestamp}.txt")
         with open(log_file, "w") as f:
             f.write(f"TIMESTAMP: {datetime.now()}\n")
             f.write(f"USER: {user_input}\n")
             f.write(f"EXPERT_PATH: {path}\n")
+            f.write(f"MODEL: {model_key.upper()}\n")
+            if latency_ms is not None:
+                f.write(f"LATENCY_MS: {latency_ms:.0f}\n")
+            f.write(f"ESCALATED: {'yes' if escalated else 'no'}\n")
             f.write(f"--- RESPONSE ---\n{response}")
 
     def read_file(self, filename: str) -> str:
@@ -64,7 +67,14 @@ class AegisGardener:
             except Exception as e: return f"Error writing to {filename}: {e}"
         return "Write operation rejected by user."
 
-    def get_response(self, user_input, model_key="fast"):
+    def get_response(self, user_input, model_key="fast", _started=None):
+        started = _started or time.monotonic()
+        if _started is None:
+            # Pre-flight: reject MRD violations locally, before any model call.
+            verdict = mule_governor.preflight(user_input, quiet=True)
+            if not verdict.ok:
+                return verdict.rejection()
+            self.mrd_context = verdict.context()
         model_choice = self.models[model_key]
         breadcrumb = [self.current_role]
         decision_log = []
@@ -75,12 +85,12 @@ class AegisGardener:
 
         while True:
             config = types.GenerateContentConfig(
-                system_instruction=self.agents.get(self.current_role, ""),
+                system_instruction=self.agents.system_instruction(self.current_role),
                 tools=[self.read_file, self.write_file],
                 automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=False)
             )
             
-            context = [{"role": "user", "parts": [{"text": user_input}]}]
+            context = [{"role": "user", "parts": [{"text": user_input + self.mrd_context}]}]
             if decision_log:
                 log_summary = "\n".join(decision_log)
                 context.append({"role": "model", "parts": [{"text": f"PREVIOUS SPECIALIST DECISIONS:\n{log_summary}"}]})
@@ -111,14 +121,16 @@ class AegisGardener:
                 if model_key == "fast" and len(breadcrumb) < 2:
                     print("\n⚠️ [ESCALATING]: Incomplete reasoning detected. Rerunning with PRO...")
                     self.current_role = "PE"
-                    return self.get_response(user_input, model_key="pro")
+                    return self.get_response(user_input, model_key="pro", _started=started)
 
                 print(" ✅") 
                 final_trail = f" ➔ {' ➔ '.join(breadcrumb)}"
                 full_output = response_text + f"\n\n[Expert Path: {final_trail}] [Model: {model_key.upper()}]"
                 
                 # --- AUTO-LOGGING (NEW) ---
-                self._log_session(user_input, full_output, final_trail)
+                latency_ms = (time.monotonic() - started) * 1000
+                self._log_session(user_input, full_output, final_trail, model_key, latency_ms,
+                                  escalated=_started is not None)
                 
                 return full_output
 
@@ -0,0 +1,156 @@
+"""
+mule_personas.py - Persona prompt registry.
+
+Loads the role prompts in prompts/ once and keeps each role's final system
+instruction (persona text plus the MRD constraints for that role) built
+ahead of time, so a request reads a string from memory instead of opening
+files. A daemon thread re-checks prompts/ and the requirements cache every
+RECHECK_S and rebuilds only the roles whose file (or the MRD) changed, so
+edits made by update_roles.py, bootstrap_prompts.py or by hand apply
+without a restart.
+
+Each persona is versioned by a hash of its system instruction. Anything
+cached against a prompt (responses, model-side context caches) should key
+on the version so it invalidates when the persona or the MRD changes.
+
+Usage:
+    import mule_personas
+    personas = mule_personas.get_registry()
+    personas.system_instruction("PE")
+    personas.get("PE").version
+"""
+
+import os
+import hashlib
+import threading
+
+import mule_mrd
+import mule_governor
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROMPTS_DIR = os.path.join(BASE_DIR, "prompts")
+ROLE_FILES = {"PE": "pe.txt", "ME": "me.txt", "SW": "sw.txt",
+              "PM": "pm.txt", "QA": "qa.txt", "TW": "tech_writer.txt"}
+# MRD categories injected into each role's system instruction (None = all).
+ROLE_CATEGORIES = {"PE": None, "QA": None, "ME": ("ME",), "SW": ("SW",), "PM": (), "TW": ()}
+RECHECK_S = 1.0
+
+
+class Persona:
+    def __init__(self, role, path, text, constraints):
+        self.role = role
+        self.path = path
+        self.text = text
+        self.system_instruction = text + constraints
+        self.version = hashlib.sha1(self.system_instruction.encode("utf-8")).hexdigest()[:12]
+
+
+def constraints_block(rows, categories):
+    """MRD constraints section for a system instruction ("" if the role gets none)."""
+    lines = [f"- {mule_governor.Requirement.from_row(row).describe()}" for row in rows
+             if categories is None or row[1] in categories]
+    if not lines:
+        return ""
+    return "\n\n=== MRD CONSTRAINTS (Master Requirements Database) ===\n" + "\n".join(lines) + "\n"
+
+
+class PersonaRegistry:
+    def __init__(self, prompts_dir=PROMPTS_DIR, role_files=ROLE_FILES, requirements=mule_mrd.CACHE):
+        self.prompts_dir = prompts_dir
+        self.role_files = role_files
+        self.requirements = requirements
+        self._personas = {}
+        self._stamps = {}
+        self._mrd_version = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.reload()
+
+    def reload(self):
+        """Re-reads changed prompt files and rebuilds affected roles. Returns the roles that changed."""
+        with self._lock:
+            rows = self.requirements.rows()
+            mrd_changed = self._mrd_version != self.requirements.version
+            self._mrd_version = self.requirements.version
+            changed = []
+            for role, filename in self.role_files.items():
+                path = os.path.join(self.prompts_dir, filename)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    if self._personas.pop(role, None) is not None:
+                        changed.append(role)
+                    self._stamps.pop(role, None)
+                    continue
+                stamp = (st.st_mtime_ns, st.st_size)
+                persona = self._personas.get(role)
+                if persona is not None and stamp == self._stamps.get(role) and not mrd_changed:
+                    continue
+                if persona is None or stamp != self._stamps.get(role):
+                    with open(path, "r", encoding="utf-8") as f:
+                        text = f.read()
+                    # An empty read is a writer mid-truncate; keep the old text until it lands.
+                    if not text.strip() and persona is not None:
+                        continue
+                else:
+                    text = persona.text
+                self._stamps[role] = stamp
+                updated = Persona(role, path, text, constraints_block(rows, ROLE_CATEGORIES.get(role, ())))
+                if persona is None or updated.version != persona.version:
+                    self._personas[role] = updated
+                    changed.append(role)
+            return changed
+
+    def watch(self, interval_s=RECHECK_S):
+        """Starts the background re-check (idempotent)."""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval_s):
+                try:
+                    changed = self.reload()
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ [PERSONAS] Reload failed ({e}). Keeping the loaded prompts.")
+                    continue
+                if changed:
+                    print(f"🔄 [PERSONAS] Reloaded: {', '.join(changed)}")
+
+        self._watcher = threading.Thread(target=loop, name="persona-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def __contains__(self, role):
+        return role in self._personas
+
+    def get(self, role):
+        return self._personas.get(role)
+
+    def system_instruction(self, role):
+        persona = self._personas.get(role)
+        return persona.system_instruction if persona is not None else ""
+
+    def versions(self):
+        return {role: p.version for role, p in self._personas.items()}
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Shared registry: loaded on first use, then kept current by its watcher."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PersonaRegistry()
+            _registry.watch()
+        return _registry
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+mule_runtime.py
+
+Description:
+One process, one event loop, one core for the whole hardware stack. The
+current monitor, ultrasonic avoidance and pump control run as scheduled tasks
+instead of separate blocking scripts, so they share a single GPIO handle and
+I2C bus, and pins are claimed and cleaned up in one place. The old failure
+mode where one script's GPIO.cleanup() released another script's pins cannot
+happen here.
+
+Periodic tasks run on absolute monotonic deadlines. When several are due at
+once they run in priority order (lower number first: safety, then sensing,
+then actuation). Long-running procedures (pump jobs, docking sequences) are
+plain coroutines spawned on the same loop. E-stops from the safety bus reach
+every registered handler straight from the loop, via the subscriber's eventfd.
+
+asyncio wakes with ~1 ms resolution (epoll), so periodic tasks are meant for
+rates up to a few hundred Hz. For 1 kHz current sampling keep using
+current_monitor.py on its own.
+
+Usage:
+python3 mule_runtime.py --simulate --duration 10
+python3 mule_runtime.py --tasks current,ultrasonic --current-rate 200 --cpu 3
+python3 mule_runtime.py --simulate --tasks current,dock --duration 10
+"""
+
+import os
+import sys
+import time
+import heapq
+import signal
+import asyncio
+import argparse
+import inspect
+import threading
+
+import mule_hal
+import safety_bus
+import current_monitor
+import ultrasonic_avoidance
+import water_pump_controller
+import safety_engagement_sequence
+
+# --- CONFIGURATION ---
+PRIORITY_SAFETY = 0
+PRIORITY_SENSING = 10
+PRIORITY_ACTUATION = 20
+PRIORITY_BACKGROUND = 30
+CURRENT_RATE_HZ = 200
+ULTRASONIC_RATE_HZ = 1 / ultrasonic_avoidance.PING_CYCLE_S  # The HC-SR04's measurement cycle.
+SAFETY_POLL_HZ = 200   # Cross-process E-stops; in-process ones arrive via eventfd immediately.
+PUMP_PIN = 17          # <--- CONFIRM WITH EE
+TASKS = ("current", "ultrasonic", "pump", "dock")
+
+
+class PeriodicTask:
+    """A short, non-blocking step run every `period_s`, with timing stats."""
+    def __init__(self, name, period_s, step, priority):
+        self.name = name
+        self.period_s = period_s
+        self.step = step
+        self.priority = priority
+        self.runs = 0
+        self.overruns = 0
+        self.max_late_s = 0.0
+        self.busy_s = 0.0
+        self.errors = 0
+        self.failing = False
+        self.last_error = None
+
+    def summary(self):
+        mean_us = self.busy_s / self.runs * 1e6 if self.runs else 0.0
+        return (f"{self.name:<12} p{self.priority:<3} {1 / self.period_s:7.1f} Hz | runs {self.runs:<7} "
+                f"overruns {self.overruns:<5} errors {self.errors:<5} max late {self.max_late_s * 1000:6.2f} ms | "
+                f"step {mean_us:7.1f} us")
+
+
+class Runtime:
+    """Owns the event loop, the shared hardware handles and cleanup."""
+    def __init__(self, gpio=None, i2c=None, safety=None):
+        self.gpio = gpio if gpio is not None else mule_hal.gpio()
+        self.gpio.setmode(self.gpio.BCM)
+        self.i2c = i2c
+        self.safety = safety
+        self._pins = {}
+        self._tasks = []
+        self._heap = []
+        self._seq = 0
+        self._coroutines = set()
+        self._estop_handlers = []
+        self._cleanups = []
+        self._stopping = None
+        self._estop = None
+        self._loop = None
+        self._loop_thread = None
+
+    # --- resources ---
+
+    def claim_pin(self, pin, owner):
+        """Registers pin ownership; two tasks can never drive the same pin."""
+        if self._pins.get(pin, owner) != owner:
+            raise RuntimeError(f"GPIO {pin} requested by {owner} is already owned by {self._pins[pin]}")
+        self._pins[pin] = owner
+
+    def on_cleanup(self, fn):
+        """Registers a callable that puts an owner's outputs in a safe state at shutdown."""
+        self._cleanups.append(fn)
+
+    def on_estop(self, handler):
+        self._estop_handlers.append(handler)
+
+    # --- scheduling ---
+
+    def every(self, period_s, step, priority=PRIORITY_BACKGROUND, name=None):
+        task = PeriodicTask(name or step.__name__, period_s, step, priority)
+        self._tasks.append(task)
+        self._push(time.monotonic() + period_s, task)
+        return task
+
+    def spawn(self, coro, name=None):
+        task = asyncio.get_running_loop().create_task(coro, name=name)
+        self._coroutines.add(task)
+        task.add_done_callback(self._coroutines.discard)
+        return task
+
+    def _push(self, deadline, task):
+        self._seq += 1
+        heapq.heappush(self._heap, (deadline, task.priority, self._seq, task))
+
+    async def _scheduler(self):
+        while True:
+            if not self._heap:
+                await asyncio.sleep(0.05)
+                continue
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            now = time.monotonic()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+            due.sort(key=lambda entry: (entry[1], entry[0]))
+            for deadline, _, _, task in due:
+                started = time.monotonic()
+                task.max_late_s = max(task.max_late_s, started - deadline)
+                try:
+                    result = task.step()
+                    if inspect.isawaitable(result):
+                        await result
+                    task.failing = False
+                except Exception as e:
+                    # One bad step must not end the scheduler (and with it
+                    # every other task, E-stop polling included).
+                    self._task_failed(task, e)
+                task.busy_s += time.monotonic() - started
+                task.runs += 1
+                # Absolute schedule with overrun skipping, as in CurrentMonitor.run().
+                deadline += task.period_s
+                late = time.monotonic() - deadline
+                if late > 0:
+                    missed = int(late // task.period_s) + 1
+                    task.overruns += missed
+                    deadline += missed * task.period_s
+                self._push(deadline, task)
+            await asyncio.sleep(0)  # Let spawned coroutines run between batches.
+
+    # --- safety ---
+
+    def _task_failed(self, task, error):
+        task.errors += 1
+        task.last_error = error
+        if task.failing:
+            return
+        task.failing = True
+        print(f"WARNING: task {task.name} failed: {error!r} (repeats are counted, not printed).")
+        if task.priority <= PRIORITY_SAFETY:
+            # A safety task that cannot run is as bad as the condition it watches.
+            self.raise_estop("mule_runtime", f"{task.name} task failed: {error}")
+
+    def raise_estop(self, source, reason):
+        """E-stop through the safety bus, or straight to the local handlers without
+        one. Safe to call from GPIO callback threads."""
+        if self.safety is not None:
+            self.safety.raise_estop(source, reason)
+            return
+        state = {"source": source, "reason": reason}
+        loop = self._loop
+        if loop is not None and loop.is_running() and threading.get_ident() != self._loop_thread:
+            loop.call_soon_threadsafe(self._run_estop_handlers, state)
+        else:
+            self._run_estop_handlers(state)
+
+    def _run_estop_handlers(self, state):
+        for handler in self._estop_handlers:
+            handler(state)
+
+    def release(self, source):
+        if self.safety is not None:
+            self.safety.release(source)
+
+    def _dispatch_estop(self):
+        state = self._estop.check()
+        if state:
+            self._run_estop_handlers(state)
+
+    def _drain_wakeup(self):
+        try:
+            os.eventfd_read(self._estop.fileno())
+        except BlockingIOError:
+            pass
+        self._dispatch_estop()
+
+    # --- lifecycle ---
+
+    async def run(self, duration_s=None):
+        loop = self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        if self.safety is not None:
+            self._estop = self.safety.subscribe("mule_runtime")
+            if self._estop.fileno() is not None:
+                loop.add_reader(self._estop.fileno(), self._drain_wakeup)
+            self.every(1.0 / SAFETY_POLL_HZ, self._dispatch_estop, PRIORITY_SAFETY, "safety_bus")
+        scheduler = loop.create_task(self._scheduler(), name="scheduler")
+        try:
+            if duration_s:
+                await asyncio.wait_for(self._stopping.wait(), duration_s)
+            else:
+                await self._stopping.wait()
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            scheduler.cancel()
+            for task in list(self._coroutines):
+                task.cancel()
+            await asyncio.gather(scheduler, *self._coroutines, return_exceptions=True)
+            if self._estop is not None and self._estop.fileno() is not None:
+                loop.remove_reader(self._estop.fileno())
+
+    def close(self):
+        """Safe state for every owner, then one GPIO.cleanup() for the process."""
+        for fn in reversed(self._cleanups):
+            try:
+                fn()
+            except Exception as e:
+                print(f"WARNING: cleanup step failed: {e}")
+        if self._estop is not None:
+            self._estop.close()
+        self.gpio.cleanup()
+        print(f"GPIO resources cleaned up ({len(self._pins)} pins).")
+
+    def report(self):
+        for task in sorted(self._tasks, key=lambda t: t.priority):
+            print("  " + task.summary())
+
+
+# --- HOSTED LOOPS ---
+
+def host_current_monitor(runtime, channels, rate_hz=CURRENT_RATE_HZ):
+    """Runs MultiCurrentMonitor's sample step on the shared I2C bus."""
+    for _, _, _, pin in channels:
+        runtime.claim_pin(pin, "current_monitor")
+    monitor = current_monitor.MultiCurrentMonitor(
+        [current_monitor.CurrentChannel(*spec, gpio=runtime.gpio) for spec in channels], runtime.i2c, rate_hz,
+        telemetry_s=0, safety=runtime.safety)
+    # Messages the display thread would print; the runtime has no display thread.
+    def sample():
+        monitor._sample(time.monotonic_ns())
+        if runtime.safety is not None:
+            # Acks the monitor's own bus slot and re-enables motors once a stop clears.
+            monitor._poll_safety()
+        for message in monitor._events.drain():
+            print(message)
+    runtime.every(1.0 / rate_hz, sample, PRIORITY_SAFETY, "current")
+    runtime.on_estop(lambda state: monitor._set_motors(False))
+    runtime.on_cleanup(lambda: monitor._set_motors(False))
+    return monitor
+
+
+def host_ultrasonic(runtime, rate_hz=ULTRASONIC_RATE_HZ):
+    """Triggers a ping each period without blocking. The echo is handled in its
+    edge callback, so a halt follows the ping that sees an obstacle by the echo
+    time, as in the standalone loop; a ping with no echo by the next period
+    counts as missed."""
+    pins = (ultrasonic_avoidance.TRIGGER_PIN, ultrasonic_avoidance.ECHO_PIN)
+    for pin in pins:
+        runtime.claim_pin(pin, "ultrasonic")
+    # Same halt/resume rules (and missed-echo fault) as the standalone script.
+    guard = ultrasonic_avoidance.ObstacleGuard(bus=runtime)
+    lock = threading.Lock()  # The callback runs on the GPIO thread, misses on the loop.
+    pending = False
+
+    def update(distance):
+        with lock:
+            messages = guard.update(distance)
+        for message in messages:
+            print(message)
+
+    sensor = ultrasonic_avoidance.UltrasonicSensor(*pins, runtime.gpio, on_echo=update)
+    sensor.setup()
+
+    def ping():
+        nonlocal pending
+        if pending and not sensor.echoed:
+            update(None)
+        sensor.trigger()
+        pending = True
+
+    runtime.every(1.0 / rate_hz, ping, PRIORITY_SENSING, "ultrasonic")
+    runtime.on_cleanup(sensor.close)
+    return guard
+
+
+def host_pump(runtime, pin=PUMP_PIN):
+    """Pump controller on the shared GPIO; jobs are coroutines on the runtime loop."""
+    runtime.claim_pin(pin, "pump")
+    pump = water_pump_controller.PwmPumpController(pin=pin, gpio=runtime.gpio)
+    runtime.on_estop(lambda state: pump.emergency_stop())
+    runtime.on_cleanup(lambda: pump.cleanup(release_gpio=False))
+    return pump
+
+
+async def pump_job(pump, duration_s):
+    """run_pump() without blocking the loop: the pump's ramp engine does the slewing."""
+    if not await pump.start_async().wait_async():
+        return
+    await asyncio.sleep(duration_s)
+    await pump.stop_async().wait_async()
+
+
+async def dock_job():
+    """The docking sequence is a sequence_engine state machine, but its run()
+    blocks until every step and compensation has settled, so it runs in the
+    loop's worker thread; the loop itself keeps its deadlines."""
+    ok = await asyncio.to_thread(safety_engagement_sequence.engage_safety_sequence)
+    print(f"Docking sequence {'SUCCESS' if ok else 'FAILED'}.")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-process asyncio runtime for the mule_core hardware loops")
+    parser.add_argument("--tasks", default=",".join(TASKS), help=f"Comma-separated subset of {TASKS}.")
+    parser.add_argument("--simulate", action="store_true", help="Simulated GPIO, I2C and sensors.")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds.")
+    parser.add_argument("--current-rate", type=float, default=CURRENT_RATE_HZ, help="Current sampling rate (Hz).")
+    parser.add_argument("--cpu", type=int, help="Pin the process to this CPU core.")
+    parser.add_argument("--no-safety-bus", action="store_true", help="Do not join the shared safety bus.")
+    args = parser.parse_args()
+    tasks = set(args.tasks.split(","))
+
+    if args.cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {args.cpu})
+
+    simulate = args.simulate or ultrasonic_avoidance.SIMULATED
+    gpio = mule_hal.SimGPIO() if simulate else None
+    if simulate:
+        gpio.attach_sensor(ultrasonic_avoidance.TRIGGER_PIN, ultrasonic_avoidance.ECHO_PIN, 120.0)
+    channels = current_monitor.CHANNELS
+    if "current" in tasks:
+        if simulate:
+            i2c = mule_hal.SimINA219Bus([c[0] for c in channels])
+        elif current_monitor.SMBus is not None:
+            i2c = current_monitor.SMBusBatchReader()
+        else:
+            print("ERROR: No I2C library found. Please install smbus2.")
+            sys.exit(1)
+    else:
+        i2c = None
+
+    runtime = Runtime(gpio, i2c, None if args.no_safety_bus else safety_bus.SafetyBus())
+    if "current" in tasks:
+        host_current_monitor(runtime, channels, args.current_rate)
+    if "ultrasonic" in tasks:
+        host_ultrasonic(runtime)
+
+    async def start():
+        if "pump" in tasks:
+            pump = host_pump(runtime)
+            runtime.spawn(pump_job(pump, 2.0), "pump")
+        if "dock" in tasks:
+            runtime.spawn(dock_job(), "dock")
+        await runtime.run(args.duration)
+
+    print(f"--- mule_runtime: {', '.join(sorted(tasks))} on pid {os.getpid()} ---")
+    try:
+        asyncio.run(start())
+    finally:
+        runtime.report()
+        runtime.close()
+
+
+if __name__ == "__main__":
+    main()
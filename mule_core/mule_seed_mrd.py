@@ -1,43 +1,33 @@
-import sqlite3
-import csv
 import os
 
+import mule_mrd
+import mule_store
+
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "logs", os.path.join("data", "mule_results.db"))
-CSV_PATH = os.path.join(BASE_DIR, os.path.join("data", "requirements.csv"))
+DB_PATH = mule_store.DB_PATH
+CSV_PATH = mule_mrd.CSV_PATH
 
 def seed_mrd():
-    """Reads requirements.csv and updates the Master Requirements Database."""
+    """Reads requirements.csv and updates the Master Requirements Database (changed rows only)."""
     if not os.path.exists(CSV_PATH):
         print(f"🛑 [ERROR] Could not find requirements.csv at {CSV_PATH}")
         return
 
     try:
-        with open(CSV_PATH, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            to_db = []
-            for row in reader:
-                if not row['req_id']: continue
-                to_db.append((
-                    row['req_id'].strip(),
-                    row['category'].strip(),
-                    float(row['threshold']),
-                    row['unit'].strip(),
-                    row['logic_trigger'].lower().strip(),
-                    row['description'].strip()
-                ))
-                
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        # Overwrites existing entries if the ID matches
-        c.executemany("INSERT OR REPLACE INTO mule_requirements VALUES (?,?,?,?,?,?)", to_db)
-        conn.commit()
-        conn.close()
-        
-        print(f"✅ [SUCCESS] Loaded {len(to_db)} project requirements into the database.")
+        counts = mule_mrd.sync(CSV_PATH)
     except Exception as e:
         print(f"❌ [CRITICAL] Failed to parse requirements.csv: {e}")
+        return
+
+    for line, req_id, reason in counts["rejected"]:
+        print(f"⚠️ [SKIPPED] line {line} ({req_id or '?'}): {reason}")
+    if counts["inserted"] or counts["updated"] or counts["deleted"]:
+        print(f"✅ [SUCCESS] Requirements: {counts['inserted']} new, {counts['updated']} updated, "
+              f"{counts['deleted']} removed, {counts['unchanged']} unchanged.")
+    else:
+        print(f"✅ [SUCCESS] {counts['unchanged']} project requirements already up to date.")
+    return counts
 
 if __name__ == "__main__":
-    seed_mrd()
\ No newline at end of file
+    seed_mrd()
@@ -1,24 +1,10 @@
-import sqlite3
-import os
+import mule_store
 
 # --- CONFIGURATION ---
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(BASE_DIR, "logs", os.path.join("data", "mule_results.db"))
+DB_PATH = mule_store.DB_PATH
 
 def setup_ip_tracker():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    # IP Tracker Table
-    c.execute('''CREATE TABLE IF NOT EXISTS mule_ip_tracker (
-        ip_id INTEGER PRIMARY KEY,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-        innovation_title TEXT,
-        problem_solved TEXT,
-        technical_solution TEXT,
-        boolean_search_string TEXT,
-        status TEXT DEFAULT 'POTENTIAL')''')
-
+    # The mule_ip_tracker table is created by mule_store migrations.
     # Seeding discovered IP from project logs
     innovations = [
         ('Multi-Agent Consensus Engine for Hardware-Constrained Environments', 
@@ -37,12 +23,9 @@ def setup_ip_tracker():
          '("AI" OR "LLM") AND (orchestrat* OR agent*) AND ("closed loop") AND (audit OR log*)')
     ]
 
-    c.executemany('''INSERT OR IGNORE INTO mule_ip_tracker 
+    mule_store.execute_write('''INSERT OR IGNORE INTO mule_ip_tracker 
                      (innovation_title, problem_solved, technical_solution, boolean_search_string) 
-                     VALUES (?,?,?,?)''', innovations)
-    
-    conn.commit()
-    conn.close()
+                     VALUES (?,?,?,?)''', innovations, many=True)
     print("✅ [IP TRACKER] Discovered IP has been logged and secured.")
 
 if __name__ == "__main__":
@@ -0,0 +1,300 @@
+"""
+mule_store.py
+
+Single home for the MuleLab results database. Every reader and writer in
+mule_core goes through here so there is exactly one resolved database path,
+one schema (applied by numbered migrations tracked in PRAGMA user_version)
+and one shared connection per process.
+
+Usage:
+    import mule_store
+    conn = mule_store.get_connection()
+    mule_store.insert_audit(prompt, status, iterations, feedback, proposal, model)
+"""
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import datetime
+import threading
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+DEFAULT_DB_PATH = os.path.join(LOG_DIR, "mule_results.db")
+SPOOL_NAME = "mule_audit_spool.jsonl"  # Kept next to the database it belongs to.
+
+# Databases written by older versions of the scripts. Their rows are folded
+# into the unified database by migration 1.
+LEGACY_DB_PATHS = [
+    os.path.join(LOG_DIR, "data", "mule_results.db"),
+    os.path.join(BASE_DIR, "mule_core", "logs", "mule_results.db"),
+    os.path.join(BASE_DIR, "data", "aegis_master.db"),
+    os.path.join(BASE_DIR, "data", "data", "aegis_master.db"),  # mule_sync.py's IP sentry
+]
+
+BUSY_TIMEOUT_MS = 5000
+WRITE_RETRIES = 5
+RETRY_BACKOFF_S = 0.05
+
+AUDIT_COLUMNS = ("timestamp", "prompt", "status", "iterations",
+                 "specialist_feedback", "proposal", "model_used")
+# Prompts the pre-flight governor refused: logged, but never sent to a model.
+GOVERNOR_REJECTED = "GOVERNOR_REJECTED"
+
+_conn = None
+_conn_path = None
+_lock = threading.RLock()
+
+
+def resolve_db_path():
+    """Returns the one database path used by every MuleLab script."""
+    return os.path.abspath(os.environ.get("MULE_DB_PATH", DEFAULT_DB_PATH))
+
+
+def spool_path():
+    """Audit rows that could not be written wait here, beside the database."""
+    return os.path.join(os.path.dirname(resolve_db_path()), SPOOL_NAME)
+
+
+DB_PATH = resolve_db_path()
+
+
+# --- MIGRATIONS ---
+# Each entry upgrades the schema by exactly one version. Never edit an entry
+# that has shipped; append a new one instead. Schema statements must stay
+# idempotent (IF NOT EXISTS): ensure_schema() replays them to repair a
+# database whose tables were dropped under a current user_version.
+
+def _base_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS mule_audit
+                    (timestamp TEXT, prompt TEXT, status TEXT, iterations INTEGER,
+                     specialist_feedback TEXT, proposal TEXT, model_used TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS mule_requirements (
+        req_id TEXT PRIMARY KEY,
+        category TEXT,
+        threshold REAL,
+        unit TEXT,
+        logic_trigger TEXT,
+        description TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS mule_ip_tracker (
+        ip_id INTEGER PRIMARY KEY,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        innovation_title TEXT,
+        problem_solved TEXT,
+        technical_solution TEXT,
+        boolean_search_string TEXT,
+        status TEXT DEFAULT 'POTENTIAL')''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS ip_assets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        project TEXT,
+        category TEXT,
+        summary TEXT,
+        search_string TEXT,
+        confidence TEXT,
+        created_at TEXT)''')
+
+
+def _migration_1_base_schema(conn):
+    _base_tables(conn)
+    _import_legacy(conn)
+
+
+def _migration_2_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mule_audit_timestamp ON mule_audit(timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mule_audit_status ON mule_audit(status)")
+
+
+def _migration_3_audit_rollup(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mule_audit_model_timestamp ON mule_audit(model_used, timestamp)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS mule_audit_rollup (
+        day TEXT NOT NULL,
+        model_used TEXT NOT NULL,
+        status TEXT NOT NULL,
+        runs INTEGER NOT NULL,
+        iterations_sum INTEGER NOT NULL,
+        PRIMARY KEY (day, model_used, status)) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS mule_rollup_state (
+        name TEXT PRIMARY KEY,
+        last_rowid INTEGER NOT NULL)''')
+
+
+def _migration_4_requirements_hash(conn):
+    # mule_mrd.sync() compares this per row so re-seeding writes only edits.
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(mule_requirements)")}
+    if "content_hash" not in columns:
+        conn.execute("ALTER TABLE mule_requirements ADD COLUMN content_hash TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mule_requirements_category ON mule_requirements(category)")
+
+
+MIGRATIONS = [
+    _migration_1_base_schema,
+    _migration_2_indexes,
+    _migration_3_audit_rollup,
+    _migration_4_requirements_hash,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def _import_legacy(conn):
+    """Copies rows out of the scattered pre-unification databases."""
+    main_path = os.path.abspath(conn.execute("PRAGMA database_list").fetchone()[2] or "")
+    for path in LEGACY_DB_PATHS:
+        if not os.path.exists(path) or os.path.abspath(path) == main_path:
+            continue
+        conn.execute("ATTACH DATABASE ? AS legacy", (path,))
+        try:
+            tables = {r[0] for r in conn.execute(
+                "SELECT name FROM legacy.sqlite_master WHERE type='table'")}
+            if "mule_audit" in tables:
+                cols = ", ".join(AUDIT_COLUMNS)
+                conn.execute(f"INSERT INTO mule_audit ({cols}) SELECT {cols} FROM legacy.mule_audit")
+            if "ip_assets" in tables:
+                cols = "timestamp, project, category, summary, search_string, confidence, created_at"
+                conn.execute(f"INSERT INTO ip_assets ({cols}) SELECT {cols} FROM legacy.ip_assets")
+            print(f"📦 [MIGRATION] Imported legacy data from {path}")
+        except sqlite3.DatabaseError as e:
+            print(f"⚠️ [MIGRATION] Skipped legacy database {path}: {e}")
+        finally:
+            conn.commit()
+            conn.execute("DETACH DATABASE legacy")
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Applies every pending migration. Safe to call repeatedly."""
+    current = schema_version(conn)
+    for version, step in enumerate(MIGRATIONS[current:], start=current + 1):
+        step(conn)
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+    return schema_version(conn)
+
+
+def ensure_schema(conn):
+    """Recreates any missing table or index, whatever user_version says.
+    Legacy data is not re-imported."""
+    _base_tables(conn)
+    for step in MIGRATIONS[1:]:
+        step(conn)
+    conn.commit()
+
+
+# --- CONNECTION POOL ---
+
+def get_connection():
+    """Returns the shared, migrated connection for this process."""
+    global _conn, _conn_path
+    path = resolve_db_path()
+    with _lock:
+        if _conn is not None and _conn_path == path:
+            return _conn
+        close_connection()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        migrate(conn)
+        _conn, _conn_path = conn, path
+        return _conn
+
+
+def close_connection():
+    global _conn, _conn_path
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+        _conn, _conn_path = None, None
+
+
+atexit.register(close_connection)
+
+
+@contextmanager
+def transaction():
+    """Serializes writers on the shared connection and commits on success."""
+    with _lock:
+        conn = get_connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def execute_write(sql, params=(), many=False):
+    """Runs a write with retry on lock contention. Returns the row count."""
+    delay = RETRY_BACKOFF_S
+    for attempt in range(1, WRITE_RETRIES + 1):
+        try:
+            with transaction() as conn:
+                cur = conn.executemany(sql, params) if many else conn.execute(sql, params)
+                return cur.rowcount
+        except sqlite3.OperationalError as e:
+            msg = str(e).lower()
+            if "locked" in msg or "busy" in msg:
+                if attempt == WRITE_RETRIES:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+            elif "no such table" in msg or "columns" in msg:
+                # Schema drifted underneath us: recreate it once and retry.
+                if attempt > 1:
+                    raise
+                with _lock:
+                    ensure_schema(get_connection())
+            else:
+                raise
+
+
+# --- AUDIT HELPERS ---
+
+def insert_audit(prompt, status, iterations, feedback, proposal, model_used, timestamp=None):
+    """Appends one orchestrator run to mule_audit without ever touching existing rows."""
+    row = (timestamp or str(datetime.datetime.now()), prompt, status, iterations,
+           json.dumps(feedback) if isinstance(feedback, (list, tuple)) else feedback,
+           proposal, model_used)
+    cols = ", ".join(AUDIT_COLUMNS)
+    try:
+        execute_write(f"INSERT INTO mule_audit ({cols}) VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+        return True
+    except sqlite3.Error as e:
+        # Last resort: keep the record on disk so it can be replayed later.
+        path = spool_path()
+        print(f"❌ [DB ERROR] Audit insert failed ({e}). Spooling to {path}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(dict(zip(AUDIT_COLUMNS, row))) + "\n")
+        return False
+
+
+def replay_spool():
+    """Re-inserts spooled audit rows. Returns the number recovered."""
+    path = spool_path()
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    cols = ", ".join(AUDIT_COLUMNS)
+    execute_write(f"INSERT INTO mule_audit ({cols}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                  [tuple(r.get(c) for c in AUDIT_COLUMNS) for r in rows], many=True)
+    os.remove(path)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    conn = get_connection()
+    print(f"✅ [STORE] {DB_PATH} (schema v{schema_version(conn)})")
+    recovered = replay_spool()
+    if recovered:
+        print(f"♻️  [STORE] Recovered {recovered} spooled audit rows.")
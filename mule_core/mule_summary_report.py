@@ -1,34 +1,174 @@
 import csv
 import os
-import re
+import json
+import argparse
+from functools import lru_cache
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
-def generate_report(csv_path="logs/mule_test_audit.csv"):
+import mule_export
+
+# --- CONFIGURATION ---
+CHECKPOINT_SUFFIX = ".report.json"
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024  # Below this a process pool costs more than it saves.
+ROLES = mule_export.ROLES
+
+@lru_cache(maxsize=4096)
+def _role_mask(field):
+    """Role list / breadcrumb text -> bitmask. Audit rows repeat the same few
+    strings, so each distinct one is only parsed once."""
+    return mule_export.roles_to_mask(field)
+
+class ReportState:
+    """Constant-size running totals for the test audit CSV."""
+    def __init__(self):
+        self.runs = 0
+        self.passes = 0
+        self.fails = 0
+        self.miss_masks = Counter()  # missing-role bitmask -> failing rows (at most 2**len(ROLES) keys)
+
+    def merge(self, other):
+        self.runs += other.runs
+        self.passes += other.passes
+        self.fails += other.fails
+        self.miss_masks.update(other.miss_masks)
+
+    def missing_counts(self):
+        counts = Counter()
+        for mask, n in self.miss_masks.items():
+            for i, role in enumerate(ROLES):
+                if mask >> i & 1:
+                    counts[role] += n
+        return counts
+
+    def to_dict(self):
+        return {"runs": self.runs, "passes": self.passes, "fails": self.fails,
+                "miss_masks": {str(k): v for k, v in self.miss_masks.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.runs, state.passes, state.fails = data["runs"], data["passes"], data["fails"]
+        state.miss_masks = Counter({int(k): v for k, v in data["miss_masks"].items()})
+        return state
+
+def _scan(csv_path, header, start, end):
+    """Aggregates complete rows in the byte range [start, end). Returns
+    (state, bytes consumed); a trailing partial line is left for next time."""
+    state = ReportState()
+    consumed = [0]
+    i_expected, i_actual = header.index("Expected"), header.index("Actual")
+    i_status = header.index("Status")
+
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+
+        def lines():
+            nonlocal remaining
+            while remaining > 0:
+                raw = f.readline(remaining)
+                if not raw.endswith(b"\n"):
+                    return
+                remaining -= len(raw)
+                consumed[0] += len(raw)
+                yield raw.decode("utf-8", errors="replace")
+
+        for row in csv.reader(lines()):
+            if len(row) <= i_status:
+                continue
+            state.runs += 1
+            if row[i_status] == "PASS":
+                state.passes += 1
+            else:
+                state.fails += 1
+                missing = _role_mask(row[i_expected]) & ~_role_mask(row[i_actual])
+                if missing:
+                    state.miss_masks[missing] += 1
+    return state, consumed[0]
+
+def _scan_worker(args):
+    return _scan(*args)
+
+def _split(csv_path, start, end, parts):
+    """Cuts [start, end) into newline-aligned byte ranges."""
+    bounds = [start]
+    with open(csv_path, "rb") as f:
+        for k in range(1, parts):
+            f.seek(start + (end - start) * k // parts)
+            f.readline()
+            pos = min(f.tell(), end)
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _load_checkpoint(path, csv_path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    st = os.stat(csv_path)
+    if data.get("inode") != st.st_ino or st.st_size < data.get("offset", 0):
+        return None  # Rotated or truncated: start over.
+    return data
+
+def stream_report(csv_path, checkpoint=True, workers=1):
+    """Updates running totals with only the bytes appended since the last
+    checkpoint. Returns the ReportState for the whole file."""
+    ckpt_path = csv_path + CHECKPOINT_SUFFIX if checkpoint else None
+    data = _load_checkpoint(ckpt_path, csv_path)
+    state = ReportState.from_dict(data) if data else ReportState()
+    offset = data["offset"] if data else 0
+    header = data["header"] if data else None
+
+    if header is None:
+        with open(csv_path, "rb") as f:
+            first = f.readline()
+        if not first.endswith(b"\n"):
+            return state
+        header = next(csv.reader([first.decode("utf-8")]))
+        offset = len(first)
+
+    end = os.path.getsize(csv_path)
+    if workers > 1 and end - offset >= PARALLEL_MIN_BYTES:
+        ranges = _split(csv_path, offset, end, workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_scan_worker, [(csv_path, header, s, e) for s, e in ranges]))
+    else:
+        results = [_scan(csv_path, header, offset, end)]
+    for partial, consumed in results:
+        state.merge(partial)
+        offset += consumed
+
+    if ckpt_path:
+        tmp = ckpt_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(dict(state.to_dict(), offset=offset, header=header,
+                           inode=os.stat(csv_path).st_ino), f)
+        os.replace(tmp, ckpt_path)
+    return state
+
+def _fast_counts(csv_path):
+    """Vectorized pass/fail and per-role miss counts over the columnar snapshot."""
+    mule_export.export_all(csv_path, sources=("tests",))
+    stats = mule_export.test_summary(mule_export.load_table("tests", ["expected_mask", "actual_mask", "status"]))
+    return stats["total"], stats["passes"], stats["fails"], Counter({r: c for r, c in stats["missing"].items() if c})
+
+def generate_report(csv_path="logs/mule_test_audit.csv", fast=False, checkpoint=True, workers=1):
     if not os.path.exists(csv_path):
         print(f"❌ Error: {csv_path} not found.")
         return
 
-    total_runs = 0
-    passes = 0
-    fails = 0
-    missing_specialists = []
-
-    with open(csv_path, mode='r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            total_runs += 1
-            if row['Status'] == 'PASS':
-                passes += 1
-            else:
-                fails += 1
-                # Extract specialists from string: "Missing: ['PM', 'ME']"
-                reason = row['Failure_Reason']
-                found = re.findall(r"\'(\w+)\'", reason)
-                missing_specialists.extend(found)
+    if fast:
+        total_runs, passes, fails, failure_counts = _fast_counts(csv_path)
+    else:
+        state = stream_report(csv_path, checkpoint=checkpoint, workers=workers)
+        total_runs, passes, fails = state.runs, state.passes, state.fails
+        failure_counts = state.missing_counts()
 
     # Calculate Stats
     success_rate = (passes / total_runs) * 100 if total_runs > 0 else 0
-    failure_counts = Counter(missing_specialists)
 
     # Print Report
     print("="*40)
@@ -39,12 +179,18 @@ def generate_report(csv_path="logs/mule_test_audit.csv"):
     print(f"Failure Rate:    {100-success_rate:.1f}% ({fails}/{total_runs})")
     print("-" * 40)
     print("TOP FAILING SPECIALISTS (Missing in Chain):")
-    
+
     for role, count in failure_counts.most_common():
         percentage = (count / fails) * 100 if fails > 0 else 0
         print(f"- {role}: {count} occurrences ({percentage:.1f}% of failures)")
-    
+
     print("="*40)
 
 if __name__ == "__main__":
-    generate_report()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Aegis Gardener test audit summary")
+    parser.add_argument("csv_path", nargs="?", default="logs/mule_test_audit.csv")
+    parser.add_argument("--fast", action="store_true", help="Use the columnar snapshot (mule_export) and vectorized counts.")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Rescan the whole file and do not save a checkpoint.")
+    parser.add_argument("--workers", type=int, default=1, help="Split large unread ranges across this many processes.")
+    args = parser.parse_args()
+    generate_report(args.csv_path, fast=args.fast, checkpoint=not args.no_checkpoint, workers=args.workers)
@@ -5,6 +5,8 @@ import sqlite3
 import re
 from datetime import datetime
 
+import mule_store
+
 # --- CONFIGURATION (UPDATED FOR MODULAR STRUCTURE) ---
 # Get the directory where this script lives (mule_core)
 CORE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -13,34 +15,16 @@ BASE_DIR = os.path.dirname(CORE_DIR)
 
 # Define paths relative to the Project Root
 INCOMING_FILE = os.path.join(BASE_DIR, "docs", os.path.join("docs", "incoming.txt"))
-DB_PATH = os.path.join(BASE_DIR, "data", os.path.join("data", "aegis_master.db"))
+DB_PATH = mule_store.DB_PATH
 PROJECT_ROOT = BASE_DIR
 
 def init_db():
-    # Ensure data directory exists
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ip_assets (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            project TEXT,
-            category TEXT,
-            summary TEXT,
-            search_string TEXT,
-            confidence TEXT,
-            created_at TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    # Schema lives in mule_store migrations; connecting applies any pending ones.
+    mule_store.get_connection()
 
 def periodic_audit():
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        cursor = mule_store.get_connection().cursor()
         cursor.execute("SELECT COUNT(*), MAX(created_at), summary FROM ip_assets")
         row = cursor.fetchone()
         if row and row[0] > 0:
@@ -48,8 +32,7 @@ def periodic_audit():
             print(f"📊 [DATABASE AUDIT]: {row[0]} Assets secured. Latest: {summary}...")
         else:
             print("📊 [DATABASE AUDIT]: Database is healthy but empty.")
-        conn.close()
-    except Exception as e:
+    except sqlite3.Error as e:
         print(f"⚠️ [AUDIT FAILED]: {e}")
 
 def process_ip_payloads(raw_content):
@@ -57,9 +40,7 @@ def process_ip_payloads(raw_content):
     matches = re.findall(pattern, raw_content)
     if not matches:
         return raw_content, False
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    processed_count = 0
+    rows = []
     for json_str in matches:
         try:
             clean_json_str = json_str.strip()
@@ -68,18 +49,17 @@ def process_ip_payloads(raw_content):
             if not all(k in data for k in required):
                 print(f"❌ [VALIDATION FAILED]: Missing keys in IP block.")
                 continue
-            cursor.execute('''
-                INSERT INTO ip_assets (timestamp, project, category, summary, search_string, confidence, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (data.get('timestamp'), data.get('project'), data.get('category'), data.get('summary'), data.get('search_string'), data.get('confidence'), datetime.now().isoformat()))
+            rows.append((data.get('timestamp'), data.get('project'), data.get('category'), data.get('summary'), data.get('search_string'), data.get('confidence'), datetime.now().isoformat()))
             print(f"📡 [IP SENTRY]: Asset Logged -> {data.get('summary')[:50]}")
-            processed_count += 1
         except Exception as e:
             print(f"❌ [PARSING ERROR]: {e}")
-    conn.commit()
-    conn.close()
+    if rows:
+        mule_store.execute_write('''
+            INSERT INTO ip_assets (timestamp, project, category, summary, search_string, confidence, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows, many=True)
     clean_text = re.sub(pattern, '', raw_content).strip()
-    return clean_text, (processed_count > 0)
+    return clean_text, (len(rows) > 0)
 
 def deploy_code():
     if not os.path.exists(INCOMING_FILE): return
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nav_replay.py
+
+Description:
+Replays one mission against a sweep of AMCL parameter sets and reports, per
+set, the localization CPU time and the position error against ground truth.
+The point is to find the cheapest particle / beam settings that still hold
+NAV-RTK-ACC (2.5 cm) on the Orin Nano, rather than running max_particles
+2000 and 60 beams because that is what the file says.
+
+Two mission sources:
+- scenario (default): a scripted drive around a 12' x 26' garden with a
+  simulated 360-beam lidar and slipping wheel odometry. The filter is an
+  AMCL replica (odometry motion model with alpha1-4, likelihood field with
+  z_hit/z_rand/sigma_hit, beam subsampling to max_beams, KLD resampling
+  between min_particles and max_particles, update_min_d/update_min_a gating),
+  so costs and errors scale with the parameters the way AMCL's do. It runs
+  as fast as the CPU allows; no ROS needed.
+- --bag: replays a recorded bag through the real Nav2 stack, once per set,
+  using sim_bringup.launch.py in replay mode (no Gazebo, no RViz, bag /clock
+  fast-forwarded by --rate). CPU time is the amcl process's utime+stime and
+  accuracy compares /amcl_pose with the bag's ground-truth odometry.
+
+Usage:
+python3 nav_replay.py
+python3 nav_replay.py --sets ../src/my_mule_nav/param/amcl_sweep.yaml --seed 7
+python3 nav_replay.py --bag ~/bags/garden_loop --rate 4 --truth-topic /ground_truth
+
+Dependencies:
+- numpy, PyYAML
+- ROS 2 Humble + Nav2 and rclpy (--bag only)
+"""
+
+import os
+import sys
+import copy
+import math
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+import yaml
+
+import mule_mrd
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NAV_PARAMS = os.path.join(BASE_DIR, "src", "my_mule_nav", "param", "mule_params.yaml")
+SWEEP_FILE = os.path.join(BASE_DIR, "src", "my_mule_nav", "param", "amcl_sweep.yaml")
+ACCURACY_REQ_ID = "NAV-RTK-ACC"
+DEFAULT_ACCURACY_CM = 2.5
+BEAM_KEYS = ("max_beams", "laser_max_beams")
+
+# Scripted scenario: 12' x 26' garden (QA persona), two raised beds and a compost bin.
+GARDEN_M = (3.658, 7.925)
+OBSTACLES = [((1.0, 1.6), (2.66, 3.4)), ((1.0, 4.5), (2.66, 6.3)), ((0.0, 3.7), (0.35, 4.2))]
+WAYPOINTS = [(0.7, 0.6), (3.0, 0.6), (3.0, 7.3), (0.7, 7.3), (0.7, 3.95), (3.0, 3.95)]
+LAPS = 2
+MAP_RESOLUTION_M = 0.05   # Same as the costmaps and a saved map.
+SCAN_HZ = 10
+SCAN_BEAMS = 360          # LDS-class 2D lidar, 1 degree steps.
+SCAN_RANGE_M = (0.12, 3.5)
+SCAN_NOISE_M = 0.01
+SPEED_M_S = 0.22          # max_vel_x
+TURN_RAD_S = 1.0          # max_vel_theta
+ODOM_SLIP = (0.02, 0.03)  # Wheel odometry error: fraction of distance, rad per rad turned.
+INIT_SIGMA = (0.05, 0.05)  # Docked start pose is known to about 5 cm / 3 degrees.
+WARMUP_S = 2.0            # Errors before this are not scored.
+KLD_BIN = (0.5, 0.5, math.radians(10))  # AMCL's pf_kdtree cell size.
+
+# --bag replays
+DEFAULT_TRUTH_TOPIC = "/ground_truth"
+CLOCK_IDLE_S = 3.0        # The bag is considered finished once /clock stalls this long.
+
+
+def load_accuracy_cm(requirements=mule_mrd.CACHE):
+    """NAV-RTK-ACC from the requirements table (default if missing)."""
+    return mule_mrd.threshold(ACCURACY_REQ_ID, DEFAULT_ACCURACY_CM, requirements)
+
+
+def load_params(path=NAV_PARAMS):
+    """The full Nav2 parameter file as a dict."""
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def load_sweep(path=SWEEP_FILE):
+    """[(name, overrides)] in file order."""
+    with open(path, encoding="utf-8") as f:
+        sets = (yaml.safe_load(f) or {}).get("sets") or {}
+    if not sets:
+        raise ValueError(f"{path}: no parameter sets under 'sets:'.")
+    return list(sets.items())
+
+
+def amcl_params(base, overrides):
+    """AMCL's ros__parameters with a sweep set applied (beam keys kept in step)."""
+    params = dict(base["amcl"]["ros__parameters"])
+    params.update(overrides)
+    for key in BEAM_KEYS:
+        if key in overrides:
+            params.update({k: overrides[key] for k in BEAM_KEYS})
+    return params
+
+
+# --- geometry ---
+
+def _angle_diff(a, b):
+    return (a - b + np.pi) % (2 * np.pi) - np.pi
+
+
+def _compose(pose, delta):
+    x, y, t = pose
+    dx, dy, dt = delta
+    return (x + dx * math.cos(t) - dy * math.sin(t), y + dx * math.sin(t) + dy * math.cos(t), t + dt)
+
+
+def _relative(a, b):
+    """b expressed in a's frame (a ⊖ b)."""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    c, s = math.cos(a[2]), math.sin(a[2])
+    return (c * dx + s * dy, -s * dx + c * dy, float(_angle_diff(b[2], a[2])))
+
+
+def garden_segments():
+    """Fence and obstacle outlines as an (n, 4) array of x1, y1, x2, y2."""
+    boxes = [((0.0, 0.0), GARDEN_M)] + OBSTACLES
+    segs = []
+    for (x1, y1), (x2, y2) in boxes:
+        segs += [(x1, y1, x2, y1), (x2, y1, x2, y2), (x2, y2, x1, y2), (x1, y2, x1, y1)]
+    return np.array(segs)
+
+
+def likelihood_field(segments, max_dist, resolution=MAP_RESOLUTION_M):
+    """Distance from each map cell centre to the nearest obstacle, clipped at
+    max_dist (AMCL's laser_likelihood_max_dist), like map_update_cspace()."""
+    nx, ny = int(math.ceil(GARDEN_M[0] / resolution)), int(math.ceil(GARDEN_M[1] / resolution))
+    cx, cy = np.meshgrid((np.arange(nx) + 0.5) * resolution, (np.arange(ny) + 0.5) * resolution, indexing="ij")
+    px, py = cx.ravel()[:, None], cy.ravel()[:, None]
+    x1, y1, x2, y2 = segments.T
+    sx, sy = x2 - x1, y2 - y1
+    u = np.clip(((px - x1) * sx + (py - y1) * sy) / (sx * sx + sy * sy), 0.0, 1.0)
+    dist = np.hypot(px - (x1 + u * sx), py - (y1 + u * sy)).min(axis=1)
+    return np.minimum(dist, max_dist).reshape(nx, ny)
+
+
+def raycast(pose, angles, segments, max_range):
+    """Exact ranges from pose along each beam angle (max_range if nothing is hit)."""
+    ox, oy, theta = pose
+    dx, dy = np.cos(theta + angles)[:, None], np.sin(theta + angles)[:, None]
+    x1, y1, x2, y2 = segments.T
+    sx, sy = x2 - x1, y2 - y1
+    denom = dx * sy - dy * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = ((x1 - ox) * sy - (y1 - oy) * sx) / denom
+        u = ((x1 - ox) * dy - (y1 - oy) * dx) / denom
+    t = np.where((denom != 0) & (t > 0) & (u >= 0) & (u <= 1), t, np.inf)
+    return np.minimum(t.min(axis=1), max_range)
+
+
+# --- scripted mission ---
+
+def scenario(seed=0):
+    """Ground truth, odometry and scans at SCAN_HZ for LAPS laps of WAYPOINTS.
+    Returns (times, truth poses, odom poses, scan ranges, beam angles)."""
+    rng = np.random.default_rng(seed)
+    segments = garden_segments()
+    angles = np.linspace(-np.pi, np.pi, SCAN_BEAMS, endpoint=False)
+    dt = 1.0 / SCAN_HZ
+    route = WAYPOINTS * LAPS + WAYPOINTS[:1]
+    pose = (route[0][0], route[0][1], math.atan2(route[1][1] - route[0][1], route[1][0] - route[0][0]))
+    odom = (0.0, 0.0, 0.0)
+    truth, odoms = [pose], [odom]
+    for gx, gy in route[1:]:
+        while True:
+            heading = math.atan2(gy - pose[1], gx - pose[0])
+            turn = float(_angle_diff(heading, pose[2]))
+            remaining = math.hypot(gx - pose[0], gy - pose[1])
+            if abs(turn) > 1e-3:
+                step = (0.0, 0.0, math.copysign(min(abs(turn), TURN_RAD_S * dt), turn))
+            elif remaining > 1e-3:
+                step = (min(remaining, SPEED_M_S * dt), 0.0, 0.0)
+            else:
+                break
+            pose = _compose(pose, step)
+            slip = (step[0] * (1 + rng.normal(0, ODOM_SLIP[0])), 0.0,
+                    step[2] * (1 + rng.normal(0, ODOM_SLIP[1])) + step[0] * rng.normal(0, ODOM_SLIP[1]))
+            odom = _compose(odom, slip)
+            truth.append(pose)
+            odoms.append(odom)
+    scans = []
+    for p in truth:
+        ranges = raycast(p, angles, segments, SCAN_RANGE_M[1])
+        hit = ranges < SCAN_RANGE_M[1]
+        ranges[hit] += rng.normal(0, SCAN_NOISE_M, hit.sum())
+        scans.append(ranges)
+    return np.arange(len(truth)) * dt, truth, odoms, scans, angles
+
+
+class ParticleFilter:
+    """The parts of Nav2's AMCL that decide its cost and accuracy."""
+    def __init__(self, params, field, rng, resolution=MAP_RESOLUTION_M):
+        self.p = params
+        self.field = field
+        self.rng = rng
+        self.resolution = resolution
+        self.max_beams = int(params["max_beams"])
+        self.min_particles = int(params["min_particles"])
+        self.max_particles = int(params["max_particles"])
+        self.particles = np.zeros((0, 3))
+        self.weights = np.zeros(0)
+        self.updates = 0
+        self.particle_sum = 0
+
+    def init(self, pose, sigma):
+        n = self.max_particles
+        self.particles = np.column_stack([self.rng.normal(pose[0], sigma[0], n), self.rng.normal(pose[1], sigma[0], n),
+                                          self.rng.normal(pose[2], sigma[1], n)])
+        self.weights = np.full(n, 1.0 / n)
+
+    def motion(self, delta):
+        """Odometry motion model (nav2_amcl DifferentialMotionModel), delta in the old odom pose's frame."""
+        a1, a2, a3, a4 = (self.p[f"alpha{i}"] for i in range(1, 5))
+        trans = math.hypot(delta[0], delta[1])
+        rot1 = 0.0 if trans < 0.01 else math.atan2(delta[1], delta[0])
+        rot2 = float(_angle_diff(delta[2], rot1))
+        rot1_n = min(abs(float(_angle_diff(rot1, 0.0))), abs(float(_angle_diff(rot1, math.pi))))
+        rot2_n = min(abs(float(_angle_diff(rot2, 0.0))), abs(float(_angle_diff(rot2, math.pi))))
+        n = len(self.particles)
+        rot1_hat = rot1 - self.rng.normal(0, math.sqrt(a1 * rot1_n ** 2 + a2 * trans ** 2), n)
+        trans_hat = trans - self.rng.normal(0, math.sqrt(a3 * trans ** 2 + a4 * rot1_n ** 2 + a4 * rot2_n ** 2), n)
+        rot2_hat = rot2 - self.rng.normal(0, math.sqrt(a1 * rot2_n ** 2 + a2 * trans ** 2), n)
+        heading = self.particles[:, 2] + rot1_hat
+        self.particles[:, 0] += trans_hat * np.cos(heading)
+        self.particles[:, 1] += trans_hat * np.sin(heading)
+        self.particles[:, 2] = heading + rot2_hat
+
+    def sensor(self, ranges, angles):
+        """Likelihood field model: p = 1 + sum(pz^3) over the subsampled beams."""
+        step = (len(ranges) - 1) / max(1, self.max_beams - 1)
+        idx = (np.arange(min(self.max_beams, len(ranges))) * step).astype(int)
+        r, a = ranges[idx], angles[idx]
+        keep = r < SCAN_RANGE_M[1]
+        r, a = r[keep], a[keep]
+        px, py, pt = (self.particles[:, i:i + 1] for i in range(3))
+        ex = ((px + r * np.cos(pt + a)) / self.resolution).astype(int)
+        ey = ((py + r * np.sin(pt + a)) / self.resolution).astype(int)
+        nx, ny = self.field.shape
+        inside = (ex >= 0) & (ex < nx) & (ey >= 0) & (ey < ny)
+        z = np.where(inside, self.field[np.clip(ex, 0, nx - 1), np.clip(ey, 0, ny - 1)],
+                     self.p["laser_likelihood_max_dist"])
+        sigma = self.p["sigma_hit"]
+        pz = self.p["z_hit"] * np.exp(-z * z / (2 * sigma * sigma)) + self.p["z_rand"] / SCAN_RANGE_M[1]
+        self.weights = self.weights * (1.0 + (pz ** 3).sum(axis=1))
+        self.weights /= self.weights.sum()
+
+    def resample(self):
+        """Systematic resampling of max_particles candidates, cut to the KLD
+        bound for the number of histogram bins they occupy (pf_resample_limit)."""
+        n_max = self.max_particles
+        positions = (self.rng.random() + np.arange(n_max)) / n_max
+        picks = np.minimum(np.searchsorted(np.cumsum(self.weights), positions), len(self.weights) - 1)
+        candidates = self.particles[self.rng.permutation(picks)]
+        keys = np.floor(candidates / np.array(KLD_BIN)).astype(np.int64)
+        _, first = np.unique(keys, axis=0, return_index=True)
+        bins = np.zeros(n_max, dtype=np.int64)
+        bins[first] = 1
+        k = np.cumsum(bins)
+        b = 2.0 / (9.0 * np.maximum(k - 1, 1))
+        limit = np.where(k > 1, np.ceil((k - 1) / (2 * self.p["pf_err"]) * (1 - b + np.sqrt(b) * self.p["pf_z"]) ** 3),
+                         self.min_particles)
+        enough = np.nonzero(np.arange(1, n_max + 1) >= np.clip(limit, self.min_particles, n_max))[0]
+        n = int(enough[0]) + 1 if len(enough) else n_max
+        self.particles = candidates[:n].copy()
+        self.weights = np.full(n, 1.0 / n)
+
+    def estimate(self):
+        w = self.weights
+        return (float(w @ self.particles[:, 0]), float(w @ self.particles[:, 1]),
+                math.atan2(float(w @ np.sin(self.particles[:, 2])), float(w @ np.cos(self.particles[:, 2]))))
+
+
+def localize(params, mission, seed=0):
+    """Runs the filter over a scenario(). Returns the raw run: position errors
+    (m), filter CPU seconds, mission seconds, updates and particles used."""
+    times, truth, odoms, scans, angles = mission
+    rng = np.random.default_rng(seed)
+    field = likelihood_field(garden_segments(), params["laser_likelihood_max_dist"])
+    pf = ParticleFilter(params, field, rng)
+    pf.init(truth[0], INIT_SIGMA)
+    resample_interval = max(1, int(params["resample_interval"]))
+
+    errors = []
+    cpu_s = 0.0
+    anchor_odom = odoms[0]
+    estimate = None
+    for i, (t, odom, ranges) in enumerate(zip(times, odoms, scans)):
+        delta = _relative(anchor_odom, odom)
+        first = estimate is None
+        if first or abs(delta[0]) > params["update_min_d"] or abs(delta[1]) > params["update_min_d"] \
+                or abs(delta[2]) > params["update_min_a"]:
+            started = time.process_time()
+            if not first:
+                pf.motion(delta)
+            pf.sensor(ranges, angles)
+            pf.updates += 1
+            pf.particle_sum += len(pf.particles)
+            if pf.updates % resample_interval == 0:
+                pf.resample()
+            estimate = pf.estimate()
+            cpu_s += time.process_time() - started
+            anchor_odom = odom
+        # Between updates the pose is the last estimate carried forward by odometry (map -> odom tf).
+        pose = _compose(estimate, _relative(anchor_odom, odom))
+        if t >= WARMUP_S:
+            errors.append(math.hypot(pose[0] - truth[i][0], pose[1] - truth[i][1]))
+
+    return {"errors": errors, "cpu_s": cpu_s, "duration_s": float(times[-1]) if len(times) else 0.0,
+            "updates": pf.updates, "particles": pf.particle_sum}
+
+
+def _result(params, runs):
+    """Pools the runs of one parameter set into the row report() prints."""
+    errors = np.array([e for run in runs for e in run["errors"]]) * 100
+    cpu_s = sum(run["cpu_s"] for run in runs)
+    duration_s = sum(run["duration_s"] for run in runs)
+    updates = sum(run["updates"] for run in runs)
+    particles = [run["particles"] for run in runs if run["particles"] is not None]
+    return {
+        "max_particles": params.get("max_particles"), "min_particles": params.get("min_particles"),
+        "max_beams": params.get("max_beams"), "updates": updates,
+        "mean_particles": sum(particles) / updates if particles and updates else float("nan"),
+        "cpu_s": cpu_s, "cpu_pct": 100.0 * cpu_s / duration_s if duration_s else float("nan"),
+        "rms_cm": float(np.sqrt((errors ** 2).mean())) if len(errors) else float("nan"),
+        "p95_cm": float(np.percentile(errors, 95)) if len(errors) else float("nan"),
+        "max_cm": float(errors.max()) if len(errors) else float("nan"),
+    }
+
+
+def sweep_scenario(sets, base, seed=0, runs=1):
+    """[(name, result)] for every set over the same `runs` scripted missions
+    (one filter seed per mission, so every set sees the same noise)."""
+    missions = [scenario(seed + i) for i in range(runs)]
+    results = []
+    for name, overrides in sets:
+        params = amcl_params(base, overrides)
+        results.append((name, _result(params, [localize(params, m, seed + i) for i, m in enumerate(missions)])))
+    return results
+
+
+# --- bag replays through Nav2 ---
+
+def _process_cpu_s(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _find_process(name):
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                argv = f.read().split(b"\0")
+        except OSError:
+            continue
+        if argv and os.path.basename(argv[0].decode(errors="replace")) == name:
+            return int(pid)
+    return None
+
+
+def replay_bag(bag, params_file, rate, truth_topic):
+    """One launch of sim_bringup.launch.py in replay mode. Returns
+    (errors m, amcl CPU s or None, bag seconds, updates)."""
+    import rclpy
+    from rclpy.qos import QoSProfile, DurabilityPolicy
+    from rosgraph_msgs.msg import Clock
+    from nav_msgs.msg import Odometry
+    from geometry_msgs.msg import PoseWithCovarianceStamped
+
+    launch = subprocess.Popen(
+        ["ros2", "launch", "my_mule_nav", "sim_bringup.launch.py", f"bag:={bag}", f"rate:={rate}",
+         "rviz:=false", f"params_file:={params_file}"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    rclpy.init()
+    node = rclpy.create_node("nav_replay")
+    truth, poses, clock = [], [], {"first": None, "last": None, "wall": time.monotonic()}
+
+    def stamp(msg):
+        return msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9
+
+    def on_clock(msg):
+        now = msg.clock.sec + msg.clock.nanosec * 1e-9
+        if clock["first"] is None:
+            clock["first"] = now
+        if now != clock["last"]:
+            clock["last"], clock["wall"] = now, time.monotonic()
+
+    node.create_subscription(Clock, "/clock", on_clock, 10)
+    node.create_subscription(Odometry, truth_topic,
+                             lambda m: truth.append((stamp(m), m.pose.pose.position.x, m.pose.pose.position.y)), 50)
+    node.create_subscription(PoseWithCovarianceStamped, "/amcl_pose",
+                             lambda m: poses.append((stamp(m), m.pose.pose.position.x, m.pose.pose.position.y)),
+                             QoSProfile(depth=10, durability=DurabilityPolicy.TRANSIENT_LOCAL))
+    amcl_cpu = None
+    try:
+        while clock["last"] is None or time.monotonic() - clock["wall"] < CLOCK_IDLE_S:
+            rclpy.spin_once(node, timeout_sec=0.1)
+            if launch.poll() is not None:
+                print("ERROR: launch exited early. Run it by hand to see why:")
+                print(f"  ros2 launch my_mule_nav sim_bringup.launch.py bag:={bag} rviz:=false")
+                break
+        pid = _find_process("amcl")
+        amcl_cpu = _process_cpu_s(pid) if pid else None
+    finally:
+        node.destroy_node()
+        rclpy.shutdown()
+        os.killpg(launch.pid, signal.SIGINT)
+        try:
+            launch.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(launch.pid, signal.SIGKILL)
+
+    errors = []
+    if truth:
+        t, x, y = (np.array(col) for col in zip(*sorted(truth)))
+        for ts, px, py in poses:
+            if t[0] <= ts <= t[-1]:
+                errors.append(math.hypot(px - np.interp(ts, t, x), py - np.interp(ts, t, y)))
+    duration = (clock["last"] - clock["first"]) if clock["first"] is not None else 0.0
+    return errors, amcl_cpu, duration, len(poses)
+
+
+def sweep_bag(sets, base, bag, rate=1.0, truth_topic=DEFAULT_TRUTH_TOPIC):
+    results = []
+    for name, overrides in sets:
+        params = copy.deepcopy(base)
+        params["amcl"]["ros__parameters"] = amcl_params(base, overrides)
+        for node_params in params.values():
+            node_params.get("ros__parameters", {})["use_sim_time"] = True
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as f:
+            yaml.safe_dump(params, f)
+        print(f"  Replaying {bag} with '{name}'...")
+        try:
+            errors, cpu_s, duration, updates = replay_bag(bag, f.name, rate, truth_topic)
+        finally:
+            os.unlink(f.name)
+        if cpu_s is None:
+            print("  WARNING: no standalone amcl process found (composed bringup?). CPU time not measured.")
+        run = {"errors": errors, "cpu_s": float("nan") if cpu_s is None else cpu_s, "duration_s": duration,
+               "updates": updates, "particles": None}
+        results.append((name, _result(params["amcl"]["ros__parameters"], [run])))
+    return results
+
+
+def report(results, accuracy_cm):
+    """Prints the sweep table and returns the cheapest set meeting accuracy_cm at p95 (or None)."""
+    print(f"\n--- AMCL sweep vs {ACCURACY_REQ_ID} {accuracy_cm:.1f} cm (p95 position error) ---")
+    width = max([12] + [len(name) for name, _ in results])
+    print(f"  {'set':<{width}} {'particles':>10} {'beams':>5} {'updates':>7} {'mean n':>7} {'CPU s':>7} "
+          f"{'CPU %':>6} {'rms cm':>7} {'p95 cm':>7} {'max cm':>7}")
+    passing = []
+    for name, r in results:
+        ok = r["p95_cm"] <= accuracy_cm
+        if ok:
+            passing.append((r["cpu_s"], name))
+        print(f"  {name:<{width}} {r['max_particles']:>5}/{r['min_particles']:<4} {r['max_beams']:>5} {r['updates']:>7} "
+              f"{r['mean_particles']:>7.0f} {r['cpu_s']:>7.3f} {r['cpu_pct']:>6.2f} {r['rms_cm']:>7.2f} "
+              f"{r['p95_cm']:>7.2f} {r['max_cm']:>7.2f}  {'✅' if ok else '❌'}")
+    if not passing:
+        name, r = min(results, key=lambda item: item[1]["p95_cm"])
+        print(f"❌ No parameter set meets the accuracy requirement (closest: '{name}' at {r['p95_cm']:.2f} cm).")
+        return None
+    best = min(passing)[1]
+    print(f"✅ Cheapest set within {accuracy_cm:.1f} cm: '{best}'")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aegis Gardener AMCL parameter sweep (scripted mission or bag replay)")
+    parser.add_argument("--sets", default=SWEEP_FILE, help="YAML file of AMCL parameter sets.")
+    parser.add_argument("--params", default=NAV_PARAMS, help="Base Nav2 parameter file.")
+    parser.add_argument("--seed", type=int, default=0, help="Scenario noise seed.")
+    parser.add_argument("--runs", type=int, default=3, help="Scripted missions per set (seeds seed..seed+runs-1).")
+    parser.add_argument("--bag", help="Recorded bag to replay through Nav2 instead of the scripted mission.")
+    parser.add_argument("--rate", type=float, default=1.0, help="--bag: playback rate (sim time fast-forward).")
+    parser.add_argument("--truth-topic", default=DEFAULT_TRUTH_TOPIC, help="--bag: ground-truth Odometry topic.")
+    args = parser.parse_args()
+
+    sets = load_sweep(args.sets)
+    base = load_params(args.params)
+    accuracy_cm = load_accuracy_cm()
+    started = time.monotonic()
+    if args.bag:
+        results = sweep_bag(sets, base, args.bag, args.rate, args.truth_topic)
+    else:
+        print(f"Scripted mission: {args.runs} x {LAPS} laps of a {GARDEN_M[0]:.2f} x {GARDEN_M[1]:.2f} m garden, "
+              f"{len(sets)} parameter sets...")
+        results = sweep_scenario(sets, base, args.seed, args.runs)
+    print(f"Sweep took {time.monotonic() - started:.1f} s.")
+    sys.exit(0 if report(results, accuracy_cm) else 1)
+
+
+if __name__ == "__main__":
+    main()
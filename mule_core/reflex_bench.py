@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+reflex_bench.py
+
+Description:
+Hardware-in-the-loop latency benchmark for the safety reflex path. The real
+monitor code runs on the HAL simulator (mule_hal) in real time, so the
+numbers include its scheduling, the I2C batch read, the detector, the safety
+bus and the GPIO write, under whatever CPU load we add:
+
+- overcurrent: an INA219 reading over the limit appears at t0; the current
+  monitor samples it, its detector trips and MotorController.disable() drops
+  the enable pin.
+- obstacle: the HC-SR04 distance drops under STOP_DISTANCE_CM; the avoidance
+  loop's next ping sees it, ObstacleGuard raises an E-stop on the safety bus
+  and the current monitor's bus poll disables the motors.
+
+Latency ends at the disabled_ns timestamp MotorController.disable() takes
+right after the pin write. It starts at the injection for overcurrent, and at
+the trigger of the ping that saw the obstacle for the obstacle path: pings
+follow the sensor's own PING_CYCLE_S, which is detection lag, not reflex.
+The detector's shutdown delay is policy, not reflex, so it is set to 0 here;
+the median filter stays, as on the robot.
+PASS means the worst trial is within the QA reflex budget (SOFT-LAT-MAX).
+
+Usage:
+python3 reflex_bench.py --trials 2000 --load 2
+python3 reflex_bench.py --path obstacle --trials 500 --load 0
+
+Dependencies:
+- Linux (shared-memory safety bus)
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+import contextlib
+import collections
+import multiprocessing as mp
+
+import mule_hal
+import safety_bus
+import current_monitor
+import ultrasonic_avoidance
+
+# --- CONFIGURATION ---
+REFLEX_BUDGET_MS = safety_bus.REFLEX_BUDGET_MS
+SAMPLE_RATE_HZ = 1000           # Current monitor rate on the robot (see mule_runtime).
+OVERCURRENT_A = 3.0             # Injected fault; the channel limit is 2.5 A.
+NORMAL_A = 1.0
+OBSTACLE_CM = 5.0               # Well inside STOP_DISTANCE_CM: simulated echo timing jitter reads long.
+CLEAR_CM = 100.0
+TRIAL_TIMEOUT_S = 1.0           # A trial slower than this is recorded as this (and fails).
+HISTOGRAM_BINS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100)
+PATHS = ("overcurrent", "obstacle")
+
+
+def _burn(stop):
+    while not stop.is_set():
+        pass
+
+
+class CpuLoad:
+    """Busy-loop worker processes for the duration of a `with` block."""
+    def __init__(self, workers):
+        self._stop = mp.Event()
+        self._procs = [mp.Process(target=_burn, args=(self._stop,), daemon=True) for _ in range(workers)]
+
+    def __enter__(self):
+        for p in self._procs:
+            p.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for p in self._procs:
+            p.join(timeout=2)
+            if p.is_alive():
+                p.terminate()
+
+
+class ReflexRig:
+    """
+    Two motor channels on a simulated INA219 bus plus one simulated HC-SR04,
+    with the current monitor and the avoidance loop running on their own
+    threads against a private safety bus. Channel 0 takes the overcurrent
+    faults; channel 1 stays healthy so a trip never stops the monitor.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE_HZ, ping_cycle_s=ultrasonic_avoidance.PING_CYCLE_S):
+        self.gpio = mule_hal.SimGPIO()
+        specs = current_monitor.CHANNELS[:2]
+        self.i2c = mule_hal.SimINA219Bus([spec[0] for spec in specs])
+        self.safety = safety_bus.SafetyBus(f"{safety_bus.BUS_NAME}_reflex_{os.getpid()}")
+        self.channels = [current_monitor.CurrentChannel(address, max_a, 0.0, pin, gpio=self.gpio)
+                         for address, max_a, _, pin in specs]
+        for channel in self.channels:
+            self.i2c.set_reading(channel.address, NORMAL_A)
+        self.monitor = current_monitor.MultiCurrentMonitor(
+            self.channels, self.i2c, sample_rate, display_rate=1, telemetry_s=0, safety=self.safety)
+
+        self.motor = self.channels[0].motor
+        self._disabled = threading.Event()
+        self._enabled = threading.Event()
+        self.gpio.watch(self.channels[0].enable_pin, self._on_enable_pin)
+
+        self._ping_cycle_s = ping_cycle_s
+        self._pings = collections.deque(maxlen=8)  # Recent trigger timestamps.
+        self._running = True
+        self.gpio.attach_sensor(ultrasonic_avoidance.TRIGGER_PIN, ultrasonic_avoidance.ECHO_PIN, CLEAR_CM)
+        self.sensor = ultrasonic_avoidance.UltrasonicSensor(
+            ultrasonic_avoidance.TRIGGER_PIN, ultrasonic_avoidance.ECHO_PIN, self.gpio)
+        self.sensor.setup()
+        self.guard = ultrasonic_avoidance.ObstacleGuard(bus=self.safety)
+        self._threads = [threading.Thread(target=self.monitor.run, daemon=True, name="reflex-monitor"),
+                         threading.Thread(target=self._avoidance_loop, daemon=True, name="reflex-avoidance")]
+
+    def _on_enable_pin(self, pin, level, t_ns):
+        (self._enabled if level else self._disabled).set()
+
+    def _avoidance_loop(self):
+        # ultrasonic_avoidance.main() without the prints.
+        next_ping = time.monotonic()
+        while self._running:
+            next_ping += self._ping_cycle_s
+            self.sensor.trigger()
+            self._pings.append(self.sensor.triggered_ns)
+            self.guard.update(self.sensor.wait())
+            time.sleep(max(0.0, next_ping - time.monotonic()))
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        time.sleep(0.2)  # Let the median filter fill and the first pings land.
+
+    def stop(self):
+        self._running = False
+        self.monitor.stop()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self.sensor.close()
+        self.safety.close(unlink=True)
+
+    def _measure(self, inject, start_ns=None, t_timeout_s=TRIAL_TIMEOUT_S):
+        """start_ns(t0, disabled_ns) picks where the latency starts; default t0."""
+        self._disabled.clear()
+        t0 = time.monotonic_ns()
+        inject()
+        if not self._disabled.wait(t_timeout_s) or self.motor.disabled_ns is None:
+            return t_timeout_s * 1e3
+        disabled_ns = self.motor.disabled_ns
+        return (disabled_ns - (start_ns(t0, disabled_ns) if start_ns else t0)) / 1e6
+
+    def _seen_by_ping(self, t0, disabled_ns):
+        # The halt comes within an echo timeout of the ping that saw the
+        # obstacle, well before the next ping.
+        return max((p for p in list(self._pings) if p <= disabled_ns), default=t0)
+
+    def _await_enabled(self):
+        if not self._enabled.wait(TRIAL_TIMEOUT_S):
+            raise RuntimeError("motor was not re-enabled after the trial")
+        # Random phase against the 1 ms sample and ping schedules.
+        time.sleep(random.uniform(0.002, 0.002 + self._ping_cycle_s))
+
+    def overcurrent_trial(self):
+        channel = self.channels[0]
+        latency = self._measure(lambda: self.i2c.set_reading(channel.address, OVERCURRENT_A))
+        self.i2c.set_reading(channel.address, NORMAL_A)
+        time.sleep(0.01)  # Flush the over-limit samples from the median window.
+        self._enabled.clear()
+        # Operator reset: fresh detector, channel back in service.
+        channel.detector = type(channel.detector)(channel.detector.config)
+        channel.tripped = False
+        channel.motor.enable()
+        self._await_enabled()
+        return latency
+
+    def obstacle_trial(self):
+        echo = ultrasonic_avoidance.ECHO_PIN
+        self._enabled.clear()
+        latency = self._measure(lambda: self.gpio.distance_cm.__setitem__(echo, OBSTACLE_CM),
+                                self._seen_by_ping)
+        self.gpio.distance_cm[echo] = CLEAR_CM  # Guard releases, the monitor re-enables.
+        self._await_enabled()
+        return latency
+
+
+def run(trials=1000, load=0, paths=PATHS, quiet=True):
+    """Runs `trials` per path under `load` busy processes. Returns {path: [latency ms]}."""
+    latencies = {path: [] for path in paths}
+    rig = ReflexRig()
+    sink = io.StringIO() if quiet else sys.stdout
+    # The device classes report every disable/enable; keep that off the terminal.
+    with CpuLoad(load), contextlib.redirect_stdout(sink):
+        rig.start()
+        try:
+            for path in paths:
+                trial = getattr(rig, f"{path}_trial")
+                for _ in range(trials):
+                    latencies[path].append(trial())
+                    sink.seek(0)
+                    sink.truncate()
+        finally:
+            rig.stop()
+    return latencies
+
+
+def summarize(values):
+    """(p50, p99, max) in ms."""
+    return (safety_bus._percentile(values, 0.5), safety_bus._percentile(values, 0.99),
+            max(values) if values else float("nan"))
+
+
+def histogram(values, bins=HISTOGRAM_BINS_MS, width=40):
+    counts = [0] * (len(bins) + 1)
+    for v in values:
+        counts[next((i for i, edge in enumerate(bins) if v <= edge), len(bins))] += 1
+    peak = max(counts) or 1
+    lines, low = [], 0
+    for edge, count in zip(list(bins) + [None], counts):
+        label = f"{low:>5g}-{edge:<5g}ms" if edge is not None else f"  > {low:<7g}ms"
+        lines.append(f"  {label} {count:>6} {'#' * round(width * count / peak)}")
+        low = edge
+    return "\n".join(lines)
+
+
+def report(latencies, budget_ms=REFLEX_BUDGET_MS):
+    """Prints the per-path histogram and percentiles; returns True if every path is within budget."""
+    ok = True
+    for path, values in latencies.items():
+        p50, p99, worst = summarize(values)
+        passed = worst <= budget_ms
+        ok &= passed
+        print(f"\n--- {path} reflex (n={len(values)}) ---")
+        print(histogram(values))
+        print(f"  p50 {p50:6.2f} ms | p99 {p99:6.2f} ms | max {worst:6.2f} ms  "
+              f"{'✅ PASS' if passed else '❌ FAIL'} (budget {budget_ms:.0f} ms)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Safety reflex latency benchmark (HAL simulator, real time)")
+    parser.add_argument("--trials", type=int, default=1000, help="Trials per path.")
+    parser.add_argument("--load", type=int, default=os.cpu_count() or 1,
+                        help="Busy-loop processes running alongside (default: one per CPU).")
+    parser.add_argument("--path", choices=PATHS, action="append", help="Path to measure (default: both).")
+    parser.add_argument("--budget-ms", type=float, default=REFLEX_BUDGET_MS)
+    args = parser.parse_args()
+
+    paths = args.path or PATHS
+    print(f"Measuring {args.trials} trials of {', '.join(paths)} under {args.load} busy process(es)...")
+    started = time.monotonic()
+    latencies = run(args.trials, args.load, paths)
+    print(f"Done in {time.monotonic() - started:.1f} s.")
+    sys.exit(0 if report(latencies, args.budget_ms) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+routing_analytics.py
+
+Routing-accuracy analytics for the expert chain. Compares the roles each test
+prompt expected against the breadcrumb the orchestrator actually walked, and
+ties that to session timing so we can see which routing failures end up in
+the costly fast -> pro re-run (a FAST chain that never leaves PE).
+
+All aggregates are NumPy operations over the columnar snapshot built by
+mule_export, so the report cost does not grow with per-row Python work.
+
+Usage:
+    python3 routing_analytics.py
+    python3 routing_analytics.py --csv logs/mule_test_audit.csv --html logs/routing_report.html
+"""
+
+import os
+import html
+import argparse
+
+import mule_export
+from mule_export import np, ROLES
+
+# --- CONFIGURATION ---
+TOP_PROMPTS = 10
+
+
+def role_bits(masks):
+    """(n,) role bitmasks -> (n, len(ROLES)) boolean matrix."""
+    masks = np.asarray(masks, dtype=np.int64)
+    return ((masks[:, None] >> np.arange(len(ROLES))) & 1).astype(bool)
+
+
+def confusion_matrix(expected_masks, actual_masks):
+    """M[i, j] = rows where role i was expected and role j was visited."""
+    expected = role_bits(expected_masks).astype(np.int64)
+    visited = role_bits(actual_masks).astype(np.int64)
+    return expected.T @ visited
+
+
+def _strings(text):
+    return np.asarray([text[i] for i in range(len(text))], dtype=str)
+
+
+def _group_mean(codes, values, groups):
+    """Per-group mean of values, ignoring NaNs (NaN for empty groups)."""
+    finite = np.isfinite(values)
+    sums = np.bincount(codes[finite], weights=values[finite], minlength=groups)
+    counts = np.bincount(codes[finite], minlength=groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def build_report(tests, sessions):
+    """Aggregates the 'tests' and 'sessions' tables into a plain dict."""
+    expected, actual = tests["expected_mask"], tests["actual_mask"]
+    exp_bits, act_bits = role_bits(expected), role_bits(actual)
+    hops = tests["hops"]
+
+    report = {
+        "rows": len(expected),
+        "confusion": confusion_matrix(expected, actual),
+        "expected": exp_bits.sum(axis=0),
+        "missed": (exp_bits & ~act_bits).sum(axis=0),
+        "unexpected": (act_bits & ~exp_bits).sum(axis=0),
+        "hop_hist": np.bincount(hops) if len(hops) else np.zeros(1, dtype=np.int64),
+        "pass_rate": float(tests["status"].mask("PASS").mean() * 100) if len(hops) else 0.0,
+    }
+
+    # Sessions: latency and escalations per prompt.
+    latency = sessions["latency_ms"]
+    escalated = sessions["escalated"].astype(bool)
+    report["sessions"] = len(latency)
+    report["escalations"] = int(escalated.sum())
+    report["latency_escalated"] = float(np.nanmean(latency[escalated])) if np.isfinite(latency[escalated]).any() else float("nan")
+    report["latency_direct"] = float(np.nanmean(latency[~escalated])) if np.isfinite(latency[~escalated]).any() else float("nan")
+
+    prompts, codes = np.unique(_strings(sessions["user"]), return_inverse=True)
+    groups = len(prompts)
+    runs = np.bincount(codes, minlength=groups)
+    esc = np.bincount(codes, weights=escalated, minlength=groups).astype(np.int64)
+    mean_latency = _group_mean(codes, latency, groups)
+    mean_hops = _group_mean(codes, sessions["hops"].astype(np.float64), groups)
+    order = np.lexsort((-np.nan_to_num(mean_latency), -esc))[:TOP_PROMPTS]
+    report["prompts"] = [{"prompt": str(prompts[i]), "runs": int(runs[i]), "escalations": int(esc[i]),
+                          "mean_latency_ms": float(mean_latency[i]), "mean_hops": float(mean_hops[i])}
+                         for i in order]
+
+    # Which expected roles go missing on prompts that trigger escalations.
+    test_prompts = _strings(tests["prompt"])
+    escalating = prompts[esc > 0]
+    on_escalating = np.isin(test_prompts, escalating) if len(escalating) else np.zeros(len(test_prompts), bool)
+    report["escalated_missed"] = (exp_bits & ~act_bits)[on_escalating].sum(axis=0)
+    # A chain that stays on PE is exactly what the orchestrator escalates.
+    report["pe_only"] = int((hops <= 1).sum())
+    return report
+
+
+def render_text(report):
+    lines = ["=" * 60, "      AEGIS GARDENER: ROUTING ACCURACY", "=" * 60,
+             f"Test rows: {report['rows']} | Pass rate: {report['pass_rate']:.1f}% | PE-only chains: {report['pe_only']}",
+             "", "Expected (rows) vs Visited (cols):",
+             "      " + "".join(f"{r:>6}" for r in ROLES) + "   missed"]
+    for i, role in enumerate(ROLES):
+        cells = "".join(f"{v:>6}" for v in report["confusion"][i])
+        lines.append(f"{role:<6}{cells}   {report['missed'][i]:>6}")
+    lines.append("unexp " + "".join(f"{v:>6}" for v in report["unexpected"]))
+    lines += ["", "Hop count distribution:"]
+    total = max(1, int(report["hop_hist"].sum()))
+    for hops, count in enumerate(report["hop_hist"]):
+        if count:
+            lines.append(f"  {hops} hop(s): {count:>6} {'█' * max(1, round(40 * count / total))}")
+    lines += ["", f"Sessions: {report['sessions']} | FAST->PRO escalations: {report['escalations']}",
+              f"Mean latency: direct {report['latency_direct']:.0f} ms | escalated {report['latency_escalated']:.0f} ms",
+              "Roles missed on escalating prompts: " +
+              (", ".join(f"{r}={n}" for r, n in zip(ROLES, report["escalated_missed"]) if n) or "none"),
+              "", "Top prompts by escalations / latency:"]
+    for p in report["prompts"]:
+        lines.append(f"  [{p['escalations']}/{p['runs']} esc | {p['mean_latency_ms']:.0f} ms | "
+                     f"{p['mean_hops']:.1f} hops] {p['prompt'][:60]}")
+    lines.append("=" * 60)
+    return "\n".join(lines)
+
+
+def render_html(report):
+    def row(cells, tag="td"):
+        return "<tr>" + "".join(f"<{tag}>{html.escape(str(c))}</{tag}>" for c in cells) + "</tr>"
+
+    peak = max(1, int(report["confusion"].max()))
+    matrix = [row(["expected \\ visited"] + list(ROLES) + ["missed"], "th")]
+    for i, role in enumerate(ROLES):
+        cells = "".join(f'<td style="background:rgba(46,125,50,{v / peak:.2f})">{v}</td>'
+                        for v in report["confusion"][i])
+        matrix.append(f"<tr><th>{role}</th>{cells}<td>{report['missed'][i]}</td></tr>")
+    hops = [row([h, c]) for h, c in enumerate(report["hop_hist"]) if c]
+    prompts = [row([p["prompt"], p["runs"], p["escalations"], f"{p['mean_latency_ms']:.0f}", f"{p['mean_hops']:.1f}"])
+               for p in report["prompts"]]
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Routing Accuracy</title>
+<style>body{{font-family:sans-serif}} table{{border-collapse:collapse;margin-bottom:1em}}
+td,th{{border:1px solid #999;padding:4px 8px;text-align:right}}</style></head><body>
+<h1>Aegis Gardener: Routing Accuracy</h1>
+<p>Test rows: {report['rows']} &middot; Pass rate: {report['pass_rate']:.1f}% &middot; PE-only chains: {report['pe_only']}</p>
+<h2>Expected vs visited roles</h2><table>{''.join(matrix)}</table>
+<h2>Hop count distribution</h2><table>{row(['hops', 'rows'], 'th')}{''.join(hops)}</table>
+<h2>Escalations</h2><p>Sessions: {report['sessions']} &middot; FAST&rarr;PRO: {report['escalations']} &middot;
+mean latency direct {report['latency_direct']:.0f} ms / escalated {report['latency_escalated']:.0f} ms</p>
+<table>{row(['prompt', 'runs', 'escalations', 'mean ms', 'mean hops'], 'th')}{''.join(prompts)}</table>
+</body></html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing-accuracy analytics for the expert chain")
+    parser.add_argument("--csv", default=mule_export.TEST_AUDIT_CSV, help="Test audit CSV.")
+    parser.add_argument("--html", help="Also write an HTML report to this path.")
+    args = parser.parse_args()
+
+    mule_export.export_all(args.csv, sources=("sessions", "tests"))
+    report = build_report(mule_export.load_table("tests"), mule_export.load_table("sessions"))
+    print(render_text(report))
+    if args.html:
+        with open(args.html, "w") as f:
+            f.write(render_html(report))
+        print(f"📄 [REPORT] HTML written to {os.path.abspath(args.html)}")
+
+
+if __name__ == "__main__":
+    main()
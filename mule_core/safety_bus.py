@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+safety_bus.py
+
+Description:
+Shared E-stop bus for the hardware scripts. Any monitor (current monitor,
+ultrasonic avoidance, ...) can raise an E-stop; every actuator loop sees it
+within a bounded latency, whether it runs in the same process or another one.
+
+The state lives in a small shared-memory block (multiprocessing.shared_memory)
+guarded by a sequence lock, so reading it is a handful of loads and never
+blocks the writer. Waiters in the raising process are woken through eventfds;
+waiters in other processes poll the block every POLL_S. Each subscriber writes
+an acknowledgement (generation, CLOCK_MONOTONIC ns) into its own slot when it
+reacts, so raise-to-reaction latency is measured per subscriber and checked
+against the QA reflex budget. The block also lists which monitors hold the
+E-stop: release() drops only the caller, and the stop clears when the last
+holder releases it.
+
+Usage:
+python3 safety_bus.py status
+python3 safety_bus.py raise --reason "manual stop"
+python3 safety_bus.py clear
+python3 safety_bus.py bench --processes 2 --threads 2 --rounds 50
+
+Dependencies:
+- Linux (os.eventfd; other platforms fall back to polling)
+"""
+
+import os
+import sys
+import time
+import fcntl
+import select
+import struct
+import argparse
+import threading
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+# --- CONFIGURATION ---
+BUS_NAME = "mule_safety"
+REFLEX_BUDGET_MS = 50.0   # QA persona: E-stop to reaction.
+POLL_S = 0.002            # Cross-process waiters re-check the block this often.
+MAX_SUBSCRIBERS = 16
+LOCK_DIR = "/tmp"
+TORN_READ_SPINS = 100000  # Reads of an odd (mid-write) sequence before assuming a dead writer.
+
+MAGIC = 0x4D554C45  # "MULE"
+VERSION = 2
+MAX_SOURCES = 8
+# magic, version, seq, active, reserved, raised_ns, source, reason
+STATE = struct.Struct("<IIQIIq32s96s")
+# pid, reserved, ack_generation, ack_ns, name
+SLOT = struct.Struct("<IIQq24s")
+# Names of the monitors currently holding the E-stop (written under the flock only).
+SOURCE = struct.Struct("<32s")
+_SOURCES_OFFSET = STATE.size + MAX_SUBSCRIBERS * SLOT.size
+BLOCK_SIZE = _SOURCES_OFFSET + MAX_SOURCES * SOURCE.size
+_SEQ_OFFSET = 8
+_SEQ = struct.Struct("<Q")
+
+
+_TRACK_KWARG = sys.version_info >= (3, 13)
+
+
+def _attach(name, create):
+    if _TRACK_KWARG:
+        shm = shared_memory.SharedMemory(name=name, create=create, size=BLOCK_SIZE if create else 0,
+                                         track=False)
+    else:
+        # Python < 3.13 always tracks the segment and would unlink it when this
+        # process exits, pulling the bus out from under every other process.
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name, create=create, size=BLOCK_SIZE if create else 0)
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SafetyBus:
+    """Handle on the shared E-stop block. One per process is enough."""
+    def __init__(self, name=BUS_NAME):
+        self.name = name
+        try:
+            self._shm = _attach(name, create=False)
+            self.created = False
+        except FileNotFoundError:
+            try:
+                self._shm = _attach(name, create=True)
+                self.created = True
+                STATE.pack_into(self._shm.buf, 0, MAGIC, VERSION, 0, 0, 0, 0, b"", b"")
+            except FileExistsError:
+                self._shm = _attach(name, create=False)
+                self.created = False
+        magic, version = struct.unpack_from("<II", self._shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise RuntimeError(f"Shared memory '{name}' is not a version {VERSION} safety bus")
+        self._buf = self._shm.buf
+        self._local_lock = threading.Lock()
+        self._lock_fd = os.open(os.path.join(LOCK_DIR, f"{name}.lock"), os.O_CREAT | os.O_RDWR, 0o666)
+        self._wakeups = []
+        self._subscribers = []
+
+    # --- state (seqlock) ---
+
+    @contextmanager
+    def _locked(self):
+        """Serializes writers across threads (local lock) and processes (flock)."""
+        with self._local_lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _publish(self, active, source, reason):
+        """Seqlock write of the state. Caller holds _locked()."""
+        seq = _SEQ.unpack_from(self._buf, _SEQ_OFFSET)[0]
+        _SEQ.pack_into(self._buf, _SEQ_OFFSET, seq + 1)  # odd: write in progress
+        STATE.pack_into(self._buf, 0, MAGIC, VERSION, seq + 1, int(active), 0, time.monotonic_ns(),
+                        source.encode()[:32], reason.encode()[:96])
+        _SEQ.pack_into(self._buf, _SEQ_OFFSET, seq + 2)
+        return (seq + 2) // 2
+
+    def _wake(self):
+        for fd in list(self._wakeups):
+            try:
+                os.eventfd_write(fd, 1)
+            except OSError:
+                pass
+
+    def _sources(self):
+        names = []
+        for i in range(MAX_SOURCES):
+            name = SOURCE.unpack_from(self._buf, _SOURCES_OFFSET + i * SOURCE.size)[0].rstrip(b"\0")
+            names.append(name.decode(errors="replace"))
+        return names
+
+    def _set_source(self, index, name):
+        SOURCE.pack_into(self._buf, _SOURCES_OFFSET + index * SOURCE.size, name.encode()[:32])
+
+    def active_sources(self):
+        """Monitors currently holding the E-stop."""
+        return [name for name in self._sources() if name]
+
+    def state(self):
+        """Consistent snapshot: dict with generation, active, raised_ns, source, reason."""
+        for _ in range(TORN_READ_SPINS):
+            before = _SEQ.unpack_from(self._buf, _SEQ_OFFSET)[0]
+            if before & 1:
+                continue
+            _, _, _, active, _, raised_ns, source, reason = STATE.unpack_from(self._buf, 0)
+            if _SEQ.unpack_from(self._buf, _SEQ_OFFSET)[0] == before:
+                return {"generation": before // 2, "active": bool(active), "raised_ns": raised_ns,
+                        "source": source.rstrip(b"\0").decode(errors="replace"),
+                        "reason": reason.rstrip(b"\0").decode(errors="replace")}
+        # A writer died mid-update and left the sequence odd: fail safe.
+        return {"generation": self.generation(), "active": True, "raised_ns": time.monotonic_ns(),
+                "source": "safety_bus", "reason": "torn state block"}
+
+    def generation(self):
+        return _SEQ.unpack_from(self._buf, _SEQ_OFFSET)[0] // 2
+
+    def is_estopped(self):
+        return self.state()["active"]
+
+    def raise_estop(self, source, reason=""):
+        """Latches an E-stop for every subscriber and records `source` as one of
+        its holders. Returns its generation."""
+        source = source.encode()[:32].decode(errors="ignore")
+        with self._locked():
+            names = self._sources()
+            if source not in names and "" in names:
+                self._set_source(names.index(""), source)
+            # With every holder slot taken the stop still latches; only clear() can drop it.
+            generation = self._publish(True, source, reason)
+        self._wake()
+        return generation
+
+    def clear(self, source, reason="cleared"):
+        """Operator override: drops the E-stop and every holder."""
+        with self._locked():
+            for i in range(MAX_SOURCES):
+                self._set_source(i, "")
+            generation = self._publish(False, source, reason)
+        self._wake()
+        return generation
+
+    def release(self, source, reason="condition cleared"):
+        """Removes `source` from the E-stop's holders, so a monitor whose own
+        condition went away cannot cancel somebody else's stop. The E-stop is
+        cleared (and its generation returned) only when no holder is left;
+        otherwise returns None."""
+        source = source.encode()[:32].decode(errors="ignore")
+        with self._locked():
+            names = self._sources()
+            if source not in names:
+                return None
+            self._set_source(names.index(source), "")
+            if any(name for name in names if name != source) or not self.state()["active"]:
+                return None
+            generation = self._publish(False, source, reason)
+        self._wake()
+        return generation
+
+    # --- subscribers ---
+
+    def subscribe(self, name):
+        """Claims an acknowledgement slot. Returns a Subscriber."""
+        with self._locked():
+            for slot in range(MAX_SUBSCRIBERS):
+                offset = STATE.size + slot * SLOT.size
+                pid = SLOT.unpack_from(self._buf, offset)[0]
+                if pid == 0 or not _alive(pid):
+                    SLOT.pack_into(self._buf, offset, os.getpid(), 0, self.generation(), 0, name.encode()[:24])
+                    break
+            else:
+                raise RuntimeError(f"Safety bus '{self.name}' has no free subscriber slots")
+        sub = Subscriber(self, slot, name)
+        self._subscribers.append(sub)
+        return sub
+
+    def _release(self, sub):
+        SLOT.pack_into(self._buf, STATE.size + sub.slot * SLOT.size, 0, 0, 0, 0, b"")
+        if sub.wakeup_fd is not None and sub.wakeup_fd in self._wakeups:
+            self._wakeups.remove(sub.wakeup_fd)
+
+    def latency_report(self):
+        """Reaction latency of every subscriber to the latest E-stop."""
+        state = self.state()
+        rows = []
+        for slot in range(MAX_SUBSCRIBERS):
+            pid, _, ack_gen, ack_ns, name = SLOT.unpack_from(self._buf, STATE.size + slot * SLOT.size)
+            if not pid:
+                continue
+            acked = state["active"] and ack_gen == state["generation"] and ack_ns
+            latency = (ack_ns - state["raised_ns"]) / 1e6 if acked else None
+            rows.append({"slot": slot, "pid": pid, "name": name.rstrip(b"\0").decode(errors="replace"),
+                         "latency_ms": latency,
+                         "within_budget": latency is not None and latency <= REFLEX_BUDGET_MS})
+        return rows
+
+    def close(self, unlink=False):
+        for sub in list(self._subscribers):
+            sub.close()
+        os.close(self._lock_fd)
+        self._buf = None
+        self._shm.close()
+        if unlink:
+            if not _TRACK_KWARG:
+                # unlink() also unregisters; balance the unregister done in _attach.
+                from multiprocessing import resource_tracker
+                resource_tracker.register(self._shm._name, "shared_memory")
+            self._shm.unlink()
+            try:
+                os.unlink(os.path.join(LOCK_DIR, f"{self.name}.lock"))
+            except FileNotFoundError:
+                pass
+
+
+class Subscriber:
+    """
+    One actuator loop's view of the bus. check() is a non-blocking poll for
+    loops that already run on a schedule; wait() blocks until the next E-stop.
+    Both acknowledge the E-stop they return so its latency gets recorded.
+    """
+    def __init__(self, bus, slot, name):
+        self._bus = bus
+        self.slot = slot
+        self.name = name
+        self.seen = bus.generation()
+        self.wakeup_fd = None
+        if hasattr(os, "eventfd"):
+            self.wakeup_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            bus._wakeups.append(self.wakeup_fd)
+
+    def fileno(self):
+        """eventfd signalled on E-stops raised in this process (for select/asyncio)."""
+        return self.wakeup_fd
+
+    def _ack(self, state):
+        self.seen = state["generation"]
+        SLOT.pack_into(self._bus._buf, STATE.size + self.slot * SLOT.size, os.getpid(), 0,
+                       state["generation"], time.monotonic_ns(), self.name.encode()[:24])
+
+    def check(self):
+        """Returns (and acknowledges) a new active E-stop, else None."""
+        if self._bus.generation() == self.seen:
+            return None
+        state = self._bus.state()
+        if state["generation"] == self.seen:
+            return None
+        if not state["active"]:
+            self.seen = state["generation"]
+            return None
+        self._ack(state)
+        return state
+
+    def wait(self, timeout=None):
+        """Blocks until an E-stop newer than the last one seen. None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self.check()
+            if state:
+                return state
+            remaining = POLL_S if deadline is None else min(POLL_S, deadline - time.monotonic())
+            if remaining <= 0:
+                return None
+            if self.wakeup_fd is not None:
+                if select.select([self.wakeup_fd], [], [], remaining)[0]:
+                    try:
+                        os.eventfd_read(self.wakeup_fd)
+                    except BlockingIOError:
+                        pass
+            else:
+                time.sleep(remaining)
+
+    def close(self):
+        if self in self._bus._subscribers:
+            self._bus._subscribers.remove(self)
+            self._bus._release(self)
+        if self.wakeup_fd is not None:
+            os.close(self.wakeup_fd)
+            self.wakeup_fd = None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+_shared = None
+
+def notify(source, reason=""):
+    """Raises an E-stop on the default bus from any script. Never raises itself:
+    a failing bus must not stop the caller's own local shutdown."""
+    global _shared
+    try:
+        if _shared is None:
+            _shared = SafetyBus()
+        return _shared.raise_estop(source, reason)
+    except (OSError, RuntimeError) as e:
+        print(f"WARNING: Safety bus unavailable ({e}).")
+        return None
+
+
+def release(source, reason="condition cleared"):
+    """Counterpart of notify() for self-clearing conditions (e.g. an obstacle that moved)."""
+    try:
+        return _shared.release(source, reason) if _shared is not None else None
+    except (OSError, RuntimeError):
+        return None
+
+
+def _bench_process(name, rounds, ready, results):
+    bus = SafetyBus(name)
+    sub = bus.subscribe(f"proc-{os.getpid()}")
+    ready.release()
+    for _ in range(rounds):
+        state = sub.wait(timeout=5)
+        if state:
+            results.put((time.monotonic_ns() - state["raised_ns"]) / 1e6)
+    sub.close()
+    bus.close()
+
+
+def bench(processes=2, threads=2, rounds=50, name=BUS_NAME + "_bench"):
+    """Raises `rounds` E-stops and measures every subscriber's reaction time."""
+    import multiprocessing as mp
+    bus = SafetyBus(name)
+    ready, results = mp.Semaphore(0), mp.Queue()
+    procs = [mp.Process(target=_bench_process, args=(name, rounds, ready, results)) for _ in range(processes)]
+    latencies = {"thread": [], "process": []}
+
+    def thread_loop(sub):
+        for _ in range(rounds):
+            state = sub.wait(timeout=5)
+            if state:
+                latencies["thread"].append((time.monotonic_ns() - state["raised_ns"]) / 1e6)
+
+    subs = [bus.subscribe(f"thread-{i}") for i in range(threads)]
+    workers = [threading.Thread(target=thread_loop, args=(s,), daemon=True) for s in subs]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        ready.acquire()
+    for w in workers:
+        w.start()
+    for _ in range(rounds):
+        bus.raise_estop("bench", "latency probe")
+        time.sleep(0.01)
+        bus.clear("bench")
+        time.sleep(0.005)
+    for w in workers:
+        w.join()
+    for _ in range(processes * rounds):
+        latencies["process"].append(results.get(timeout=10))
+    for p in procs:
+        p.join()
+    bus.close(unlink=True)
+    return latencies
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aegis Gardener shared safety bus")
+    parser.add_argument("command", choices=("status", "raise", "clear", "bench"))
+    parser.add_argument("--reason", default="manual", help="Reason recorded with raise/clear.")
+    parser.add_argument("--processes", type=int, default=2, help="bench: subscriber processes.")
+    parser.add_argument("--threads", type=int, default=2, help="bench: in-process subscriber threads.")
+    parser.add_argument("--rounds", type=int, default=50, help="bench: E-stops to raise.")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        latencies = bench(args.processes, args.threads, args.rounds)
+        worst = 0.0
+        for kind, values in latencies.items():
+            if values:
+                worst = max(worst, max(values))
+                print(f"  {kind:<8} n={len(values):<4} p50 {_percentile(values, 0.5):6.3f} ms | "
+                      f"p99 {_percentile(values, 0.99):6.3f} ms | max {max(values):6.3f} ms")
+        verdict = "PASS" if worst <= REFLEX_BUDGET_MS else "FAIL"
+        print(f"{'✅' if verdict == 'PASS' else '❌'} [{verdict}] worst reflex {worst:.3f} ms (budget {REFLEX_BUDGET_MS:.0f} ms)")
+        sys.exit(0 if verdict == "PASS" else 1)
+
+    bus = SafetyBus()
+    if args.command == "raise":
+        print(f"🛑 E-stop raised (generation {bus.raise_estop('cli', args.reason)}).")
+        time.sleep(0.2)  # Give subscribers a moment to acknowledge before reporting.
+    elif args.command == "clear":
+        print(f"✅ E-stop cleared (generation {bus.clear('cli', args.reason)}).")
+
+    state = bus.state()
+    print(f"Bus '{bus.name}': {'E-STOP' if state['active'] else 'clear'} | generation {state['generation']} | "
+          f"source {state['source'] or '-'} | reason {state['reason'] or '-'}")
+    for row in bus.latency_report():
+        latency = f"{row['latency_ms']:.3f} ms" if row["latency_ms"] is not None else "no ack"
+        flag = "" if row["latency_ms"] is None else (" ✅" if row["within_budget"] else " ❌ over budget")
+        print(f"  [{row['slot']:>2}] {row['name']:<24} pid {row['pid']:<7} {latency}{flag}")
+    bus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,144 @@
 # safety_engagement_sequence.py
 # This script outlines the safety and engagement protocol for the automated battery swap system.
-# Note: This is a procedural script. Actual hardware control would require a specific
-# hardware abstraction layer (HAL) or SDK (e.g., using libraries like RPi.GPIO, smbus2, etc.).
+# Hardware access goes through mule_hal.py.
 
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-# --- Mock Hardware Abstraction Layer (HAL) ---
-# In a real implementation, these functions would interact with hardware.
+import mule_hal
+from sequence_engine import Sequence, Step
+
+# --- Actuator Configuration ---
+DEFAULT_ACTUATOR_TIMEOUT_S = 3.0
+ACTUATOR_TIMEOUT_S = {  # Full travel plus margin. <--- CONFIRM WITH ME
+    "alignment_pin_1": 2.5,
+    "alignment_pin_2": 2.5,
+    "clamp_1": 3.0,
+    "clamp_2": 3.0,
+}
+# Sized so rollback compensations always get fresh workers even if every
+# actuator of the step that failed is still wedged in a move.
+_ACTUATOR_POOL = ThreadPoolExecutor(max_workers=2 * len(ACTUATOR_TIMEOUT_S), thread_name_prefix="actuator")
+
+# --- Hardware Abstraction Layer (HAL) ---
+# There is no driver for the station's actuators yet, so this is the HAL's
+# actuator model on the real clock. Replace ACTUATORS with another HAL backend
+# (e.g. mule_hal.simulator(VirtualClock()).actuators for load tests).
+ACTUATORS = mule_hal.SimActuators()
 
 def read_sensor(sensor_id):
     """Reads a value from a specified sensor."""
     print(f"Reading sensor: {sensor_id}...")
-    # Mock return values for successful sequence
-    if sensor_id in ["vehicle_presence_f", "vehicle_presence_r"]:
-        return 1.0  # Vehicle detected
-    if sensor_id == "battery_bms_status":
-        return "OK" # Battery reports ready
-    if sensor_id in ["alignment_pin_1_ext", "alignment_pin_2_ext", "clamp_1_locked", "clamp_2_locked"]:
-        return 1.0 # Sensor indicates engaged/locked
-    return 0.0
+    return ACTUATORS.read(sensor_id)
 
 def move_actuator(actuator_id, position, speed):
     """Commands an actuator to move to a specific position at a given speed."""
     print(f"Moving actuator: {actuator_id} to position {position} at speed {speed}...")
-    time.sleep(1) # Simulate movement time
+    ok = ACTUATORS.move(actuator_id, position, speed)
     print(f"Actuator {actuator_id} movement complete.")
-    return True
+    return ok
 
-# --- Main Safety Sequence ---
+# --- Concurrent Actuation ---
 
-def engage_safety_sequence():
+def _move_and_verify(actuator_id, position, speed, verify_sensor):
+    started = time.monotonic()
+    ok = move_actuator(actuator_id, position, speed)
+    if ok and verify_sensor:
+        # Verify this actuator as soon as it arrives, not after the slowest one.
+        ok = bool(read_sensor(verify_sensor))
+    return ok, time.monotonic() - started
+
+def move_actuators(moves, timeouts=None):
     """
-    Executes the full safety and docking engagement sequence.
-    Returns True if the sequence is successful, False otherwise.
+    Commands independent actuators in parallel and waits on all of them.
+    moves: [(actuator_id, position, speed, verify_sensor or None), ...]
+    Returns {actuator_id: (ok, elapsed_s, detail)}. An actuator that misses its
+    timeout is reported as failed; its move is not waited for.
     """
-    print("--- Starting Safety Engagement Sequence ---")
+    timeouts = ACTUATOR_TIMEOUT_S if timeouts is None else timeouts
+    started = time.monotonic()
+    pending = {}
+    for actuator_id, position, speed, verify_sensor in moves:
+        future = _ACTUATOR_POOL.submit(_move_and_verify, actuator_id, position, speed, verify_sensor)
+        pending[future] = (actuator_id, started + timeouts.get(actuator_id, DEFAULT_ACTUATOR_TIMEOUT_S))
+
+    results = {}
+    while pending:
+        next_deadline = min(deadline for _, deadline in pending.values())
+        done, _ = wait(pending, timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            actuator_id, _ = pending.pop(future)
+            try:
+                ok, elapsed = future.result()
+                results[actuator_id] = (ok, elapsed, "ok" if ok else "verify failed")
+            except Exception as e:
+                results[actuator_id] = (False, time.monotonic() - started, f"error: {e}")
+        now = time.monotonic()
+        for future, (actuator_id, deadline) in list(pending.items()):
+            if now >= deadline:
+                del pending[future]
+                results[actuator_id] = (False, now - started, "timeout")
+                print(f"Error: Actuator {actuator_id} did not finish within {deadline - started:.1f} s.")
+    return results
+
+# --- Main Safety Sequence ---
+
+def actuate(actuator_id, position, speed, verify_sensor=None):
+    """Step action: move one actuator, then check its verification sensor."""
+    return lambda: _move_and_verify(actuator_id, position, speed, verify_sensor)[0]
 
-    # 1. Verify Vehicle Presence
-    print("\nStep 1: Verifying vehicle presence...")
+def vehicle_present():
     front_presence = read_sensor("vehicle_presence_f")
     rear_presence = read_sensor("vehicle_presence_r")
     if not (front_presence > 0.9 and rear_presence > 0.9):
         print("Error: Vehicle not detected or not properly positioned.")
         return False
-    print("Vehicle presence confirmed.")
+    return True
 
-    # 2. Confirm Battery Management System (BMS) Status
-    print("\nStep 2: Querying battery BMS for swap readiness...")
+def bms_ready():
     bms_status = read_sensor("battery_bms_status")
     if bms_status != "OK":
         print(f"Error: Battery BMS reported status '{bms_status}'. Not ready for swap.")
         return False
-    print("Battery BMS status confirmed: OK.")
-
-    # 3. Engage Alignment Pins
-    print("\nStep 3: Engaging primary alignment pins...")
-    move_actuator("alignment_pin_1", position="extended", speed=80)
-    move_actuator("alignment_pin_2", position="extended", speed=80)
-
-    # 4. Verify Alignment Pin Engagement
-    print("\nStep 4: Verifying alignment pin engagement...")
-    pin1_extended = read_sensor("alignment_pin_1_ext")
-    pin2_extended = read_sensor("alignment_pin_2_ext")
-    if not (pin1_extended and pin2_extended):
-        print("Error: Alignment pins failed to extend or verify. Aborting.")
-        # Attempt to retract pins as a safety measure
-        move_actuator("alignment_pin_1", position="retracted", speed=100)
-        move_actuator("alignment_pin_2", position="retracted", speed=100)
-        return False
-    print("Alignment pins successfully engaged and verified.")
-
-    # 5. Engage Locking Clamps
-    print("\nStep 5: Engaging battery locking clamps...")
-    move_actuator("clamp_1", position="locked", speed=50)
-    move_actuator("clamp_2", position="locked", speed=50)
-
-    # 6. Verify Locking Clamp Status
-    print("\nStep 6: Verifying locking clamp status...")
-    clamp1_locked = read_sensor("clamp_1_locked")
-    clamp2_locked = read_sensor("clamp_2_locked")
-    if not (clamp1_locked and clamp2_locked):
-        print("Error: Locking clamps failed to engage or verify. Aborting.")
-        # Attempt to retract all hardware as a safety measure
-        move_actuator("alignment_pin_1", position="retracted", speed=100)
-        move_actuator("alignment_pin_2", position="retracted", speed=100)
-        move_actuator("clamp_1", position="unlocked", speed=100)
-        move_actuator("clamp_2", position="unlocked", speed=100)
-        return False
-    print("Locking clamps successfully engaged and verified.")
-
-    print("\n--- Safety Engagement Sequence Complete ---")
-    print("System is secure. Ready for battery lift and swap.")
     return True
 
+def _actuator_timeout(actuator_id):
+    return ACTUATOR_TIMEOUT_S.get(actuator_id, DEFAULT_ACTUATOR_TIMEOUT_S)
+
+# Pins wait for both pre-checks; each clamp waits for both pins. Every actuator
+# step retracts itself on rollback.
+DOCKING_SEQUENCE = Sequence("docking", [
+    Step("vehicle_presence", vehicle_present, timeout_s=1.0),
+    Step("bms_ready", bms_ready, timeout_s=1.0),
+    Step("alignment_pin_1", actuate("alignment_pin_1", "extended", 80, "alignment_pin_1_ext"),
+         after=["vehicle_presence", "bms_ready"],
+         compensate=actuate("alignment_pin_1", "retracted", 100),
+         timeout_s=_actuator_timeout("alignment_pin_1")),
+    Step("alignment_pin_2", actuate("alignment_pin_2", "extended", 80, "alignment_pin_2_ext"),
+         after=["vehicle_presence", "bms_ready"],
+         compensate=actuate("alignment_pin_2", "retracted", 100),
+         timeout_s=_actuator_timeout("alignment_pin_2")),
+    Step("clamp_1", actuate("clamp_1", "locked", 50, "clamp_1_locked"),
+         after=["alignment_pin_1", "alignment_pin_2"],
+         compensate=actuate("clamp_1", "unlocked", 100),
+         timeout_s=_actuator_timeout("clamp_1")),
+    Step("clamp_2", actuate("clamp_2", "locked", 50, "clamp_2_locked"),
+         after=["alignment_pin_1", "alignment_pin_2"],
+         compensate=actuate("clamp_2", "unlocked", 100),
+         timeout_s=_actuator_timeout("clamp_2")),
+])
+
+def engage_safety_sequence():
+    """
+    Executes the full safety and docking engagement sequence.
+    Returns True if the sequence is successful, False otherwise.
+    """
+    run = DOCKING_SEQUENCE.run()
+    run.report()
+    if run.ok:
+        print("System is secure. Ready for battery lift and swap.")
+    return run.ok
+
 if __name__ == '__main__':
     success = engage_safety_sequence()
     if success:
@@ -0,0 +1,258 @@
+# sequence_engine.py
+# Declarative sequence engine for docking and battery-swap procedures.
+#
+# Description:
+# A sequence is a list of Steps defined as data: an action, the steps it
+# must wait for, an optional guard (precondition checked right before the
+# action), an optional compensating action and a timeout. Sequence compiles
+# the list into a dependency graph once (unknown dependencies and cycles are
+# rejected up front) and run() executes it as a state machine:
+#
+#   RUNNING -> SUCCEEDED
+#   RUNNING -> ROLLING_BACK -> ROLLED_BACK    (a step failed, compensation worked)
+#                           -> FAILED         (a compensation failed too)
+#
+# Steps whose dependencies are met run concurrently, so independent branches
+# (the two alignment pins, the two clamps) overlap. On the first failure no new
+# steps start; steps already in flight are allowed to finish, then every step
+# whose action started (including the failed one, which may have moved part
+# way) is compensated in reverse dependency order, again concurrently where
+# the graph allows. A timed-out action keeps running on its worker (threads
+# cannot be interrupted), so rollback first waits up to one more timeout for
+# it to stop; if it is still moving, neither it nor the steps it depends on
+# are compensated and the run ends FAILED.
+#
+# Every step and compensation is timed; report() prints the timings and the
+# critical path, i.e. the chain of steps that decides the total duration.
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError
+
+# --- Configuration ---
+DEFAULT_STEP_TIMEOUT_S = 5.0
+MAX_PARALLEL_STEPS = 8
+
+SUCCEEDED = "SUCCEEDED"
+ROLLED_BACK = "ROLLED_BACK"
+FAILED = "FAILED"
+
+_STEP_POOL = ThreadPoolExecutor(max_workers=MAX_PARALLEL_STEPS, thread_name_prefix="sequence-step")
+
+
+class Step:
+    """
+    One unit of a sequence.
+    :param action: callable() -> truthy on success. Exceptions count as failure.
+    :param after: names of steps that must succeed first.
+    :param guard: callable() -> bool checked immediately before the action.
+    :param compensate: callable() that undoes the action during rollback.
+    :param timeout_s: the action (and its compensation) must finish within this.
+    """
+    def __init__(self, name, action, after=(), guard=None, compensate=None,
+                 timeout_s=DEFAULT_STEP_TIMEOUT_S, description=""):
+        self.name = name
+        self.action = action
+        self.after = tuple(after)
+        self.guard = guard
+        self.compensate = compensate
+        self.timeout_s = timeout_s
+        self.description = description or name
+
+
+class SequenceRun:
+    """Outcome of one Sequence.run(): final state, per-step results and timings."""
+    def __init__(self, sequence):
+        self.sequence = sequence
+        self.state = "RUNNING"
+        self.results = {}     # step name -> (ok, detail, action started)
+        self.rollback = {}    # step name -> (ok, detail, action started)
+        self.timings = []     # (phase, step name, start offset s, duration s, detail)
+        self.running = {}     # step name -> future of a timed-out action still on its worker
+        self.failed_step = None
+        self.duration_s = 0.0
+
+    @property
+    def ok(self):
+        return self.state == SUCCEEDED
+
+    def critical_path(self):
+        """(steps, seconds): the longest dependency chain by measured run time."""
+        durations = {name: d for phase, name, _, d, _ in self.timings if phase == "run"}
+        finish, via = {}, {}
+        for name in self.sequence.order:
+            if name not in durations:
+                continue
+            before = [dep for dep in self.sequence.steps[name].after if dep in finish]
+            prev = max(before, key=finish.get, default=None)
+            finish[name] = durations[name] + (finish[prev] if prev else 0.0)
+            via[name] = prev
+        if not finish:
+            return [], 0.0
+        name = max(finish, key=finish.get)
+        total, path = finish[name], []
+        while name:
+            path.append(name)
+            name = via[name]
+        return path[::-1], total
+
+    def report(self):
+        print(f"\n--- Sequence '{self.sequence.name}': {self.state} in {self.duration_s:.2f} s ---")
+        for phase, name, start, duration, detail in sorted(self.timings, key=lambda t: t[2]):
+            label = name if phase == "run" else f"{name} (rollback)"
+            print(f"  {start:7.3f} s  {duration:7.3f} s  {label:<28} {detail}")
+        path, total = self.critical_path()
+        if path:
+            print(f"  Critical path ({total:.2f} s): {' -> '.join(path)}")
+
+
+class Sequence:
+    def __init__(self, name, steps):
+        self.name = name
+        self.steps = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError(f"Sequence '{name}': duplicate step '{step.name}'.")
+            self.steps[step.name] = step
+        for step in steps:
+            missing = [dep for dep in step.after if dep not in self.steps]
+            if missing:
+                raise ValueError(f"Sequence '{name}': step '{step.name}' waits on unknown {missing}.")
+        self.order = self._topological_order()
+        self.dependents = {n: [s.name for s in steps if n in s.after] for n in self.steps}
+
+    def _topological_order(self):
+        order, marks = [], {}
+
+        def visit(name, trail):
+            if marks.get(name) == "done":
+                return
+            if marks.get(name) == "visiting":
+                raise ValueError(f"Sequence '{self.name}': cycle {' -> '.join(trail + [name])}.")
+            marks[name] = "visiting"
+            for dep in self.steps[name].after:
+                visit(dep, trail + [name])
+            marks[name] = "done"
+            order.append(name)
+
+        for name in self.steps:
+            visit(name, [])
+        return order
+
+    def run(self):
+        run = SequenceRun(self)
+        started = time.monotonic()
+        print(f"--- Starting sequence '{self.name}' ---")
+
+        def forward(step):
+            if step.guard is not None:
+                try:
+                    passed = step.guard()
+                except Exception as e:
+                    return False, f"guard error: {e}", False
+                if not passed:
+                    return False, "guard failed", False
+            ok = bool(step.action())
+            return ok, "ok" if ok else "failed", True
+
+        outcome = self._execute(run, "run", self.order, lambda n: self.steps[n].after, forward,
+                                started, stop_on_failure=True)
+        run.results = outcome
+        failed = [n for n in self.order if n in outcome and not outcome[n][0]]
+        if not failed:
+            run.state = SUCCEEDED
+        else:
+            run.failed_step = failed[0]
+            run.state = "ROLLING_BACK"
+            print(f"Error: step '{failed[0]}' {outcome[failed[0]][1]}. Rolling back.")
+            touched = [n for n in self.order if n in outcome and outcome[n][2] and self.steps[n].compensate]
+            # Never compensate under a step that is still moving: wait for it, or leave its branch alone.
+            blocked = self._still_running(run)
+            for name in [n for n in touched if n in blocked]:
+                touched.remove(name)
+                run.rollback[name] = (False, f"not compensated: {blocked[name]} still running", True)
+            touched_set = set(touched)
+
+            def backward(step):
+                # Compensations usually return nothing; only an explicit False is a failure.
+                ok = step.compensate() is not False
+                return ok, "compensated" if ok else "compensation failed", True
+
+            run.rollback.update(self._execute(
+                run, "rollback", touched[::-1],
+                lambda n: [d for d in self.dependents[n] if d in touched_set], backward,
+                started, stop_on_failure=False))
+            rollback_ok = not blocked and all(ok for ok, _, _ in run.rollback.values())
+            run.state = ROLLED_BACK if rollback_ok else FAILED
+        run.duration_s = time.monotonic() - started
+        return run
+
+    def _still_running(self, run):
+        """Waits up to one more timeout for each timed-out action. Returns
+        {step: stuck step} for the stuck actions and every step they depend on."""
+        blocked = {}
+        for name, future in run.running.items():
+            try:
+                future.result(timeout=self.steps[name].timeout_s)
+                continue
+            except TimeoutError:
+                print(f"Error: step '{name}' is still running; its branch will not be compensated.")
+            except Exception:
+                continue
+            trail = [name]
+            while trail:
+                step = trail.pop()
+                if step not in blocked:
+                    blocked[step] = name
+                    trail.extend(self.steps[step].after)
+        return blocked
+
+    def _execute(self, run, phase, names, waits_on, call, t0, stop_on_failure):
+        """Runs call(step) for each name once everything it waits on has finished.
+        Returns {name: (ok, detail, action_started)}."""
+        results, pending, todo = {}, {}, list(names)
+        halted = False
+        while todo or pending:
+            if not halted:
+                for name in list(todo):
+                    if all(dep in results for dep in waits_on(name)):
+                        todo.remove(name)
+                        step = self.steps[name]
+                        future = _STEP_POOL.submit(self._timed, call, step)
+                        pending[future] = (name, time.monotonic() + step.timeout_s)
+            if not pending:
+                break
+            next_deadline = min(deadline for _, deadline in pending.values())
+            done, _ = wait(pending, timeout=max(0.0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                name, _ = pending.pop(future)
+                begin, end = future.result()[:2]
+                ok, detail, touched = future.result()[2]
+                results[name] = (ok, detail, touched)
+                run.timings.append((phase, name, begin - t0, end - begin, detail))
+            now = time.monotonic()
+            for future, (name, deadline) in list(pending.items()):
+                if now >= deadline:
+                    del pending[future]
+                    step = self.steps[name]
+                    if future.cancel():
+                        # Still queued behind other steps: it never started.
+                        results[name] = (False, "timed out before starting", False)
+                        continue
+                    # The action is still running on its worker; treat it as having moved.
+                    results[name] = (False, f"timed out after {step.timeout_s:.1f} s", True)
+                    if phase == "run":
+                        run.running[name] = future
+                    run.timings.append((phase, name, deadline - step.timeout_s - t0, step.timeout_s, "timeout"))
+            if stop_on_failure and any(not ok for ok, _, _ in results.values()):
+                halted = True
+        return results
+
+    @staticmethod
+    def _timed(call, step):
+        begin = time.monotonic()
+        try:
+            result = call(step)
+        except Exception as e:
+            result = (False, f"error: {e}", True)
+        return begin, time.monotonic(), result
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+sim_timing.py
+
+Description:
+Boots a sim profile from sim_bringup.launch.py and records how long it takes
+to come up and how fast it runs. Startup time is launch to the first /clock
+message (gzserver up, world loaded); the real-time factor is sim seconds over
+wall seconds for the following --duration. Each run is appended to
+logs/sim_timing.csv, and the exit status fails the run if startup is slower
+or the real-time factor lower than the given limits, so CI can gate on it.
+
+Usage:
+python3 sim_timing.py
+python3 sim_timing.py --profile quick --duration 20 --min-rtf 1.0 --max-startup 15
+python3 sim_timing.py --profile full --min-rtf 0
+
+Dependencies:
+- ROS 2 Humble + gazebo_ros, rclpy, a built my_mule_nav workspace
+"""
+
+import os
+import csv
+import sys
+import time
+import signal
+import argparse
+import datetime
+import subprocess
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TIMING_CSV = os.path.join(BASE_DIR, "logs", "sim_timing.csv")
+FIELDS = ["timestamp", "profile", "world", "startup_s", "real_time_factor", "sim_s", "wall_s"]
+DEFAULT_DURATION_S = 20.0
+STARTUP_TIMEOUT_S = 120.0
+DEFAULT_MAX_STARTUP_S = 15.0   # "Boots in seconds."
+DEFAULT_MIN_RTF = 1.0          # Regression runs must beat real time.
+
+
+def real_time_factor(samples):
+    """samples: [(wall s, sim s)] -> sim seconds per wall second over the span."""
+    if len(samples) < 2:
+        return float("nan")
+    (wall0, sim0), (wall1, sim1) = samples[0], samples[-1]
+    return (sim1 - sim0) / (wall1 - wall0) if wall1 > wall0 else float("nan")
+
+
+def record(row, path=TIMING_CSV):
+    """Appends one run to the timing log (header written on first use)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    new = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if new:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def measure(profile, world="", duration_s=DEFAULT_DURATION_S):
+    """Launches the profile and watches /clock. Returns (startup s or None, [(wall, sim)])."""
+    import rclpy
+    from rosgraph_msgs.msg import Clock
+
+    cmd = ["ros2", "launch", "my_mule_nav", "sim_bringup.launch.py", f"profile:={profile}"]
+    if world:
+        cmd.append(f"world:={world}")
+    started = time.monotonic()
+    launch = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    rclpy.init()
+    node = rclpy.create_node("sim_timing")
+    samples = []
+    node.create_subscription(
+        Clock, "/clock", lambda m: samples.append((time.monotonic(), m.clock.sec + m.clock.nanosec * 1e-9)), 10)
+    startup_s = None
+    try:
+        while True:
+            rclpy.spin_once(node, timeout_sec=0.1)
+            now = time.monotonic()
+            if startup_s is None and samples:
+                startup_s = samples[0][0] - started
+            if startup_s is None and now - started > STARTUP_TIMEOUT_S:
+                print(f"ERROR: no /clock within {STARTUP_TIMEOUT_S:.0f} s of launch.")
+                break
+            if launch.poll() is not None:
+                print("ERROR: launch exited early. Run it by hand to see why:")
+                print(f"  {' '.join(cmd)}")
+                break
+            if startup_s is not None and now - started - startup_s >= duration_s:
+                break
+    finally:
+        node.destroy_node()
+        rclpy.shutdown()
+        os.killpg(launch.pid, signal.SIGINT)
+        try:
+            launch.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            os.killpg(launch.pid, signal.SIGKILL)
+    return startup_s, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aegis Gardener sim startup time and real-time factor")
+    parser.add_argument("--profile", default="quick", help="sim_bringup.launch.py profile (quick, full).")
+    parser.add_argument("--world", default="", help="Override the profile's world.")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION_S, help="Wall seconds to measure RTF over.")
+    parser.add_argument("--max-startup", type=float, default=DEFAULT_MAX_STARTUP_S)
+    parser.add_argument("--min-rtf", type=float, default=DEFAULT_MIN_RTF)
+    args = parser.parse_args()
+
+    print(f"Launching profile '{args.profile}'...")
+    startup_s, samples = measure(args.profile, args.world, args.duration)
+    rtf = real_time_factor(samples)
+    sim_s = samples[-1][1] - samples[0][1] if len(samples) > 1 else 0.0
+    wall_s = samples[-1][0] - samples[0][0] if len(samples) > 1 else 0.0
+    record({"timestamp": datetime.datetime.now().isoformat(timespec="seconds"), "profile": args.profile,
+            "world": args.world or "-", "startup_s": f"{startup_s:.2f}" if startup_s is not None else "",
+            "real_time_factor": f"{rtf:.2f}", "sim_s": f"{sim_s:.1f}", "wall_s": f"{wall_s:.1f}"})
+
+    startup_ok = startup_s is not None and startup_s <= args.max_startup
+    rtf_ok = rtf >= args.min_rtf
+    startup_text = f"{startup_s:.1f} s" if startup_s is not None else "never"
+    print(f"  Startup:          {startup_text} (limit {args.max_startup:.0f} s) {'✅' if startup_ok else '❌'}")
+    print(f"  Real-time factor: {rtf:.2f} over {wall_s:.1f} s (minimum {args.min_rtf:.2f}) {'✅' if rtf_ok else '❌'}")
+    print(f"  Logged to {TIMING_CSV}")
+    sys.exit(0 if startup_ok and rtf_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
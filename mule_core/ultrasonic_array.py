@@ -0,0 +1,234 @@
+# ultrasonic_array.py
+# Aegis Gardener Ultrasonic Array Scheduler
+#
+# Description:
+# Drives several HC-SR04 sensors around the chassis. Sensors whose beams
+# overlap would hear each other's bursts, so the scheduler colours the
+# overlap graph into firing groups: every sensor in a group pings at the same
+# time, groups fire back to back. A group's slot ends as soon as its last echo
+# returns (or on the ping timeout), so the whole-array refresh rate tracks
+# the physical round-trip limit instead of a fixed loop delay.
+#
+# Each sensor's readings go through a median-of-k filter with range-gate
+# outlier rejection. A publisher thread emits the fused nearest-obstacle
+# distance at a fixed rate.
+#
+# Usage:
+# python3 ultrasonic_array.py --simulate
+# python3 ultrasonic_array.py --simulate --publish-hz 50 --median-k 3
+
+import time
+import argparse
+import threading
+from collections import deque
+
+import mule_hal
+import ultrasonic_avoidance
+from ultrasonic_avoidance import UltrasonicSensor, ECHO_TIMEOUT_S, MAX_MISSED_ECHOES, MAX_RANGE_CM
+
+# --- Configuration ---
+# (name, trigger pin, echo pin, bearing deg (0 = forward, + = left), beam width deg)
+SENSORS = [
+    ("front",       23, 24,    0, 30),  # <--- CONFIRM WITH EE
+    ("front_left",  5,  6,    35, 30),  # <--- CONFIRM WITH EE
+    ("front_right", 13, 19,  -35, 30),  # <--- CONFIRM WITH EE
+    ("left",        17, 27,   90, 30),  # <--- CONFIRM WITH EE
+    ("right",       22, 10,  -90, 30),  # <--- CONFIRM WITH EE
+    ("rear",        9,  11,  180, 30),  # <--- CONFIRM WITH EE
+]
+CROSSTALK_MARGIN_DEG = 15  # Extra separation required before two sensors may fire together.
+SLOT_GUARD_S = 0.004       # Let reverberation from the last burst die down before the next group.
+MEDIAN_K = 5
+MIN_RANGE_CM = 2.0
+STALE_S = 0.25             # A sensor with no fresh reading for this long makes the fused value unknown.
+PUBLISH_HZ = 20
+
+
+def _angle_between(a, b):
+    return abs((a - b + 180) % 360 - 180)
+
+
+def firing_groups(specs, margin_deg=CROSSTALK_MARGIN_DEG):
+    """Greedy colouring of the beam-overlap graph. Returns lists of sensor names."""
+    conflicts = {s[0]: set() for s in specs}
+    for i, (a, _, _, bearing_a, fov_a) in enumerate(specs):
+        for b, _, _, bearing_b, fov_b in specs[i + 1:]:
+            if _angle_between(bearing_a, bearing_b) < (fov_a + fov_b) / 2 + margin_deg:
+                conflicts[a].add(b)
+                conflicts[b].add(a)
+    groups = []
+    for name in sorted(conflicts, key=lambda n: -len(conflicts[n])):
+        for group in groups:
+            if not conflicts[name] & set(group):
+                group.append(name)
+                break
+        else:
+            groups.append([name])
+    return groups
+
+
+class MedianFilter:
+    """Median of the last k accepted readings. Readings outside the sensor's
+    range gate are rejected. A missed echo is not a reading (a dead or
+    blocked sensor must not look like open space): misses are counted, and
+    after MAX_MISSED_ECHOES in a row the sensor is faulted."""
+    def __init__(self, k=MEDIAN_K):
+        self._window = deque(maxlen=k)
+        self.rejected = 0
+        self.missed = 0
+        self.updated = None
+
+    @property
+    def faulted(self):
+        return self.missed >= MAX_MISSED_ECHOES
+
+    def push(self, distance_cm, now):
+        if distance_cm is None:
+            self.missed += 1
+            return
+        if not MIN_RANGE_CM <= distance_cm <= MAX_RANGE_CM:
+            self.rejected += 1
+            return
+        self.missed = 0
+        self._window.append(distance_cm)
+        self.updated = now
+
+    def value(self):
+        if not self._window:
+            return None
+        ordered = sorted(self._window)
+        mid = len(ordered) // 2
+        return ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2
+
+
+class UltrasonicArray:
+    """Schedules the firing groups on one thread and publishes fused readings on another."""
+    def __init__(self, specs=SENSORS, gpio=None, median_k=MEDIAN_K, publish_hz=PUBLISH_HZ,
+                 timeout_s=ECHO_TIMEOUT_S):
+        self._gpio = gpio or ultrasonic_avoidance.GPIO
+        self._clock = mule_hal.clock_of(self._gpio)
+        self.sensors = {name: UltrasonicSensor(trig, echo, self._gpio, name) for name, trig, echo, _, _ in specs}
+        self.filters = {name: MedianFilter(median_k) for name in self.sensors}
+        self.groups = firing_groups(specs)
+        self._timeout_s = timeout_s
+        self._publish_s = 1.0 / publish_hz
+        self._subscribers = []
+        self._halt = threading.Event()
+        self._threads = []
+        self.cycles = 0
+        self._started = None
+
+    def subscribe(self, callback):
+        """callback(timestamp, nearest_cm, sensor_name, readings) at the publish rate.
+        nearest_cm is None while any sensor is stale or faulted (treat as blocked)."""
+        self._subscribers.append(callback)
+
+    def setup(self):
+        self._gpio.setmode(self._gpio.BCM)
+        for sensor in self.sensors.values():
+            sensor.setup()
+
+    def fire_group(self, names):
+        """Pings every sensor in a group at once and waits for all echoes."""
+        for name in names:
+            self.sensors[name].trigger()
+        clock = self._clock
+        deadline = clock.now() + self._timeout_s
+        now = clock.now()
+        for name in names:
+            distance = self.sensors[name].wait(max(0.0, deadline - clock.now()))
+            now = clock.now()
+            self.filters[name].push(distance, now)
+        return now
+
+    def run_cycle(self):
+        for group in self.groups:
+            self.fire_group(group)
+            self._clock.sleep(SLOT_GUARD_S)
+        self.cycles += 1
+
+    def fused(self, now=None):
+        """(nearest_cm, sensor_name, readings). nearest_cm is None if any sensor is
+        stale or faulted; sensor_name is then the first such sensor."""
+        now = self._clock.now() if now is None else now
+        readings = {name: f.value() for name, f in self.filters.items()}
+        stale = [name for name, f in self.filters.items()
+                 if f.faulted or f.updated is None or now - f.updated > STALE_S]
+        if stale:
+            return None, stale[0], readings
+        name = min(readings, key=readings.get)
+        return readings[name], name, readings
+
+    def refresh_rate(self):
+        elapsed = self._clock.now() - self._started if self._started else 0
+        return self.cycles / elapsed if elapsed > 0 else 0.0
+
+    def _scan_loop(self):
+        while not self._halt.is_set():
+            self.run_cycle()
+
+    def _publish_loop(self):
+        deadline = time.monotonic()
+        while not self._halt.is_set():
+            deadline += self._publish_s
+            self._halt.wait(max(0.0, deadline - time.monotonic()))
+            nearest, name, readings = self.fused()
+            for callback in self._subscribers:
+                callback(time.time(), nearest, name, readings)
+
+    def start(self):
+        self._started = self._clock.now()
+        self._threads = [threading.Thread(target=self._scan_loop, name="ultrasonic-scan", daemon=True),
+                         threading.Thread(target=self._publish_loop, name="ultrasonic-publish", daemon=True)]
+        for t in self._threads:
+            t.start()
+
+    def stop(self):
+        self._halt.set()
+        for t in self._threads:
+            t.join(timeout=1.0)
+        for sensor in self.sensors.values():
+            sensor.close()
+
+    def cleanup(self):
+        """stop(), then release the array's GPIO pins."""
+        self.stop()
+        self._gpio.cleanup()
+
+
+def simulated_gpio(specs=SENSORS, distance_cm=150.0, clock=None):
+    gpio = mule_hal.SimGPIO(clock)
+    for _, trig, echo, _, _ in specs:
+        gpio.attach_sensor(trig, echo, distance_cm)
+    return gpio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aegis Gardener ultrasonic array scheduler")
+    parser.add_argument("--simulate", action="store_true", help="Use the simulated GPIO backend.")
+    parser.add_argument("--publish-hz", type=float, default=PUBLISH_HZ, help="Fused distance publish rate.")
+    parser.add_argument("--median-k", type=int, default=MEDIAN_K, help="Readings per sensor in the median filter.")
+    args = parser.parse_args()
+
+    gpio = simulated_gpio() if args.simulate or ultrasonic_avoidance.SIMULATED else None
+    array = UltrasonicArray(gpio=gpio, median_k=args.median_k, publish_hz=args.publish_hz)
+    array.setup()
+    print("Firing groups: " + " | ".join(", ".join(g) for g in array.groups))
+
+    def show(ts, nearest, name, readings):
+        text = "STALE" if nearest is None else f"{nearest:6.1f} cm ({name})"
+        print(f"  Nearest: {text} | array {array.refresh_rate():5.1f} Hz", end="\r", flush=True)
+
+    array.subscribe(show)
+    array.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\nUltrasonic array stopped by user.")
+    finally:
+        array.cleanup()
+
+
+if __name__ == "__main__":
+    main()
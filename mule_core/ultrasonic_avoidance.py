@@ -1,4 +1,3 @@
-```python
 # ultrasonic_avoidance.py
 # Aegis Gardener Obstacle Avoidance Module
 #
@@ -8,84 +7,320 @@
 # distance and will command the motor controller to halt all motion
 # if an object is detected within the defined safety threshold.
 #
+# Echo timing is interrupt driven: GPIO edge callbacks timestamp the echo
+# pulse on the HAL clock (mule_hal.py) while the loop sleeps on an Event, so the loop
+# uses almost no CPU and every ping has a hard timeout. A missed echo can no
+# longer hang the safety loop; repeated misses halt the motors (fail safe).
+#
 # Pinout (BCM numbering):
 # - TRIGGER_PIN: GPIO 23
 # - ECHO_PIN:    GPIO 24
+#
+# Usage:
+# python3 ultrasonic_avoidance.py
+# python3 ultrasonic_avoidance.py --mode poll
+# python3 ultrasonic_avoidance.py --simulate --sim-distance 15
+# python3 ultrasonic_avoidance.py --array --simulate   (all sensors, see ultrasonic_array.py)
 
-import RPi.GPIO as GPIO
 import time
-# Assuming a motor controller module exists with a stop() function.
-# from motor_controller import stop_motors 
+import argparse
+import threading
+
+import mule_hal
+import safety_bus
+from mule_hal import SimGPIO, SPEED_OF_SOUND_CM_S
+
+# RPi.GPIO on the Pi; None until setup_sensor() builds a simulated sensor elsewhere.
+SIMULATED = mule_hal.SIMULATED
+GPIO = None if SIMULATED else mule_hal.gpio()
+# Motor halts go out as E-stops on the shared safety bus (safety_bus.py);
+# every actuator loop subscribed to the bus stops its outputs.
 
 # --- Configuration ---
 TRIGGER_PIN = 23
 ECHO_PIN = 24
 STOP_DISTANCE_CM = 20.0  # Safety threshold in centimeters.
-LOOP_DELAY_S = 0.1       # Delay between sensor readings.
+# Trigger-to-trigger period. The HC-SR04 needs a >= 60 ms measurement cycle so
+# late echoes of one ping do not land in the next. The reflex does not come
+# from pinging faster: the halt follows the echo of the ping that sees the
+# obstacle, at most ECHO_TIMEOUT_S after its trigger, inside the 50 ms budget
+# (SOFT-LAT-MAX; see reflex_bench.py).
+PING_CYCLE_S = 0.060
+TRIGGER_PULSE_S = 0.00001
+# HC-SR04 range is ~400 cm (23.3 ms round trip). With nothing in range it
+# still answers, with a ~38 ms pulse: the timeout must outlast that pulse
+# (plus ~0.5 ms burst start-up) or open space reads as a dead sensor.
+ECHO_TIMEOUT_S = 0.040
+MAX_RANGE_CM = 400.0     # Longer pulses (the no-target pulse) read as this: clear.
+MAX_MISSED_ECHOES = 3    # Consecutive timeouts before we treat the sensor as failed.
+RESUME_MARGIN_CM = 10.0  # Hysteresis: stay halted until the path is this much clearer.
+
+
+class UltrasonicSensor:
+    """
+    One HC-SR04. trigger() starts a ping and returns immediately; the echo
+    edges are timestamped in a GPIO callback and wait() blocks on an Event
+    until the falling edge or the timeout, whichever comes first.
+
+    The callback does not read the pin to tell rising from falling: on a
+    short echo the pin is often low again by the time it runs. The first
+    edge after trigger() is the rise, the second the fall. on_echo(distance),
+    if given, is called from the callback on the fall, so a caller that does
+    not block in wait() still reacts as soon as the echo is in.
+    """
+    def __init__(self, trigger_pin, echo_pin, gpio=None, name="front", on_echo=None):
+        self.name = name
+        self.on_echo = on_echo
+        self.trigger_pin = trigger_pin
+        self.echo_pin = echo_pin
+        self._gpio = gpio or GPIO
+        self._clock = mule_hal.clock_of(self._gpio)
+        self._rise_ns = None
+        self._fall_ns = None
+        self.triggered_ns = None  # When the last burst went out (reflex latency measurements).
+        self._done = threading.Event()
+        self._edges = False
+
+    def setup(self, edges=True):
+        gpio = self._gpio
+        gpio.setup(self.trigger_pin, gpio.OUT)
+        gpio.setup(self.echo_pin, gpio.IN)
+        # Ensure trigger is low to start
+        gpio.output(self.trigger_pin, False)
+        if edges:
+            gpio.add_event_detect(self.echo_pin, gpio.BOTH, callback=self._on_edge)
+        self._edges = edges
+
+    def close(self):
+        if self._edges:
+            self._gpio.remove_event_detect(self.echo_pin)
+            self._edges = False
+
+    def _on_edge(self, channel):
+        now = self._clock.now_ns()
+        if self._rise_ns is None:
+            self._rise_ns = now
+        elif self._fall_ns is None:
+            self._fall_ns = now
+            self._done.set()
+            if self.on_echo is not None:
+                self.on_echo(self._distance())
+
+    def _distance(self):
+        return min((self._fall_ns - self._rise_ns) / 1e9 * SPEED_OF_SOUND_CM_S / 2, MAX_RANGE_CM)
+
+    @property
+    def echoed(self):
+        """True once the last trigger()'s echo has been timed."""
+        return self._done.is_set()
+
+    def trigger(self):
+        """Sends the 10 us trigger pulse."""
+        self._rise_ns = self._fall_ns = None
+        self._done.clear()
+        self._gpio.output(self.trigger_pin, True)
+        self._clock.sleep(TRIGGER_PULSE_S)
+        # The burst starts on the falling edge.
+        self.triggered_ns = self._clock.now_ns()
+        self._gpio.output(self.trigger_pin, False)
+
+    def wait(self, timeout_s=ECHO_TIMEOUT_S):
+        """Distance in cm for the last trigger(), or None if no echo arrived in time."""
+        if not self._clock.wait(self._done, timeout_s):
+            return None
+        return self._distance()
+
+    def measure(self, timeout_s=ECHO_TIMEOUT_S):
+        self.trigger()
+        return self.wait(timeout_s)
+
+    def measure_polling(self, timeout_s=ECHO_TIMEOUT_S):
+        """Fallback for platforms without edge detection: polls the echo pin,
+        but on a monotonic ns clock and with the same hard deadline."""
+        gpio = self._gpio
+        clock = self._clock
+        self.trigger()
+        deadline = clock.now_ns() + int(timeout_s * 1e9)
+
+        # Record the last low timestamp for the echo pin
+        pulse_start = clock.now_ns()
+        while gpio.input(self.echo_pin) == 0:
+            clock.spin()
+            pulse_start = clock.now_ns()
+            if pulse_start > deadline:
+                return None
+
+        # Record the last high timestamp for the echo pin
+        pulse_end = pulse_start
+        while gpio.input(self.echo_pin) == 1:
+            clock.spin()
+            pulse_end = clock.now_ns()
+            if pulse_end > deadline:
+                return None
+
+        return min((pulse_end - pulse_start) / 1e9 * SPEED_OF_SOUND_CM_S / 2, MAX_RANGE_CM)
 
-def setup_sensor():
+
+_sensor = None
+_mode = "edge"
+
+def setup_sensor(mode="edge", gpio=None):
     """Initializes GPIO pins for the ultrasonic sensor."""
+    global _sensor, _mode, GPIO
+    if gpio is not None:
+        GPIO = gpio
+    elif GPIO is None:
+        GPIO = SimGPIO()
+        GPIO.attach_sensor(TRIGGER_PIN, ECHO_PIN)
+        print("WARNING: RPi.GPIO not found. Using simulated sensor.")
     GPIO.setmode(GPIO.BCM)
-    GPIO.setup(TRIGGER_PIN, GPIO.OUT)
-    GPIO.setup(ECHO_PIN, GPIO.IN)
-    # Ensure trigger is low to start
-    GPIO.output(TRIGGER_PIN, False)
-    print("Ultrasonic sensor pins initialized.")
+    _mode = mode
+    _sensor = UltrasonicSensor(TRIGGER_PIN, ECHO_PIN, GPIO)
+    _sensor.setup(edges=(mode == "edge"))
+    print(f"Ultrasonic sensor pins initialized ({mode} timing).")
     time.sleep(1)
 
-def get_distance():
+def get_distance(timeout_s=ECHO_TIMEOUT_S):
     """
     Triggers the sensor and reads the echo to calculate distance.
-    Returns the distance in centimeters.
+    Returns the distance in centimeters, or None if no echo arrived
+    within timeout_s.
+    """
+    if _mode == "poll":
+        return _sensor.measure_polling(timeout_s)
+    return _sensor.measure(timeout_s)
+
+class ObstacleGuard:
+    """
+    Halt/resume decisions for one distance stream: hysteresis on the stop
+    distance and a fail-safe halt after MAX_MISSED_ECHOES missed echoes.
+    Halts go out as E-stops on the safety bus (the default one unless a bus
+    is given). update() returns the operator messages for this reading.
+    max_missed=1 suits inputs that already debounce misses (the array's
+    fused distance).
     """
-    # Send a 10us pulse to trigger the sensor
-    GPIO.output(TRIGGER_PIN, True)
-    time.sleep(0.00001)
-    GPIO.output(TRIGGER_PIN, False)
-
-    pulse_start_time = time.time()
-    pulse_end_time = time.time()
-
-    # Record the last low timestamp for the echo pin
-    while GPIO.input(ECHO_PIN) == 0:
-        pulse_start_time = time.time()
-
-    # Record the last high timestamp for the echo pin
-    while GPIO.input(ECHO_PIN) == 1:
-        pulse_end_time = time.time()
-
-    pulse_duration = pulse_end_time - pulse_start_time
-    
-    # Speed of sound is ~34300 cm/s.
-    # Distance = (time * speed_of_sound) / 2 (for there and back)
-    distance = (pulse_duration * 34300) / 2
-    
-    return distance
+    def __init__(self, bus=None, source="ultrasonic_avoidance", max_missed=MAX_MISSED_ECHOES):
+        self._bus = bus
+        self._source = source
+        self.max_missed = max_missed
+        self.halted = False
+        self.missed = 0
+
+    def _notify(self, reason):
+        if self._bus is not None:
+            self._bus.raise_estop(self._source, reason)
+        else:
+            safety_bus.notify(self._source, reason)
+
+    def _release(self):
+        if self._bus is not None:
+            self._bus.release(self._source)
+        else:
+            safety_bus.release(self._source)
+
+    def update(self, distance):
+        if distance is None:
+            self.missed += 1
+            messages = [f"No echo ({self.missed}/{self.max_missed})."]
+            if self.missed >= self.max_missed and not self.halted:
+                self.halted = True
+                self._notify("no echo")
+                messages.append("!!! SENSOR FAULT: no echo. Halting motors. !!!")
+            return messages
+        self.missed = 0
+
+        # Hysteresis instead of sleeping after a stop: the loop keeps
+        # measuring, but motion only resumes once the path is clearly open.
+        if distance < STOP_DISTANCE_CM and not self.halted:
+            self.halted = True
+            # E-stop first; the message can wait.
+            self._notify(f"obstacle at {distance:.1f} cm")
+            return [f"!!! OBSTACLE DETECTED at {distance:.2f} cm. Halting motors. !!!"]
+        if self.halted and distance > STOP_DISTANCE_CM + RESUME_MARGIN_CM:
+            self.halted = False
+            self._release()
+            return [f"Path clear at {distance:.2f} cm."]
+        return []
 
 def main():
     """Main execution loop for obstacle avoidance."""
+    parser = argparse.ArgumentParser(description="Aegis Gardener obstacle avoidance")
+    parser.add_argument("--mode", choices=("edge", "poll"), default="edge",
+                        help="Echo timing: GPIO edge callbacks (default) or polling with a deadline.")
+    parser.add_argument("--simulate", action="store_true", help="Use the simulated GPIO backend.")
+    parser.add_argument("--sim-distance", type=float, default=100.0,
+                        help="Obstacle distance for the simulated sensor (cm).")
+    parser.add_argument("--array", action="store_true",
+                        help="Use every sensor in ultrasonic_array.SENSORS and act on the fused distance.")
+    args = parser.parse_args()
+
+    if args.array:
+        run_array(args.simulate or SIMULATED, args.sim_distance)
+        return
+
+    gpio = None
+    if args.simulate or SIMULATED:
+        gpio = SimGPIO()
+        gpio.attach_sensor(TRIGGER_PIN, ECHO_PIN, args.sim_distance)
+
     print("Starting Obstacle Avoidance Protocol...")
-    setup_sensor()
+    # The halt decision follows the ping that sees an obstacle by at most one
+    # echo timeout (a dead sensor halts after MAX_MISSED_ECHOES cycles).
+    print(f"Pinging every {PING_CYCLE_S * 1000:.0f} ms; halt within {ECHO_TIMEOUT_S * 1000:.0f} ms of a ping.")
+    setup_sensor(args.mode, gpio)
+    guard = ObstacleGuard()
+    next_ping = time.monotonic()
     try:
         while True:
+            next_ping += PING_CYCLE_S
             distance = get_distance()
-            print(f"Distance: {distance:.2f} cm")
+            messages = guard.update(distance)
+            if distance is not None:
+                print(f"Distance: {distance:.2f} cm")
+            for message in messages:
+                print(message)
+            # Absolute schedule: the wait for the echo is part of the cycle.
+            time.sleep(max(0.0, next_ping - time.monotonic()))
+
+    except KeyboardInterrupt:
+        print("Obstacle Avoidance Protocol stopped by user.")
+    finally:
+        _sensor.close()
+        GPIO.cleanup()
+        print("GPIO cleanup complete.")
 
-            if distance < STOP_DISTANCE_CM:
-                print(f"!!! OBSTACLE DETECTED at {distance:.2f} cm. Halting motors. !!!")
-                # stop_motors() # UNCOMMENT THIS LINE TO INTEGRATE WITH MOTOR CONTROLLER
-                
-                # Optional: Add a small delay after stopping to prevent rapid start/stop cycles
-                time.sleep(1)
+def run_array(simulate=False, sim_distance=100.0):
+    """Avoidance on the fused nearest-obstacle distance from the sensor array."""
+    import ultrasonic_array
+    gpio = ultrasonic_array.simulated_gpio(distance_cm=sim_distance) if simulate else None
+    array = ultrasonic_array.UltrasonicArray(gpio=gpio)
+    # The array already turns repeated misses into a stale/faulted sensor,
+    # so a None from it halts on the first reading.
+    guard = ObstacleGuard(max_missed=1)
 
-            time.sleep(LOOP_DELAY_S)
+    def on_fused(ts, nearest, name, readings):
+        halted = guard.halted
+        messages = guard.update(nearest)
+        if guard.halted == halted:
+            return  # Only report halts and resumes at the publish rate.
+        if nearest is None:
+            print(f"Sensor {name} stale or faulted.")
+        for message in messages:
+            print(message)
 
+    print("Starting Obstacle Avoidance Protocol (sensor array)...")
+    array.setup()
+    print("Firing groups: " + " | ".join(", ".join(g) for g in array.groups))
+    array.subscribe(on_fused)
+    array.start()
+    try:
+        while True:
+            time.sleep(1)
     except KeyboardInterrupt:
         print("Obstacle Avoidance Protocol stopped by user.")
     finally:
-        GPIO.cleanup()
+        array.cleanup()
         print("GPIO cleanup complete.")
 
 if __name__ == '__main__':
     main()
-```
\ No newline at end of file
@@ -1,52 +1,129 @@
-import sqlite3
 import os
 import json
-import pandas as pd
-from datetime import datetime
+import time
+import argparse
+from datetime import date, datetime, timedelta
+
+import mule_store
+import mule_export
 
 # --- CONFIGURATION ---
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "logs", "mule_results.db")
+DB_PATH = mule_store.DB_PATH
+ROLLUP_NAME = "mule_audit_rollup"
+
+def refresh_rollup(conn):
+    """Folds mule_audit rows added since the last refresh into the daily rollup.
+    Returns the number of new rows processed."""
+    row = conn.execute("SELECT last_rowid FROM mule_rollup_state WHERE name = ?", (ROLLUP_NAME,)).fetchone()
+    last_rowid = row[0] if row else 0
+    max_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM mule_audit").fetchone()[0]
+    if max_rowid == last_rowid:
+        return 0
+
+    with mule_store.transaction() as tx:
+        if max_rowid < last_rowid:
+            # Rows were deleted underneath the rollup; rebuild it from scratch.
+            tx.execute("DELETE FROM mule_audit_rollup")
+            last_rowid = 0
+        tx.execute('''
+            INSERT INTO mule_audit_rollup (day, model_used, status, runs, iterations_sum)
+            SELECT substr(timestamp, 1, 10), COALESCE(model_used, ''), COALESCE(status, ''),
+                   COUNT(*), COALESCE(SUM(iterations), 0)
+            FROM mule_audit WHERE rowid > ? AND rowid <= ?
+            GROUP BY 1, 2, 3
+            ON CONFLICT (day, model_used, status) DO UPDATE SET
+                runs = runs + excluded.runs,
+                iterations_sum = iterations_sum + excluded.iterations_sum
+        ''', (last_rowid, max_rowid))
+        tx.execute("INSERT OR REPLACE INTO mule_rollup_state (name, last_rowid) VALUES (?, ?)",
+                   (ROLLUP_NAME, max_rowid))
+    return max_rowid - last_rowid
+
+def _window_clause(since, until, model, day_column):
+    """Builds a WHERE clause for an inclusive [since, until] day window."""
+    clauses, params = [], []
+    if since:
+        clauses.append(f"{day_column} >= ?")
+        params.append(since.isoformat())
+    if until:
+        clauses.append(f"{day_column} < ?")
+        params.append((until + timedelta(days=1)).isoformat())
+    if model:
+        clauses.append("model_used = ?")
+        params.append(model)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def _summary(conn, fast, since=None, until=None, model=None):
+    if fast:
+        mule_export.export_all(sources=("audit",))
+        table = mule_export.load_table("audit", ["timestamp", "status", "iterations", "model_used"])
+        mask = None
+        if since or until or model:
+            ts = table["timestamp"]
+            mask = ts == ts
+            if since:
+                mask &= ts >= datetime.combine(since, datetime.min.time()).timestamp()
+            if until:
+                mask &= ts < datetime.combine(until + timedelta(days=1), datetime.min.time()).timestamp()
+            if model:
+                mask &= table["model_used"].mask(model)
+        # Governor rejections never reached a model; they are not runs.
+        ran = ~table["status"].mask(mule_store.GOVERNOR_REJECTED)
+        stats = mule_export.audit_summary(table, ran if mask is None else mask & ran)
+        return stats["total"], stats["success_rate"], stats["avg_iterations"]
+
+    refresh_rollup(conn)
+    where, params = _window_clause(since, until, model, "day")
+    where += (" AND " if where else " WHERE ") + "status != ?"
+    params.append(mule_store.GOVERNOR_REJECTED)
+    total, validated, iter_sum = conn.execute(f'''
+        SELECT COALESCE(SUM(runs), 0),
+               COALESCE(SUM(CASE WHEN status = 'VALIDATED' THEN runs END), 0),
+               COALESCE(SUM(iterations_sum), 0)
+        FROM mule_audit_rollup{where}''', params).fetchone()
+    if not total:
+        return 0, 0.0, 0.0
+    return total, (validated / total) * 100, iter_sum / total
 
-def view_audit():
+def view_audit(fast=False, since=None, until=None, model=None, limit=10):
     if not os.path.exists(DB_PATH):
         print(f"🛑 [ERROR] Database not found at {DB_PATH}")
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    
+    conn = mule_store.get_connection()
+
     # 1. Team Performance Summary
     print("\n" + "="*50)
     print(f"📊 AEGIS GARDENER: TEAM PERFORMANCE AUDIT")
+    if since or until or model:
+        print(f"   Window: {since or '…'} → {until or '…'} | Model: {model or 'ALL'}")
     print("="*50)
-    
-    df = pd.read_sql_query("SELECT status, iterations FROM mule_audit", conn)
-    if df.empty:
+
+    total, success_rate, avg_iters = _summary(conn, fast, since, until, model)
+    if not total:
         print("No audit records found. Run 'mule.py start' first.")
         return
 
-    success_rate = (len(df[df['status'] == 'VALIDATED']) / len(df)) * 100
-    avg_iters = df['iterations'].mean()
-    
     print(f"Success Rate:    {success_rate:.1f}%")
     print(f"Avg. Iterations: {avg_iters:.2f} cycles")
     print("-" * 50)
 
-    # 2. Detailed Task History
-    query = """
-    SELECT timestamp, prompt, status, iterations, specialist_feedback 
-    FROM mule_audit 
-    ORDER BY timestamp DESC LIMIT 10
+    # 2. Detailed Task History (served by the timestamp / model+timestamp indexes)
+    where, params = _window_clause(since, until, model, "timestamp")
+    query = f"""
+    SELECT timestamp, prompt, status, iterations, specialist_feedback
+    FROM mule_audit{where}
+    ORDER BY timestamp DESC LIMIT ?
     """
     c = conn.cursor()
-    c.execute(query)
+    c.execute(query, params + [limit])
     rows = c.fetchall()
 
     for ts, prompt, status, iters, feedback in rows:
         color = "✅" if status == "VALIDATED" else "❌"
         print(f"{color} [{ts}] {prompt[:60]}...")
         print(f"   Status: {status} | Cycles: {iters}")
-        
+
         # Parse Specialist Feedback
         if feedback:
             try:
@@ -57,7 +134,23 @@ def view_audit():
                 pass
         print("-" * 50)
 
-    conn.close()
-
 if __name__ == "__main__":
-    view_audit()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Aegis Gardener team performance audit")
+    parser.add_argument("--fast", action="store_true", help="Compute the summary from the columnar snapshot (mule_export).")
+    parser.add_argument("--since", type=date.fromisoformat, help="First day to include (YYYY-MM-DD).")
+    parser.add_argument("--until", type=date.fromisoformat, help="Last day to include (YYYY-MM-DD).")
+    parser.add_argument("--model", help="Only include runs for this model_used value.")
+    parser.add_argument("--limit", type=int, default=10, help="Number of recent runs to list.")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="Refresh the dashboard every N seconds.")
+    args = parser.parse_args()
+
+    try:
+        while True:
+            if args.watch:
+                print("\033[2J\033[H", end="")
+            view_audit(fast=args.fast, since=args.since, until=args.until, model=args.model, limit=args.limit)
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        pass
@@ -1,10 +1,20 @@
-import sqlite3, pandas as pd, os
+import pandas as pd, os, sys
+import mule_store
+import mule_export
+def show_fast():
+    # Team utilization from the columnar session snapshot: one role bitmask per run.
+    mule_export.export_all(sources=("sessions",))
+    table = mule_export.load_table('sessions', ['roles_mask'])
+    counts = mule_export.role_counts(table['roles_mask'])
+    scale = max(1, max(counts.values()) / 40)
+    print('\n📊 TEAM UTILIZATION CHART\n' + '-'*30)
+    for spec, count in counts.items():
+        print(f"{spec:<15} | {'█' * round(count / scale)} ({count})")
 def show():
-    db = 'logs/mule_results.db'
-    if not os.path.exists(db):
+    if not os.path.exists(mule_store.DB_PATH):
         print("❌ [ERROR] Database not found.")
         return
-    conn = sqlite3.connect(db)
+    conn = mule_store.get_connection()
     try:
         df = pd.read_sql('SELECT specialist_consulted, COUNT(*) as count FROM mule_audit GROUP BY specialist_consulted', conn)
         print('\n📊 TEAM UTILIZATION CHART\n' + '-'*30)
@@ -14,6 +24,4 @@ def show():
             print(f"{spec:<15} | {'█' * count} ({count})")
     except Exception as e:
         print(f"❌ [ERROR] {e}")
-    finally:
-        conn.close()
-if __name__ == '__main__': show()
+if __name__ == '__main__': show_fast() if '--fast' in sys.argv else show()
@@ -1,99 +1,318 @@
-```python
-import RPi.GPIO as GPIO
+import os
+import math
 import time
+import threading
+
+import mule_hal
+import safety_bus
+
+# RPi.GPIO on the Pi; the HAL's simulated GPIO elsewhere so the controller can
+# run (and be hosted by mule_runtime) off the Pi.
+GPIO = mule_hal.gpio()
+
+# --- Ramp Profiles ---
+# Each maps ramp progress u in [0, 1] to fraction of the duty-cycle change.
+
+def _linear(u: float) -> float:
+    return u
+
+def _s_curve(u: float) -> float:
+    """Smoothstep: zero slope at both ends, so di/dt is gentlest where the motor starts and settles."""
+    return u * u * (3 - 2 * u)
+
+def _cosine(u: float) -> float:
+    return 0.5 - 0.5 * math.cos(math.pi * u)
+
+RAMP_PROFILES = {"linear": _linear, "s_curve": _s_curve, "cosine": _cosine}
+IDLE_POLL_S = 0.02  # Engine wake-up when idle; bounds E-stop latency from other processes.
+
+
+class Ramp:
+    """Handle for one commanded ramp/hold segment chain. done is set when it
+    finishes or is superseded (cancelled=True)."""
+    def __init__(self, target_dc: float):
+        self.target_dc = target_dc
+        self.done = threading.Event()
+        self.cancelled = False
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.done.wait(timeout)
+
+    async def wait_async(self, poll_s: float = 0.01) -> bool:
+        """For asyncio callers (mule_runtime): polls instead of parking a thread."""
+        import asyncio
+        while not self.done.is_set():
+            await asyncio.sleep(poll_s)
+        return not self.cancelled
+
+
+class RampEngine(threading.Thread):
+    """
+    Background duty-cycle generator for one PWM channel. Commands are a queue
+    of (target duty, hold seconds, profile) segments; each ramp starts from the
+    duty cycle actually being output, so a stop issued mid-ramp turns around
+    immediately instead of finishing the climb first. Duty is a function of
+    elapsed monotonic time, so late ticks never stretch a ramp.
+    """
+    def __init__(self, pwm, full_ramp_s: float, tick_s: float, profile: str = "linear", safety=None):
+        super().__init__(name="pump-ramp", daemon=True)
+        self._pwm = pwm
+        self.full_ramp_s = full_ramp_s
+        self.tick_s = tick_s
+        self.profile = profile
+        self.duty = 0.0
+        self._written = None
+        self._segments = []
+        self._active = None  # Ramp whose segment is being output right now.
+        self._cv = threading.Condition()
+        self._halt = False
+        self._estop = safety.subscribe("pump") if safety is not None else None
+        self.estopped = False
+
+    def command(self, segments, replace: bool = True) -> Ramp:
+        """Queues [(target_dc, hold_s, profile or None), ...]. replace=True cancels
+        whatever is running and retargets from the current duty."""
+        ramp = Ramp(segments[-1][0] if segments else self.duty)
+        with self._cv:
+            if replace:
+                self._cancel_locked()
+            self._segments.extend((t, h, p, ramp) for t, h, p in segments)
+            if not segments:
+                ramp.done.set()
+            self._cv.notify()
+        return ramp
+
+    def cancel(self):
+        """Holds the current duty cycle and drops any queued segments."""
+        with self._cv:
+            self._cancel_locked()
+            self._cv.notify()
+
+    def _cancel_locked(self):
+        for ramp in [self._active] + [seg[3] for seg in self._segments]:
+            if ramp is not None and not ramp.done.is_set():
+                ramp.cancelled = True
+                ramp.done.set()
+        self._segments.clear()
+
+    def emergency_stop(self):
+        """Output off now, no ramp (E-stop)."""
+        with self._cv:
+            self._cancel_locked()
+            self.estopped = True
+            self._write(0.0)
+            self._cv.notify()
+
+    def reset(self):
+        """Re-arms the engine after an E-stop; the output stays at 0 until commanded."""
+        self.estopped = False
+
+    def _write(self, duty: float):
+        self.duty = duty
+        value = round(duty, 1)
+        if value != self._written:
+            self._pwm.ChangeDutyCycle(value)
+            self._written = value
+
+    def _check_estop(self):
+        if self._estop is not None and self._estop.check():
+            print("CRITICAL: E-stop on safety bus. Pump output cut.")
+            self.emergency_stop()
+
+    def _next(self):
+        with self._cv:
+            while not self._segments and not self._halt:
+                self._cv.wait(IDLE_POLL_S if self._estop is not None else None)
+                if self._estop is not None and not self._segments:
+                    self._cv.release()
+                    try:
+                        self._check_estop()
+                    finally:
+                        self._cv.acquire()
+            if self._halt:
+                return None
+            segment = self._segments.pop(0)
+            self._active = segment[3]
+            return segment
+
+    def run(self):
+        try:
+            # Low priority: pump slew is not time critical, sensing is.
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 5)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            segment = self._next()
+            if segment is None:
+                return
+            target, hold_s, profile, ramp = segment
+            if self.estopped and target > 0:
+                print("WARNING: Pump E-stopped. Ignoring start until reset().")
+                ramp.cancelled = True
+                ramp.done.set()
+                continue
+            if not self._run_segment(target, hold_s, RAMP_PROFILES[profile or self.profile], ramp):
+                continue
+            with self._cv:
+                if not any(seg[3] is ramp for seg in self._segments) and not ramp.done.is_set():
+                    ramp.done.set()
+
+    def _run_segment(self, target: float, hold_s: float, shape, ramp: Ramp) -> bool:
+        start_duty = self.duty
+        duration = self.full_ramp_s * abs(target - start_duty) / 100.0
+        started = time.monotonic()
+        deadline = started
+        end = started + duration + hold_s
+        while True:
+            if ramp.done.is_set():
+                return False  # Superseded by a newer command.
+            now = time.monotonic()
+            u = 1.0 if duration <= 0 else min(1.0, (now - started) / duration)
+            with self._cv:
+                if not ramp.done.is_set():
+                    self._write(start_duty + (target - start_duty) * shape(u))
+            self._check_estop()
+            if now >= end:
+                return True
+            deadline += self.tick_s
+            with self._cv:
+                self._cv.wait(max(0.0, min(deadline, end) - time.monotonic()))
+
+    def stop(self):
+        with self._cv:
+            self._halt = True
+            self._cancel_locked()
+            self._cv.notify()
+        self.join(timeout=1.0)
+        if self._estop is not None:
+            self._estop.close()
+
 
 class PwmPumpController:
     """
     A controller for the water pump that uses PWM for soft-starts and soft-stops
     to prevent damaging inductive voltage spikes (slew rate control).
     """
-    def __init__(self, pin: int, pwm_frequency: int = 100, ramp_time_ms: int = 100):
+    def __init__(self, pin: int, pwm_frequency: int = 100, ramp_time_ms: int = 100, gpio=None,
+                 profile: str = "s_curve", safety=None):
         """
         Initializes the pump controller and sets up GPIO for PWM.
         :param pin: The GPIO pin connected to the pump relay.
         :param pwm_frequency: The frequency for the PWM signal.
         :param ramp_time_ms: The duration for the power ramp up/down.
+        :param gpio: Shared GPIO handle (e.g. from mule_runtime); defaults to RPi.GPIO.
+        :param profile: Default ramp shape, one of RAMP_PROFILES.
+        :param safety: Optional safety_bus.SafetyBus; E-stops cut the output immediately.
         """
+        self.gpio = gpio or GPIO
         self.pin = pin
         self.pwm_frequency = pwm_frequency
         self.ramp_time_ms = ramp_time_ms
         self.ramp_steps = 20  # Number of steps for the ramp (e.g., 0, 5, 10...100)
         self.step_delay = (self.ramp_time_ms / 1000) / self.ramp_steps
 
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setup(self.pin, GPIO.OUT)
-        self.pwm = GPIO.PWM(self.pin, self.pwm_frequency)
+        self.gpio.setmode(self.gpio.BCM)
+        self.gpio.setup(self.pin, self.gpio.OUT)
+        self.pwm = self.gpio.PWM(self.pin, self.pwm_frequency)
         self.pwm.start(0) # Start PWM with 0% duty cycle (off)
+        self.engine = RampEngine(self.pwm, self.ramp_time_ms / 1000, self.step_delay, profile, safety)
+        self.engine.start()
         print("INFO: PWM Pump Controller initialized.")
 
-    def _ramp_power(self, start_dc: int, end_dc: int):
-        """Helper function to ramp the duty cycle up or down."""
-        step_size = int(100 / self.ramp_steps)
-        range_start = start_dc
-        range_end = end_dc + (1 if end_dc > start_dc else -1)
-        range_step = step_size if end_dc > start_dc else -step_size
+    def start_async(self, duty: float = 100, profile: str = None) -> Ramp:
+        """Retargets the ramp engine to `duty` from wherever it is now. Returns immediately."""
+        return self.engine.command([(duty, 0.0, profile)])
+
+    def stop_async(self, profile: str = None) -> Ramp:
+        """Ramps down from the current duty cycle, cancelling any ramp in progress."""
+        return self.engine.command([(0.0, 0.0, profile)])
+
+    def pulse_async(self, cycles: int, on_s: float = 0.1, off_s: float = 0.4) -> Ramp:
+        """Queues a whole aeration pulse train on the engine; the caller is not blocked."""
+        segments = []
+        for _ in range(cycles):
+            segments += [(100.0, on_s, None), (0.0, off_s, None)]
+        return self.engine.command(segments)
 
-        for dc in range(range_start, range_end, range_step):
-            self.pwm.ChangeDutyCycle(dc)
-            time.sleep(self.step_delay)
-        self.pwm.ChangeDutyCycle(end_dc) # Ensure final value is set
+    def run_async(self, duration_s: float, aeration_cycles: int = 0) -> Ramp:
+        """One whole watering job on the engine: ramp up, hold, optional aeration pulses, ramp down."""
+        segments = [(100.0, duration_s, None)]
+        for _ in range(aeration_cycles):
+            segments += [(100.0, 0.1, None), (0.0, 0.4, None)]
+        segments.append((0.0, 0.0, None))
+        return self.engine.command(segments)
+
+    def emergency_stop(self):
+        """Cuts the output immediately (no ramp) and latches until reset()."""
+        self.engine.emergency_stop()
+
+    def reset(self):
+        self.engine.reset()
+
+    @property
+    def duty(self) -> float:
+        return self.engine.duty
 
     def start(self):
         """Soft-starts the pump by ramping power to 100%."""
         print("INFO: Ramping pump power UP...")
-        self._ramp_power(0, 100)
+        self.start_async().wait()
         print("INFO: Pump at 100%.")
 
     def stop(self):
         """Soft-stops the pump by ramping power to 0%."""
         print("INFO: Ramping pump power DOWN...")
-        self._ramp_power(100, 0)
+        self.stop_async().wait()
         print("INFO: Pump stopped.")
 
-    def cleanup(self):
-        """Stops the PWM and cleans up GPIO resources."""
+    def cleanup(self, release_gpio: bool = True):
+        """
+        Stops the PWM and cleans up GPIO resources.
+        :param release_gpio: False when the GPIO handle is shared (mule_runtime owns cleanup).
+        """
+        self.engine.stop()
         self.pwm.stop()
-        GPIO.cleanup()
+        if release_gpio:
+            self.gpio.cleanup()
         print("INFO: PWM and GPIO resources cleaned up.")
 
 # --- Application Functions ---
 
 MAX_AERATION_CYCLES = 50 # Safety limit for aeration pulses
 
-def run_pump(controller: PwmPumpController, duration_seconds: int):
-    """Activates pump for a duration using soft-start/stop."""
+def run_pump(controller: PwmPumpController, duration_seconds: int) -> Ramp:
+    """
+    Queues a soft-start, hold and soft-stop on the ramp engine and returns its
+    Ramp handle; call .wait() on it to block until the cycle is complete.
+    """
     print(f"\n--- Running pump for {duration_seconds} seconds ---")
-    controller.start()
-    time.sleep(duration_seconds)
-    controller.stop()
-    print("--- Pump cycle complete ---")
+    return controller.run_async(duration_seconds)
 
 def pulse_pump_for_aeration(controller: PwmPumpController, cycles: int):
-    """Pulses the pump using soft-start/stop for each pulse."""
+    """
+    Queues the aeration pulse train (soft-start/stop for each pulse) on the ramp
+    engine and returns its Ramp handle, or None if cycles is over the limit.
+    """
     if cycles > MAX_AERATION_CYCLES:
         print(f"ERROR: Requested cycles ({cycles}) exceeds safety limit ({MAX_AERATION_CYCLES}). Aborting.")
-        return
-        
-    print(f"\n--- Performing aeration pulse for {cycles} cycles ---")
-    for i in range(cycles):
-        print(f"  Pulse {i+1}/{cycles}...")
-        controller.start()
-        time.sleep(0.1) # Brief hold at full power
-        controller.stop()
-        time.sleep(0.4) # Wait between pulses
-    print("--- Aeration pulse complete ---")
+        return None
+    print(f"\n--- Queued aeration pulse for {cycles} cycles ---")
+    return controller.pulse_async(cycles)
 
 if __name__ == '__main__':
     pump_controller = None
     try:
         PUMP_PIN = 17
-        pump_controller = PwmPumpController(pin=PUMP_PIN, ramp_time_ms=100)
+        pump_controller = PwmPumpController(pin=PUMP_PIN, ramp_time_ms=100, safety=safety_bus.SafetyBus())
 
-        # Standard watering cycle with soft-start/stop
-        run_pump(pump_controller, 5)
+        # Standard watering cycle with soft-start/stop. The demo waits on each
+        # job; the ramp engine runs it either way.
+        run_pump(pump_controller, 5).wait()
+        print("--- Pump cycle complete ---")
 
         # Aeration cycle with soft-start/stop
-        pulse_pump_for_aeration(pump_controller, 5)
+        pulse_pump_for_aeration(pump_controller, 5).wait()
+        print("--- Aeration pulse complete ---")
 
     except KeyboardInterrupt:
         print("\nProgram interrupted by user.")
@@ -101,4 +320,3 @@ if __name__ == '__main__':
         if pump_controller:
             pump_controller.cleanup()
         print("Exiting.")
-```
\ No newline at end of file
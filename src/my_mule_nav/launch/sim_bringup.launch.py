@@ -1,48 +1,89 @@
-```python
 import os
 from ament_index_python.packages import get_package_share_directory
 from launch import LaunchDescription
-from launch.actions import ExecuteProcess, IncludeLaunchDescription
+from launch.actions import DeclareLaunchArgument, ExecuteProcess, IncludeLaunchDescription, OpaqueFunction
 from launch.launch_description_sources import PythonLaunchDescriptionSource
+from launch.substitutions import LaunchConfiguration
 
-def generate_launch_description():
+# Per PE-01: Switching to cafe.world as a diagnostic for empty world launch.
+# This world is more complex and serves as a better validation environment.
+CAFE_WORLD = '/usr/share/gazebo-11/worlds/cafe.world'
+
+# profile:=full is the original bringup. profile:=quick is for CI and laptops:
+# the minimal garden world on a headless gzserver, no RViz, physics unthrottled
+# so sim time runs faster than real time. world:=, gui:= and rviz:= override
+# the profile; mule_core/sim_timing.py records startup time and real-time factor.
+PROFILES = {
+    'full': {'world': CAFE_WORLD, 'gui': 'true', 'rviz': 'true'},
+    'quick': {'world': 'garden', 'gui': 'false', 'rviz': 'false'},
+}
+
+
+def _bringup(context):
     pkg_dir = get_package_share_directory('my_mule_nav')
-    
-    # Per PE-01: Switching to cafe.world as a diagnostic for empty world launch.
-    # This world is more complex and serves as a better validation environment.
-    world_file = '/usr/share/gazebo-11/worlds/cafe.world'
-    
-    params_file = os.path.join(pkg_dir, 'param', 'mule_params.yaml')
     bt_file = os.path.join(pkg_dir, 'param', 'mule_bt.xml')
     rviz_config = os.path.join(pkg_dir, 'param', 'mule_view.rviz')
 
-    # 1. GAZEBO (The Cafe World)
-    gazebo = IncludeLaunchDescription(
-        PythonLaunchDescriptionSource([os.path.join(
-            get_package_share_directory('gazebo_ros'), 'launch', 'gazebo.launch.py')]),
-            launch_arguments={'world': world_file}.items()
-    )
+    def arg(name):
+        return LaunchConfiguration(name).perform(context)
+
+    profile = PROFILES[arg('profile')]
+    world = arg('world') or profile['world']
+    if not os.path.isabs(world):
+        world = os.path.join(pkg_dir, 'worlds', f'{world}.world')
+    gui = arg('gui') or profile['gui']
+    rviz = arg('rviz') or profile['rviz']
+    bag = arg('bag')
+
+    actions = []
+    if bag:
+        # Replay / benchmark mode (mule_core/nav_replay.py): play a recorded
+        # bag instead of starting Gazebo, publishing its /clock at rate:= x real time.
+        actions.append(ExecuteProcess(
+            cmd=['ros2', 'bag', 'play', bag, '--clock', '--rate', arg('rate')],
+            output='screen'
+        ))
+    else:
+        # 1. GAZEBO (gzserver, plus gzclient unless gui:=false)
+        actions.append(IncludeLaunchDescription(
+            PythonLaunchDescriptionSource([os.path.join(
+                get_package_share_directory('gazebo_ros'), 'launch', 'gazebo.launch.py')]),
+                launch_arguments={'world': world, 'gui': gui}.items()
+        ))
 
     # 2. THE BRAIN (Nav2)
-    nav2_launch = IncludeLaunchDescription(
+    actions.append(IncludeLaunchDescription(
         PythonLaunchDescriptionSource(os.path.join(pkg_dir, 'launch', 'bringup.launch.py')),
         launch_arguments={
-            'params_file': params_file,
+            'params_file': arg('params_file'),
             'default_nav_to_pose_bt_xml': bt_file,
             'default_nav_through_poses_bt_xml': bt_file,
             'use_sim_time': 'True'
         }.items()
-    )
+    ))
 
     # 3. THE EYES (RViz)
-    rviz_node = ExecuteProcess(
-        cmd=['rviz2', '-d', rviz_config],
-        output='screen'
-    )
+    if rviz.lower() == 'true':
+        actions.append(ExecuteProcess(
+            cmd=['rviz2', '-d', rviz_config],
+            output='screen'
+        ))
+    return actions
+
+
+def generate_launch_description():
+    pkg_dir = get_package_share_directory('my_mule_nav')
+    params_file = os.path.join(pkg_dir, 'param', 'mule_params.yaml')
 
     return LaunchDescription([
-        gazebo,
-        nav2_launch,
-        rviz_node
+        DeclareLaunchArgument('profile', default_value='full', choices=list(PROFILES),
+                              description='full: cafe world, Gazebo GUI and RViz. quick: headless garden.'),
+        DeclareLaunchArgument('world', default_value='',
+                              description="World file, or a name under this package's worlds/ (default: profile's)."),
+        DeclareLaunchArgument('gui', default_value='', description='Start gzclient (default: profile).'),
+        DeclareLaunchArgument('rviz', default_value='', description='Start RViz (default: profile).'),
+        DeclareLaunchArgument('bag', default_value='', description='Recorded bag to replay instead of Gazebo.'),
+        DeclareLaunchArgument('rate', default_value='1.0', description='Bag playback rate (fast-forwards sim time).'),
+        DeclareLaunchArgument('params_file', default_value=params_file, description='Nav2 parameter file.'),
+        OpaqueFunction(function=_bringup),
     ])
-```
\ No newline at end of file
@@ -1,5 +1,41 @@
-```python
+import os
+import csv
+import sys
+import sqlite3
+import time
+import asyncio
+import datetime
+import tempfile
+import contextlib
 import unittest
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mule_core"))
+
+import mule_hal
+import mule_store
+import mule_export
+import routing_analytics
+import view_audit
+import mule_summary_report
+import current_monitor
+import current_telemetry
+import current_detection
+import ultrasonic_avoidance
+import ultrasonic_array
+import safety_bus
+import mule_runtime
+import water_pump_controller
+import irrigation_planner
+import safety_engagement_sequence
+import sequence_engine
+import reflex_bench
+import nav_replay
+import sim_timing
+import mule_governor
+import mule_mrd
+import mule_personas
+import mule_context_cache
 
 # OVERRIDE TEST [REF: SW-01]
 
@@ -8,16 +44,1019 @@ class TestMule(unittest.TestCase):
         # A basic test case
         self.assertEqual(1 + 1, 2)
 
+    def test_safety_reflex_on_virtual_clock(self):
+        """
+        Deterministic reflex check: overcurrent to enable pin low, in virtual time.
+        """
+        sim = mule_hal.simulator()
+        channels = [current_monitor.CurrentChannel(address, max_a, 0.0, pin, gpio=sim.gpio)
+                    for address, max_a, _, pin in current_monitor.CHANNELS[:2]]
+        sim.i2c.set_profile(channels[0].address, lambda t: 3.0 if t >= 0.5 else 1.0)
+        sim.i2c.set_profile(channels[1].address, lambda t: 1.0)
+        monitor = current_monitor.MultiCurrentMonitor(channels, sim.i2c, reflex_bench.SAMPLE_RATE_HZ,
+                                                      display_rate=1, telemetry_s=0)
+        monitor.run(duration_s=1.0)
+        latency_ms = (channels[0].motor.disabled_ns / 1e6) - 500.0
+        self.assertGreaterEqual(latency_ms, 0.0)
+        self.assertLess(latency_ms, reflex_bench.REFLEX_BUDGET_MS)
+
+    def test_obstacle_reflex_on_virtual_clock(self):
+        """
+        Deterministic reflex check: ping that sees the obstacle to enable pin
+        low, through the safety bus and a 1 kHz bus poll, in virtual time.
+        """
+        sim = mule_hal.simulator()
+        bus = safety_bus.SafetyBus(f"mule_safety_test_{os.getpid()}")
+        self.addCleanup(bus.close, unlink=True)
+        channels = [current_monitor.CurrentChannel(address, max_a, 0.0, pin, gpio=sim.gpio)
+                    for address, max_a, _, pin in current_monitor.CHANNELS[:1]]
+        monitor = current_monitor.MultiCurrentMonitor(channels, sim.i2c, reflex_bench.SAMPLE_RATE_HZ,
+                                                      display_rate=1, telemetry_s=0, safety=bus)
+        clock, motor = sim.clock, channels[0].motor
+
+        def poll():
+            monitor._poll_safety()
+            clock.call_later(0.001, poll)
+        clock.call_later(0.001, poll)
+
+        trigger, echo = ultrasonic_avoidance.TRIGGER_PIN, ultrasonic_avoidance.ECHO_PIN
+        sim.gpio.attach_sensor(trigger, echo, reflex_bench.CLEAR_CM)
+        sensor = ultrasonic_avoidance.UltrasonicSensor(trigger, echo, sim.gpio)
+        sensor.setup()
+        guard = ultrasonic_avoidance.ObstacleGuard(bus=bus)
+        clock.call_at_ns(int(0.5317e9), lambda: sim.gpio.distance_cm.__setitem__(echo, reflex_bench.OBSTACLE_CM))
+
+        # ultrasonic_avoidance.main()'s loop on the HAL clock.
+        cycle_ns = int(ultrasonic_avoidance.PING_CYCLE_S * 1e9)
+        pings = []
+        while motor.disabled_ns is None and clock.now() < 2.0:
+            start = clock.now_ns()
+            sensor.trigger()
+            pings.append(sensor.triggered_ns)
+            guard.update(sensor.wait())
+            clock.sleep_until_ns(start + cycle_ns)
+
+        self.assertIsNotNone(motor.disabled_ns)
+        self.assertTrue(all(b - a >= cycle_ns for a, b in zip(pings, pings[1:])))
+        seen_by = max(p for p in pings if p <= motor.disabled_ns)
+        latency_ms = (motor.disabled_ns - seen_by) / 1e6
+        self.assertLess(latency_ms, reflex_bench.REFLEX_BUDGET_MS)
+        self.assertLess(latency_ms, ultrasonic_avoidance.ECHO_TIMEOUT_S * 1e3)
+
+    @unittest.skipUnless(os.environ.get("MULE_SLOW_TESTS"), "real-time benchmark; set MULE_SLOW_TESTS=1")
     def test_verify_safety_reflex(self):
         """
         Verifies that the critical safety reflex latency is within the acceptable threshold.
         """
-        # This value would be retrieved from a hardware-in-the-loop (HIL)
-        # or a simulated system call in a real test environment.
-        simulated_latency_ms = 42 
-        
-        self.assertLess(simulated_latency_ms, 50, "CRITICAL: Safety reflex latency exceeds 50ms threshold.")
+        # Measured on the HAL simulator in real time, with a busy process
+        # competing for the CPU (full run: python3 mule_core/reflex_bench.py).
+        latencies = reflex_bench.run(trials=200, load=1, paths=("overcurrent",))
+        latencies.update(reflex_bench.run(trials=60, load=1, paths=("obstacle",)))
+        for path, values in latencies.items():
+            _, p99, _ = reflex_bench.summarize(values)
+            self.assertLess(p99, 50, f"CRITICAL: {path} safety reflex p99 {p99:.1f} ms exceeds 50ms threshold.")
+
+
+class TestMuleStore(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["MULE_DB_PATH"] = os.path.join(self._tmp.name, "mule_results.db")
+
+    def tearDown(self):
+        mule_store.close_connection()
+        del os.environ["MULE_DB_PATH"]
+        self._tmp.cleanup()
+
+    def test_migrations_are_versioned_and_idempotent(self):
+        conn = mule_store.get_connection()
+        self.assertEqual(mule_store.schema_version(conn), mule_store.SCHEMA_VERSION)
+        self.assertEqual(mule_store.migrate(conn), mule_store.SCHEMA_VERSION)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        indexes = {r[1] for r in conn.execute("PRAGMA index_list(mule_audit)")}
+        self.assertIn("idx_mule_audit_timestamp", indexes)
+        self.assertIn("idx_mule_audit_status", indexes)
+
+    def test_connection_is_shared(self):
+        self.assertIs(mule_store.get_connection(), mule_store.get_connection())
+
+    def test_insert_audit_recovers_dropped_table(self):
+        conn = mule_store.get_connection()
+        self.assertTrue(mule_store.insert_audit("p1", "VALIDATED", 1, ["ok"], "", "flash"))
+        conn.execute("DROP TABLE mule_audit")
+        self.assertTrue(mule_store.insert_audit("p2", "FAILED", 3, [], "", "pro"))
+        rows = conn.execute("SELECT prompt, status FROM mule_audit").fetchall()
+        self.assertEqual(rows, [("p2", "FAILED")])
+
+    def test_migration_imports_sync_history(self):
+        # Seeds the path the old mule_sync.py wrote, relocated under the temp dir.
+        legacy = os.path.join(self._tmp.name, "data", "data", "aegis_master.db")
+        os.makedirs(os.path.dirname(legacy))
+        with contextlib.closing(sqlite3.connect(legacy)) as old:
+            old.execute("CREATE TABLE ip_assets (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, "
+                        "project TEXT, category TEXT, summary TEXT, search_string TEXT, "
+                        "confidence TEXT, created_at TEXT)")
+            old.execute("INSERT INTO ip_assets (project, summary, search_string) VALUES ('mule', 'hitch', 'a AND b')")
+            old.commit()
+        saved = mule_store.LEGACY_DB_PATHS
+        mule_store.LEGACY_DB_PATHS = [p.replace(mule_store.BASE_DIR, self._tmp.name, 1) for p in saved]
+        try:
+            conn = mule_store.get_connection()
+        finally:
+            mule_store.LEGACY_DB_PATHS = saved
+        self.assertEqual(conn.execute("SELECT project, summary FROM ip_assets").fetchall(), [("mule", "hitch")])
+
+    def test_audit_rollup_is_incremental(self):
+        conn = mule_store.get_connection()
+        mule_store.insert_audit("a", "VALIDATED", 2, [], "", "flash", timestamp="2026-02-01 10:00:00")
+        mule_store.insert_audit("b", "FAILED", 3, [], "", "pro", timestamp="2026-02-02 09:00:00")
+        self.assertEqual(view_audit.refresh_rollup(conn), 2)
+        self.assertEqual(view_audit.refresh_rollup(conn), 0)
+        mule_store.insert_audit("c", "VALIDATED", 1, [], "", "flash", timestamp="2026-02-02 11:00:00")
+        self.assertEqual(view_audit.refresh_rollup(conn), 1)
+        mule_store.insert_audit("d", mule_store.GOVERNOR_REJECTED, 0, [], "", "local-governor",
+                                timestamp="2026-02-02 12:00:00")
+
+        self.assertEqual(view_audit._summary(conn, False), (3, (2 / 3) * 100, 2.0))
+        day = datetime.date(2026, 2, 2)
+        self.assertEqual(view_audit._summary(conn, False, since=day), (2, 50.0, 2.0))
+        self.assertEqual(view_audit._summary(conn, False, model="flash"), (2, 100.0, 1.5))
+
+    def test_requirements_sync_writes_only_changed_rows(self):
+        path = os.path.join(self._tmp.name, "requirements.csv")
+        with open(mule_mrd.CSV_PATH, encoding="utf-8") as src, open(path, "w", encoding="utf-8") as dst:
+            dst.write(src.read())
+        first = mule_mrd.sync(path)
+        self.assertEqual((first["inserted"], first["rejected"]), (34, []))
+        self.assertEqual(mule_mrd.sync(path)["unchanged"], 34)
+
+        with open(path, encoding="utf-8") as f:
+            text = f.read().replace("MECH-TOW-01\tME\t250", "MECH-TOW-01\tME\t300")
+        text = text.replace("SW-MIC-AUTO\tSW\t1", "SW-MIC-AUTO\tSW\tone")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(line for line in text.split("\n") if not line.startswith("NAV-SCALE-01")))
+        counts = mule_mrd.sync(path)
+        self.assertEqual((counts["inserted"], counts["updated"], counts["deleted"]), (0, 1, 1))
+        self.assertEqual([r[1] for r in counts["rejected"]], ["SW-MIC-AUTO"])
+        conn = mule_store.get_connection()
+        self.assertEqual(conn.execute("SELECT threshold FROM mule_requirements WHERE req_id = 'MECH-TOW-01'")
+                         .fetchone()[0], 300.0)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM mule_requirements").fetchone()[0], 33)
+
+
+@unittest.skipIf(mule_export.np is None, "numpy not installed")
+class TestMuleExport(unittest.TestCase):
+    HEADER = "Timestamp,Prompt,Expected,Actual,Status,Failure_Reason,Auto_Patch_Action\n"
+    ROW = '2026-02-02 06:51:19.824338,"p","[\'PM\', \'SW\']", ➔ PE ➔ {},{},"",""\n'
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["MULE_DB_PATH"] = os.path.join(self._tmp.name, "mule_results.db")
+        self.csv_path = os.path.join(self._tmp.name, "audit.csv")
+
+    def tearDown(self):
+        del os.environ["MULE_DB_PATH"]
+        self._tmp.cleanup()
+
+    def test_snapshot_follows_the_store(self):
+        self.assertEqual(mule_export.export_dir(), os.path.join(self._tmp.name, "columnar"))
+        with open(self.csv_path, "w") as f:
+            f.write(self.HEADER)
+        mule_export.export_all(self.csv_path, sources=("tests",))
+        self.assertTrue(os.path.exists(os.path.join(self._tmp.name, "columnar", "manifest.json")))
+
+    def test_quoted_multiline_fields(self):
+        row = '2026-02-02 07:00:00,"p",PE, ➔ SW,FAIL,"missing PE\nrouted to ""SW""",""\n'
+        with open(self.csv_path, "w", newline="") as f:
+            f.write(self.HEADER + row + '2026-02-02 08:00:00,"p",PE, ➔ PE,PASS,"still\nwriting')
+        self.assertEqual(mule_export.export_all(self.csv_path, sources=("tests",)), {"tests": 1})
+        with open(self.csv_path, "a", newline="") as f:
+            f.write('",""\n')
+        self.assertEqual(mule_export.export_all(self.csv_path, sources=("tests",)), {"tests": 1})
+
+        table = mule_export.load_table("tests")
+        self.assertEqual(table["failure_reason"][0], 'missing PE\nrouted to "SW"')
+        self.assertEqual(table["failure_reason"][1], "still\nwriting")
+        self.assertEqual(table["status"].counts(), {"FAIL": 1, "PASS": 1})
+
+    def test_incremental_test_export(self):
+        with open(self.csv_path, "w") as f:
+            f.write(self.HEADER + self.ROW.format("SW", "FAIL"))
+        self.assertEqual(mule_export.export_all(self.csv_path, sources=("tests",)), {"tests": 1})
+        with open(self.csv_path, "a") as f:
+            f.write(self.ROW.format("PM ➔ SW", "PASS") + '2026-02-02,"partial')
+        self.assertEqual(mule_export.export_all(self.csv_path, sources=("tests",)), {"tests": 1})
+        self.assertEqual(mule_export.export_all(self.csv_path, sources=("tests",)), {"tests": 0})
+
+        stats = mule_export.test_summary(mule_export.load_table("tests"))
+        self.assertEqual((stats["total"], stats["passes"], stats["fails"]), (2, 1, 1))
+        self.assertEqual(stats["missing"]["PM"], 1)
+        self.assertEqual(stats["missing"]["SW"], 0)
+
+
+@unittest.skipIf(mule_export.np is None, "numpy not installed")
+class TestRoutingAnalytics(unittest.TestCase):
+    HEADER = TestMuleExport.HEADER
+    ROW = TestMuleExport.ROW
+    SESSION = ("TIMESTAMP: 2026-02-02 07:00:00\nUSER: p\nEXPERT_PATH: {}\nMODEL: {}\n"
+               "LATENCY_MS: {}\nESCALATED: {}\n--- RESPONSE ---\nok\n")
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        os.environ["MULE_DB_PATH"] = os.path.join(self._tmp.name, "mule_results.db")
+        os.makedirs(mule_export.export_dir())
+
+    def tearDown(self):
+        del os.environ["MULE_DB_PATH"]
+        self._tmp.cleanup()
+
+    def _export(self, tests=(), sessions=()):
+        csv_path = os.path.join(self._tmp.name, "audit.csv")
+        with open(csv_path, "w") as f:
+            f.write(self.HEADER + "".join(self.ROW.format(actual, status) for actual, status in tests))
+        for i, session in enumerate(sessions):
+            with open(os.path.join(self._tmp.name, f"dev_log_{i}.txt"), "w") as f:
+                f.write(self.SESSION.format(*session))
+        manifest = mule_export._manifest()
+        mule_export.export_sessions(manifest, os.path.join(self._tmp.name, "dev_log_*.txt"))
+        mule_export.export_tests(manifest, csv_path)
+        mule_export._save_manifest(manifest)
+        return routing_analytics.build_report(mule_export.load_table("tests"), mule_export.load_table("sessions"))
+
+    def test_confusion_matrix_and_hop_histogram(self):
+        # Every row expects PM and SW; the chains visit PE+PM+SW, PE+SW and PE alone.
+        report = self._export([("PM ➔ SW", "PASS"), ("SW", "FAIL"), ("", "FAIL")],
+                              [("PE ➔ SW", "FAST", 1200, "no"), ("PE ➔ PM ➔ SW", "PRO", 5000, "yes")])
+        pe, sw, pm = (mule_export.ROLES.index(r) for r in ("PE", "SW", "PM"))
+        confusion = report["confusion"]
+        for expected in (pm, sw):
+            self.assertEqual((confusion[expected][pe], confusion[expected][pm], confusion[expected][sw]), (3, 1, 2))
+        self.assertEqual(int(confusion.sum()), 12)
+        self.assertEqual((report["missed"][pm], report["missed"][sw], report["missed"][pe]), (2, 1, 0))
+        self.assertEqual(report["unexpected"][pe], 3)
+        self.assertEqual(report["hop_hist"].tolist(), [0, 1, 1, 1])
+        self.assertEqual(report["pe_only"], 1)
+        self.assertAlmostEqual(report["pass_rate"], 100 / 3)
+        self.assertEqual((report["sessions"], report["escalations"]), (2, 1))
+        self.assertEqual((report["latency_direct"], report["latency_escalated"]), (1200.0, 5000.0))
+        self.assertEqual(report["escalated_missed"][pm], 2)
+        self.assertIn("3 hop(s):", routing_analytics.render_text(report))
+
+    def test_empty_tables(self):
+        report = self._export()
+        self.assertEqual((report["rows"], report["sessions"], report["pe_only"]), (0, 0, 0))
+        self.assertEqual(int(report["confusion"].sum()), 0)
+        self.assertEqual(report["confusion"].shape, (len(mule_export.ROLES),) * 2)
+        self.assertEqual(report["hop_hist"].tolist(), [0])
+        self.assertEqual((report["pass_rate"], report["prompts"]), (0.0, []))
+        routing_analytics.render_text(report)
+        routing_analytics.render_html(report)
+
+
+class TestStreamingReport(unittest.TestCase):
+    HEADER = TestMuleExport.HEADER
+    ROW = TestMuleExport.ROW
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self._tmp.name, "audit.csv")
+        with open(self.csv_path, "w") as f:
+            f.write(self.HEADER)
+            for i in range(200):
+                f.write(self.ROW.format("PM ➔ SW" if i % 4 == 0 else "SW", "PASS" if i % 4 == 0 else "FAIL"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_checkpoint_reads_only_new_lines(self):
+        state = mule_summary_report.stream_report(self.csv_path)
+        self.assertEqual((state.runs, state.passes, state.fails), (200, 50, 150))
+        self.assertEqual(state.missing_counts(), {"PM": 150})
+        with open(self.csv_path, "a") as f:
+            f.write(self.ROW.format("SW", "FAIL") + "2026,partial")
+        state = mule_summary_report.stream_report(self.csv_path)
+        self.assertEqual((state.runs, state.fails), (201, 151))
+        self.assertEqual(mule_summary_report.stream_report(self.csv_path).runs, 201)
+
+    def test_parallel_scan_matches_serial(self):
+        saved = mule_summary_report.PARALLEL_MIN_BYTES
+        mule_summary_report.PARALLEL_MIN_BYTES = 0
+        try:
+            parallel = mule_summary_report.stream_report(self.csv_path, checkpoint=False, workers=3)
+        finally:
+            mule_summary_report.PARALLEL_MIN_BYTES = saved
+        serial = mule_summary_report.stream_report(self.csv_path, checkpoint=False)
+        self.assertEqual(parallel.to_dict(), serial.to_dict())
+
+class TestMultiCurrentMonitor(unittest.TestCase):
+    def setUp(self):
+        self.bus = mule_hal.SimINA219Bus([0x40, 0x41])
+        channels = [current_monitor.CurrentChannel(0x40, 2.0, 0.5, 18),
+                    current_monitor.CurrentChannel(0x41, 2.0, 0.5, 19)]
+        self.monitor = current_monitor.MultiCurrentMonitor(channels, self.bus, sample_rate=100)
+        self.channels = channels
+
+    def test_one_batched_read_per_cycle(self):
+        self.bus.set_reading(0x40, 1.25, bus_v=24.0)
+        self.bus.set_reading(0x41, -0.5)
+        before = self.bus.transactions
+        self.monitor._sample(0)
+        self.assertEqual(self.bus.transactions - before, 1)
+        _, readings = self.monitor._samples.drain()[-1]
+        self.assertAlmostEqual(readings[0], 1.25)
+        self.assertAlmostEqual(readings[1], -0.5)
+        self.assertAlmostEqual(self.monitor.last_bus_voltages[0], 24.0)
+
+    def test_trip_is_per_channel(self):
+        self.bus.set_reading(0x40, 3.0)
+        self.bus.set_reading(0x41, 1.0)
+        self.bus.failing.add(0x41)
+        self.monitor._sample(0)
+        self.monitor._sample(int(0.6e9))
+        self.assertTrue(self.channels[0].tripped)
+        self.assertFalse(self.channels[1].tripped)
+
+    def test_first_trip_raises_estop(self):
+        bus = safety_bus.SafetyBus(f"mule_safety_test_{os.getpid()}")
+        self.addCleanup(bus.close, unlink=True)
+        sim = mule_hal.simulator()
+        channels = [current_monitor.CurrentChannel(0x40, 2.0, 0.5, 18, gpio=sim.gpio),
+                    current_monitor.CurrentChannel(0x41, 2.0, 0.5, 19, gpio=sim.gpio)]
+        monitor = current_monitor.MultiCurrentMonitor(channels, sim.i2c, sample_rate=100,
+                                                      telemetry_s=0, safety=bus)
+        sim.i2c.set_reading(0x40, 3.0)
+        sim.i2c.set_reading(0x41, 1.0)
+        monitor._sample(0)
+        monitor._sample(int(0.6e9))
+        self.assertEqual(bus.active_sources(), ["current_monitor"])
+        self.assertIn("0x40", bus.state()["reason"])
+        self.assertEqual((sim.gpio.input(18), sim.gpio.input(19)), (sim.gpio.LOW, sim.gpio.LOW))
+        self.assertIsNone(monitor.exit_code)
+
+        bus.clear("operator")
+        monitor._poll_safety()
+        self.assertEqual((sim.gpio.input(18), sim.gpio.input(19)), (sim.gpio.LOW, sim.gpio.HIGH))
+
+class TestDeadlineSampler(unittest.TestCase):
+    def setUp(self):
+        self.sim = mule_hal.simulator()
+        channels = [current_monitor.CurrentChannel(0x40, 2.0, 0.5, 18, gpio=self.sim.gpio)]
+        self.monitor = current_monitor.MultiCurrentMonitor(channels, self.sim.i2c, sample_rate=100,
+                                                           display_rate=1, telemetry_s=0)
+        self.sim.i2c.set_profile(0x40, lambda t: 1.0)
+
+    def test_slow_read_counts_overruns_and_keeps_the_schedule(self):
+        clock, read_words = self.sim.clock, self.sim.i2c.read_words
+        sampled = []
+        def slow_tenth_read(requests):
+            sampled.append(clock.now_ns())
+            if len(sampled) == 10:
+                clock.sleep(0.025)  # 2.5 periods: the 11th and 12th slots are lost.
+            return read_words(requests)
+        self.sim.i2c.read_words = slow_tenth_read
+        self.monitor.run(duration_s=1.0)
+
+        stats, period = self.monitor._stats, int(10e6)
+        self.assertEqual(stats.overruns, 2)
+        self.assertEqual(stats.samples, 98)
+        self.assertLess(stats.max_jitter_ns, period // 10)
+        # Deadlines stay on the original grid: after the slow read, sampling
+        # resumes at 130 ms (not 125 + 10 ms) and never drifts.
+        slots = [round((t - stats.started_ns) / period) for t in sampled]
+        self.assertEqual(slots[9:11], [10, 13])
+        self.assertEqual(slots[-1], 100)
+        for t, slot in zip(sampled, slots):
+            self.assertLess(abs(t - stats.started_ns - slot * period), period // 10)
+
+    def test_sampler_stats(self):
+        clock = mule_hal.VirtualClock()
+        stats = current_monitor.SamplerStats(int(10e6), clock)
+        for jitter_us in (10, 30, 20):
+            stats.record(jitter_us * 1000)
+        stats.overruns = 1
+        clock.sleep(0.03)
+        self.assertEqual((stats.samples, stats.max_jitter_ns, stats.total_jitter_ns), (3, 30000, 60000))
+        self.assertAlmostEqual(stats.achieved_rate(), 100.0)
+        self.assertEqual(stats.summary(), "rate 100.0/100.0 Hz | jitter mean 20 us, max 30 us | overruns 1")
+
+
+class TestCurrentTelemetry(unittest.TestCase):
+    def test_ring_wraps_and_round_trips_through_dump(self):
+        ring = current_telemetry.TelemetryRing(capacity=5, sample_rate=100)
+        for i in range(8):
+            ring.push(i * 10, i * 0.5, 24.0, i % 2)
+        self.assertEqual(len(ring), 5)
+        with tempfile.TemporaryDirectory() as tmp:
+            data = current_telemetry.load(ring.dump(os.path.join(tmp, "t.bin")))
+            self.assertEqual(data["rows"], 5)
+            self.assertEqual(list(data["t_ns"]), [30, 40, 50, 60, 70])
+            self.assertEqual(list(data["current"]), [1.5, 2.0, 2.5, 3.0, 3.5])
+            self.assertEqual(list(data["channel"]), [1, 0, 1, 0, 1])
+
+class TestCurrentDetection(unittest.TestCase):
+    def test_single_glitch_does_not_start_timer(self):
+        detector = current_detection.OvercurrentDetector(current_detection.DetectorConfig(2.0, 0.1))
+        events = [detector.update(i / 100.0, 9.0 if i == 10 else 1.0) for i in range(40)]
+        self.assertEqual([e for e in events if e], [])
+
+    @unittest.skipIf(mule_export.np is None, "numpy not installed")
+    def test_batch_matches_incremental(self):
+        np = mule_export.np
+        t = np.arange(3000) / 1000.0
+        current = np.full(3000, 1.0)
+        current[500] = 9.0
+        current[1000:] += np.linspace(0, 3, 2000)
+        for filt in current_detection.FILTERS:
+            config = current_detection.DetectorConfig(2.5, 0.2, filter=filt)
+            detector = current_detection.OvercurrentDetector(config)
+            live = next(i for i in range(len(t)) if (detector.update(t[i], current[i]) or ("",))[0] == "TRIP")
+            result = current_detection.detect(t, current, config)
+            self.assertEqual(result["first_trip"][0], live, filt)
+            self.assertTrue(result["stall"][:live].any(), filt)
+
+class TestUltrasonicEdgeTiming(unittest.TestCase):
+    def setUp(self):
+        self.gpio = mule_hal.SimGPIO()
+        self.gpio.attach_sensor(23, 24, distance_cm=80.0)
+        self.sensor = ultrasonic_avoidance.UltrasonicSensor(23, 24, self.gpio)
+        self.sensor.setup()
+
+    def test_edge_measurement(self):
+        self.assertAlmostEqual(self.sensor.measure(), 80.0, delta=8.0)
+
+    def test_missed_echo_times_out(self):
+        self.gpio.distance_cm[24] = None
+        started = time.perf_counter()
+        self.assertIsNone(self.sensor.measure(timeout_s=0.02))
+        self.assertLess(time.perf_counter() - started, 0.1)
+
+class TestUltrasonicArray(unittest.TestCase):
+    def test_overlapping_beams_never_share_a_group(self):
+        specs = ultrasonic_array.SENSORS
+        groups = ultrasonic_array.firing_groups(specs)
+        bearing = {s[0]: s[3] for s in specs}
+        self.assertLess(len(groups), len(specs))
+        for group in groups:
+            for a in group:
+                for b in group:
+                    if a != b:
+                        self.assertGreaterEqual(ultrasonic_array._angle_between(bearing[a], bearing[b]), 45)
+
+    def test_median_rejects_spikes_and_fuses_nearest(self):
+        gpio = ultrasonic_array.simulated_gpio(distance_cm=120.0)
+        array = ultrasonic_array.UltrasonicArray(gpio=gpio, median_k=3)
+        for name, f in array.filters.items():
+            base = 50.0 if name == "rear" else 100.0
+            for d in (base, 3000.0, 1.0, base + 2, base - 1):
+                f.push(d, now=time.monotonic())
+        nearest, name, readings = array.fused()
+        self.assertEqual((name, readings["rear"], readings["front"]), ("rear", 50.0, 100.0))
+        array.setup()
+        array.run_cycle()
+        self.assertAlmostEqual(array.fused()[2]["front"], 100.0, delta=25.0)
+
+    def test_dead_sensor_is_blocked_not_clear(self):
+        clock = mule_hal.VirtualClock()
+        gpio = ultrasonic_array.simulated_gpio(distance_cm=120.0, clock=clock)
+        array = ultrasonic_array.UltrasonicArray(gpio=gpio, median_k=3)
+        array.setup()
+        array.run_cycle()
+        self.assertAlmostEqual(array.fused()[0], 120.0, delta=5.0)
+        gpio.distance_cm[24] = None  # "front" stops echoing
+        for _ in range(ultrasonic_array.MAX_MISSED_ECHOES - 1):
+            array.run_cycle()
+        self.assertIsNotNone(array.fused()[0])
+        array.run_cycle()
+        self.assertTrue(array.filters["front"].faulted)
+        self.assertEqual(array.fused()[:2], (None, "front"))
+        self.assertAlmostEqual(array.fused()[2]["front"], 120.0, delta=5.0)
+
+class TestSafetyBus(unittest.TestCase):
+    def setUp(self):
+        self.bus = safety_bus.SafetyBus(f"mule_safety_test_{os.getpid()}")
+
+    def tearDown(self):
+        self.bus.close(unlink=True)
+        self.assertFalse(os.path.exists(os.path.join(safety_bus.LOCK_DIR, f"{self.bus.name}.lock")))
+
+    def test_estop_is_seen_acknowledged_and_timed(self):
+        sub = self.bus.subscribe("pump")
+        self.assertIsNone(sub.check())
+        generation = self.bus.raise_estop("current_monitor", "overcurrent")
+        state = sub.wait(timeout=1.0)
+        self.assertEqual((state["generation"], state["source"]), (generation, "current_monitor"))
+        self.assertIsNone(sub.check())
+        [row] = self.bus.latency_report()
+        self.assertEqual(row["name"], "pump")
+        self.assertTrue(row["within_budget"])
+
+    def test_release_only_clears_own_estop(self):
+        self.bus.raise_estop("current_monitor", "overcurrent")
+        self.assertIsNone(self.bus.release("ultrasonic_avoidance"))
+        self.assertTrue(self.bus.is_estopped())
+        self.bus.raise_estop("ultrasonic_avoidance", "obstacle")
+        self.assertEqual(self.bus.active_sources(), ["current_monitor", "ultrasonic_avoidance"])
+        self.assertIsNone(self.bus.release("ultrasonic_avoidance"))
+        self.assertTrue(self.bus.is_estopped())
+        self.assertIsNotNone(self.bus.release("current_monitor"))
+        self.assertFalse(self.bus.is_estopped())
+        self.assertEqual(self.bus.active_sources(), [])
+
+class TestMuleRuntime(unittest.TestCase):
+    def test_due_tasks_run_in_priority_order_and_pins_are_exclusive(self):
+        runtime = mule_runtime.Runtime(mule_hal.SimGPIO())
+        order = []
+        runtime.every(0.02, lambda: order.append("pump"), mule_runtime.PRIORITY_ACTUATION, "pump")
+        runtime.every(0.02, lambda: order.append("current"), mule_runtime.PRIORITY_SAFETY, "current")
+        asyncio.run(runtime.run(0.1))
+        self.assertGreaterEqual(len(order), 6)
+        self.assertEqual(order[:2], ["current", "pump"])
+        runtime.claim_pin(17, "pump")
+        with self.assertRaises(RuntimeError):
+            runtime.claim_pin(17, "current_monitor")
+
+    def test_failing_steps_are_counted_and_trips_do_not_stop_the_loop(self):
+        gpio, i2c = mule_hal.SimGPIO(), mule_hal.SimINA219Bus([0x40])
+        runtime = mule_runtime.Runtime(gpio, i2c)
+        monitor = mule_runtime.host_current_monitor(runtime, [(0x40, 2.0, 0.05, 18)], 100)
+        i2c.set_reading(0x40, 3.0)
+        estops = []
+        runtime.on_estop(estops.append)
+        def broken():
+            raise OSError("bus glitch")
+        runtime.every(0.02, broken, mule_runtime.PRIORITY_SAFETY, "broken")
+        asyncio.run(runtime.run(0.3))
+        tasks = {task.name: task for task in runtime._tasks}
+        self.assertEqual(monitor.exit_code, 2)
+        self.assertFalse(gpio.input(18))
+        self.assertGreater(tasks["current"].runs, 20)
+        self.assertGreater(tasks["broken"].errors, 5)
+        self.assertEqual([s["source"] for s in estops], ["mule_runtime"])
+
+    def test_hosted_obstacle_reflex_on_virtual_clock(self):
+        sim = mule_hal.simulator()
+        trigger, echo = ultrasonic_avoidance.TRIGGER_PIN, ultrasonic_avoidance.ECHO_PIN
+        sim.gpio.attach_sensor(trigger, echo, reflex_bench.CLEAR_CM)
+        runtime = mule_runtime.Runtime(sim.gpio, sim.i2c)
+        monitor = mule_runtime.host_current_monitor(runtime, current_monitor.CHANNELS[:1])
+        guard = mule_runtime.host_ultrasonic(runtime)
+        ping = next(task for task in runtime._tasks if task.name == "ultrasonic")
+        self.assertGreaterEqual(ping.period_s, ultrasonic_avoidance.PING_CYCLE_S)
+        t0 = int(0.5317e9)
+        sim.clock.call_at_ns(t0, lambda: sim.gpio.distance_cm.__setitem__(echo, reflex_bench.OBSTACLE_CM))
+
+        # The runtime's ultrasonic task, stepped on the HAL clock.
+        motor, ticks = monitor._channels[0].motor, []
+        while motor.disabled_ns is None and sim.clock.now() < 2.0:
+            ticks.append(sim.clock.now_ns())
+            ping.step()
+            sim.clock.sleep(ping.period_s)
+
+        self.assertTrue(guard.halted)
+        self.assertIsNotNone(motor.disabled_ns)
+        seen_by = max(t for t in ticks if t <= motor.disabled_ns)
+        self.assertLess((motor.disabled_ns - seen_by) / 1e6, reflex_bench.REFLEX_BUDGET_MS)
+        # No second period of lag: the echo callback halts, not the next tick.
+        self.assertLess(motor.disabled_ns - t0, ping.period_s * 1e9 + ultrasonic_avoidance.ECHO_TIMEOUT_S * 1e9)
+
+    def test_hosted_monitor_acks_its_bus_slot(self):
+        bus = safety_bus.SafetyBus(f"mule_safety_test_{os.getpid()}")
+        self.addCleanup(bus.close, unlink=True)
+        sim = mule_hal.simulator()
+        runtime = mule_runtime.Runtime(sim.gpio, sim.i2c, bus)
+        monitor = mule_runtime.host_current_monitor(runtime, current_monitor.CHANNELS[:1])
+        sample = next(task for task in runtime._tasks if task.name == "current")
+        sim.i2c.set_reading(current_monitor.CHANNELS[0][0], 1.0)
+        bus.raise_estop("operator", "test")
+        sample.step()
+        acks = {row["name"]: row["latency_ms"] for row in bus.latency_report()}
+        self.assertIsNotNone(acks["current_monitor"])
+        self.assertEqual(sim.gpio.input(current_monitor.CHANNELS[0][3]), sim.gpio.LOW)
+        bus.clear("operator")
+        sample.step()
+        self.assertEqual(sim.gpio.input(current_monitor.CHANNELS[0][3]), sim.gpio.HIGH)
+
+class TestPumpRampEngine(unittest.TestCase):
+    def setUp(self):
+        self.pump = water_pump_controller.PwmPumpController(17, ramp_time_ms=200, gpio=mule_hal.SimGPIO())
+
+    def tearDown(self):
+        self.pump.cleanup()
+
+    def test_aeration_is_queued_on_the_engine(self):
+        started = time.monotonic()
+        pulses = water_pump_controller.pulse_pump_for_aeration(self.pump, 1)
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertTrue(pulses.wait(2.0) and not pulses.cancelled)
+        self.assertEqual(self.pump.duty, 0.0)
+        self.assertIsNone(water_pump_controller.pulse_pump_for_aeration(
+            self.pump, water_pump_controller.MAX_AERATION_CYCLES + 1))
+
+    def test_stop_mid_ramp_turns_around_from_current_duty(self):
+        started = time.monotonic()
+        up = self.pump.start_async()
+        self.assertLess(time.monotonic() - started, 0.05)
+        time.sleep(0.1)
+        peak = self.pump.duty
+        self.assertTrue(0 < peak < 100)
+        down = self.pump.stop_async()
+        self.assertTrue(up.wait(0.1) and up.cancelled)
+        self.assertTrue(down.wait(1.0))
+        self.assertEqual(self.pump.pwm.duty_cycle, 0)
+        self.assertLess(time.monotonic() - started, 0.1 + 0.2 * peak / 100 + 0.1)
+
+    def test_s_curve_is_monotonic_and_estop_latches(self):
+        shape = water_pump_controller.RAMP_PROFILES["s_curve"]
+        values = [shape(i / 50) for i in range(51)]
+        self.assertEqual((values[0], values[-1]), (0, 1))
+        self.assertEqual(values, sorted(values))
+        self.pump.start_async()
+        time.sleep(0.05)
+        self.pump.emergency_stop()
+        self.assertEqual(self.pump.pwm.duty_cycle, 0)
+        self.assertTrue(self.pump.start_async().wait(1.0))
+        self.assertEqual(self.pump.duty, 0)
+
+class TestIrrigationPlanner(unittest.TestCase):
+    def plan(self, *zones):
+        return irrigation_planner.IrrigationPlanner(
+            [irrigation_planner.Zone(**z) for z in zones], bus_v=24, breaker_a=80, base_load_a=15)
+
+    def test_overlapping_zones_share_the_budget(self):
+        planner = self.plan(
+            {"name": "a", "pin": 17, "current_a": 30, "duration_s": 600, "windows": ["05:00-06:00"], "priority": 0},
+            {"name": "b", "pin": 27, "current_a": 15, "duration_s": 600, "windows": ["05:00-06:00"], "priority": 1},
+            {"name": "c", "pin": 22, "current_a": 20, "duration_s": 600, "windows": ["05:00-06:00"], "priority": 2},
+            {"name": "d", "pin": 23, "current_a": 40, "duration_s": 3000, "windows": ["05:00-06:00"], "priority": 3})
+        log = []
+        pumps = {pin: irrigation_planner.DryRunPump(pin, log) for pin in (17, 22, 23, 27)}
+        planner.run(irrigation_planner.SimClock(0, speed=0), pumps)
+        starts = {zone.name: start for zone, start, _ in planner.timeline}
+        self.assertEqual(starts["a"], starts["b"])
+        self.assertGreater(starts["c"], starts["a"])
+        self.assertLessEqual(planner.peak_a, planner.budget_a)
+        self.assertEqual([z.name for z, _ in planner.missed], ["d"])
+        self.assertEqual(len(log), 3)
+
+    def test_unschedulable_zones_are_reported(self):
+        planner = self.plan(
+            {"name": "a", "pin": 17, "current_a": 30, "duration_s": 600, "windows": ["05:00-06:00"]},
+            {"name": "b", "pin": 27, "current_a": 30, "duration_s": 600, "windows": ["05:00-06:00"]})
+        planner.budget_a = 10.0  # Budget cut below every zone after planning.
+        log = []
+        pumps = {pin: irrigation_planner.DryRunPump(pin, log) for pin in (17, 27)}
+        planner.run(irrigation_planner.SimClock(5 * 3600, speed=0), pumps)
+        self.assertEqual(log, [])
+        self.assertEqual([(z.name, reason) for z, reason in planner.missed],
+                         [("a", "never fit the bus budget"), ("b", "never fit the bus budget")])
+
+    def test_estop_stops_a_planner_driven_pump(self):
+        bus = safety_bus.SafetyBus(f"mule_safety_test_{os.getpid()}")
+        self.addCleanup(bus.close, unlink=True)
+        pump = water_pump_controller.PwmPumpController(17, gpio=mule_hal.SimGPIO(), safety=bus)
+        self.addCleanup(pump.cleanup, release_gpio=False)
+        planner = self.plan(
+            {"name": "a", "pin": 17, "current_a": 20, "duration_s": 600, "windows": ["05:00-06:00"]},
+            {"name": "b", "pin": 17, "current_a": 20, "duration_s": 600, "windows": ["05:00-06:00"]})
+        cut = []
+
+        class EstopMidJob(irrigation_planner.SimClock):
+            def sleep_until(self, t):
+                if not cut:
+                    bus.raise_estop("test", "operator stop")
+                    deadline = time.monotonic() + 1.0
+                    while not pump.engine.estopped and time.monotonic() < deadline:
+                        time.sleep(0.005)
+                    cut.append(pump.engine.estopped)
+                super().sleep_until(t)
+
+        planner.run(EstopMidJob(5 * 3600, speed=0), {17: pump}, bus)
+        self.assertEqual(cut, [True])
+        self.assertEqual(pump.duty, 0.0)
+        self.assertEqual(planner.timeline, [])
+        self.assertEqual([(z.name, reason) for z, reason in planner.missed],
+                         [("a", "stopped by E-stop"), ("b", "stopped by E-stop")])
+
+class TestConcurrentActuation(unittest.TestCase):
+    def setUp(self):
+        self.actuators = safety_engagement_sequence.ACTUATORS
+        safety_engagement_sequence.ACTUATORS = mule_hal.SimActuators(travel_s=0.1)
+
+    def tearDown(self):
+        safety_engagement_sequence.ACTUATORS = self.actuators
+
+    def test_sequence_critical_path_is_one_actuator_per_step(self):
+        started = time.monotonic()
+        self.assertTrue(safety_engagement_sequence.engage_safety_sequence())
+        self.assertLess(time.monotonic() - started, 0.35)
+
+    def test_per_actuator_timeout(self):
+        started = time.monotonic()
+        results = safety_engagement_sequence.move_actuators(
+            [("clamp_1", "locked", 50, "clamp_1_locked"), ("clamp_2", "locked", 50, "clamp_2_locked")],
+            timeouts={"clamp_1": 0.02, "clamp_2": 1.0})
+        self.assertEqual(results["clamp_1"][2], "timeout")
+        self.assertEqual(results["clamp_2"][:1], (True,))
+        self.assertLess(time.monotonic() - started, 0.2)
+
+class TestSequenceEngine(unittest.TestCase):
+    def test_failure_rolls_back_started_steps_in_reverse(self):
+        events = []
+
+        def act(name, ok=True, delay=0.0):
+            def run():
+                time.sleep(delay)
+                events.append(name)
+                return ok
+            return run
+
+        Step = sequence_engine.Step
+        sequence = sequence_engine.Sequence("test", [
+            Step("a", act("a")),
+            Step("b1", act("b1", delay=0.05), after=["a"], compensate=act("undo_b1")),
+            Step("b2", act("b2", ok=False), after=["a"], compensate=act("undo_b2")),
+            Step("c", act("c"), after=["b1", "b2"], compensate=act("undo_c")),
+        ])
+        run = sequence.run()
+        self.assertEqual(run.state, sequence_engine.ROLLED_BACK)
+        self.assertNotIn("c", events)
+        self.assertEqual(sorted(run.rollback), ["b1", "b2"])
+        self.assertLess(events.index("b2"), events.index("b1"))
+        guarded = sequence_engine.Sequence("guarded", [Step("d", act("d"), guard=lambda: False, compensate=act("undo_d"))])
+        self.assertEqual(guarded.run().failed_step, "d")
+        self.assertNotIn("undo_d", events)
+
+    def test_timed_out_step_stops_before_it_is_compensated(self):
+        events = []
+
+        def act(name, delay=0.0):
+            def run():
+                time.sleep(delay)
+                events.append(name)
+            return run
+
+        Step = sequence_engine.Step
+        late = sequence_engine.Sequence("late", [
+            Step("slow", act("slow", delay=0.08), timeout_s=0.05, compensate=act("undo_slow"))])
+        self.assertEqual(late.run().state, sequence_engine.ROLLED_BACK)
+        self.assertEqual(events, ["slow", "undo_slow"])
+
+        events.clear()
+        stuck = sequence_engine.Sequence("stuck", [
+            Step("a", lambda: True, compensate=act("undo_a")),
+            Step("slow", act("slow", delay=0.3), after=["a"], timeout_s=0.05, compensate=act("undo_slow"))])
+        run = stuck.run()
+        self.assertEqual(run.state, sequence_engine.FAILED)
+        self.assertEqual(events, [])
+        self.assertIn("still running", run.rollback["a"][1])
+        self.assertIn("still running", run.rollback["slow"][1])
+
+    def test_cycles_are_rejected(self):
+        Step = sequence_engine.Step
+        with self.assertRaises(ValueError):
+            sequence_engine.Sequence("loop", [Step("a", bool, after=["b"]), Step("b", bool, after=["a"])])
+
+class TestHalSimulator(unittest.TestCase):
+    def test_virtual_clock_ultrasonic_is_exact(self):
+        sim = mule_hal.simulator()
+        sim.gpio.attach_sensor(23, 24, distance_cm=80.0)
+        sensor = ultrasonic_avoidance.UltrasonicSensor(23, 24, sim.gpio)
+        sensor.setup()
+        self.assertAlmostEqual(sensor.measure(), 80.0, places=3)
+        sim.gpio.distance_cm[24] = None
+        before = sim.clock.now()
+        self.assertIsNone(sensor.measure(timeout_s=0.03))
+        self.assertAlmostEqual(sim.clock.now() - before, 0.03, places=4)
+
+    def test_no_target_pulse_reads_as_clear(self):
+        sim = mule_hal.simulator()
+        sim.gpio.attach_sensor(23, 24, distance_cm=650.0)  # ~38 ms: the HC-SR04's "nothing in range".
+        sensor = ultrasonic_avoidance.UltrasonicSensor(23, 24, sim.gpio)
+        sensor.setup()
+        guard = ultrasonic_avoidance.ObstacleGuard(bus=safety_bus.SafetyBus(f"mule_safety_test_{os.getpid()}"))
+        try:
+            for _ in range(ultrasonic_avoidance.MAX_MISSED_ECHOES + 1):
+                self.assertEqual(sensor.measure(), ultrasonic_avoidance.MAX_RANGE_CM)
+                self.assertEqual(guard.update(sensor.measure()), [])
+            self.assertFalse(guard.halted)
+        finally:
+            guard._bus.close(unlink=True)
+
+    def test_short_echo_edges_pair_without_reading_the_pin(self):
+        sim = mule_hal.simulator()
+        sim.gpio.attach_sensor(23, 24, distance_cm=None)
+        sensor = ultrasonic_avoidance.UltrasonicSensor(23, 24, sim.gpio)
+        sensor.setup()
+        sensor.trigger()
+        # Both callbacks run after the pulse has ended (pin already low).
+        sensor._on_edge(24)
+        sim.clock.sleep(200e-6)
+        sensor._on_edge(24)
+        self.assertAlmostEqual(sensor.wait(0), 200e-6 * mule_hal.SPEED_OF_SOUND_CM_S / 2)
+
+    def test_current_monitor_runs_faster_than_real_time(self):
+        started = time.perf_counter()
+        speedup, delay = mule_hal.benchmark(seconds=20, rate=100, trip_at=10)
+        self.assertLess(time.perf_counter() - started, 2.0)
+        self.assertAlmostEqual(delay, 1.0, delta=0.02)
+
+class TestNavReplay(unittest.TestCase):
+    def test_sweep_ranks_sets_against_the_accuracy_requirement(self):
+        base = nav_replay.load_params()
+        self.assertEqual(nav_replay.amcl_params(base, {"laser_max_beams": 15})["max_beams"], 15)
+        tight = {"max_particles": 300, "min_particles": 100, "max_beams": 30, "sigma_hit": 0.05,
+                 "alpha1": 0.05, "alpha2": 0.05, "alpha3": 0.05, "alpha4": 0.05}
+        results = nav_replay.sweep_scenario([("tight", tight), ("few_beams", dict(tight, max_beams=5))], base)
+        rows = dict(results)
+        self.assertLess(rows["tight"]["rms_cm"], 10.0)
+        self.assertGreater(rows["tight"]["updates"], 100)
+        self.assertLessEqual(rows["tight"]["mean_particles"], 300)
+        self.assertIn(nav_replay.report(results, accuracy_cm=100.0), rows)
+        self.assertIsNone(nav_replay.report(results, accuracy_cm=0.1))
+        self.assertEqual(nav_replay.load_accuracy_cm(), 2.5)
+
+    def test_accuracy_comes_from_the_mrd_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "requirements.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('req_id,category,threshold,unit,logic_trigger,description\n'
+                        'NAV-RTK-ACC,NAV,4.0,cm,"rtk,accuracy",Max allowable positional error.\n')
+            self.assertEqual(nav_replay.load_accuracy_cm(mule_mrd.RequirementsCache(path)), 4.0)
+            missing = mule_mrd.RequirementsCache(os.path.join(tmp, "missing.csv"))
+            self.assertEqual(nav_replay.load_accuracy_cm(missing), nav_replay.DEFAULT_ACCURACY_CM)
+
+class TestSimProfile(unittest.TestCase):
+    def test_timing_is_recorded(self):
+        self.assertAlmostEqual(sim_timing.real_time_factor([(10.0, 0.0), (12.0, 5.0), (14.0, 10.0)]), 2.5)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "logs", "sim_timing.csv")
+            for rtf in ("2.50", "2.40"):
+                sim_timing.record({"timestamp": "t", "profile": "quick", "world": "-", "startup_s": "4.2",
+                                   "real_time_factor": rtf, "sim_s": "50.0", "wall_s": "20.0"}, path)
+            with open(path) as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual([r["real_time_factor"] for r in rows], ["2.50", "2.40"])
+
+    def test_garden_world_matches_the_scripted_mission(self):
+        world = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "src", "my_mule_nav", "worlds", "garden.world")
+        links = {}
+        for link in ElementTree.parse(world).iter("link"):
+            x, y = (float(v) for v in link.find("pose").text.split()[:2])
+            sx, sy = (float(v) for v in link.find("collision/geometry/box/size").text.split()[:2])
+            links[link.get("name")] = ((x - sx / 2, y - sy / 2), (x + sx / 2, y + sy / 2))
+        self.assertAlmostEqual(links["fence_east"][0][0], nav_replay.GARDEN_M[0], places=3)
+        self.assertAlmostEqual(links["fence_north"][0][1], nav_replay.GARDEN_M[1], places=3)
+        for name, box in zip(("bed_south", "bed_north", "compost_bin"), nav_replay.OBSTACLES):
+            for corner, expected in zip(links[name], box):
+                self.assertAlmostEqual(corner[0], expected[0], places=3)
+                self.assertAlmostEqual(corner[1], expected[1], places=3)
+
+class TestMuleGovernor(unittest.TestCase):
+    def setUp(self):
+        self.governor = mule_governor.get_governor()
+
+    def test_overweight_haul_is_rejected_locally(self):
+        verdict = self.governor.check("Haul 500lbs of mulch up the north slope")
+        self.assertFalse(verdict.ok)
+        self.assertIn("MECH-TOW-01", verdict.violations[0])
+        self.assertIn(mule_governor.VIOLATION, verdict.rejection())
+        self.assertTrue(self.governor.check("Haul 200 lb of mulch").ok)
+        self.assertFalse(self.governor.check("Haul 150 kg of mulch").ok)
+
+    def test_quantities_only_check_requirements_in_their_clause(self):
+        verdict = self.governor.check("Keep reflex latency under 80 ms, haul 200 lbs per trip.")
+        self.assertEqual(len(verdict.violations), 1)
+        self.assertIn("SOFT-LAT-MAX", verdict.violations[0])
+
+    def test_min_requirements_never_reject(self):
+        for prompt in ("Run a 1 hour battery test", "Finish hauling within 30 minutes"):
+            verdict = self.governor.check(prompt)
+            self.assertTrue(verdict.ok, verdict.violations)
+            self.assertIn("ELEC-RUNTIME-01", verdict.context())
+
+    def test_matched_requirements_become_context(self):
+        verdict = self.governor.check("Haul 200 lb of mulch")
+        self.assertTrue(verdict.ok)
+        self.assertIn("MECH-TOW-01", verdict.context())
+        self.assertEqual(self.governor.check("Add a comment to the README").context(), "")
+
+class TestMuleMrd(unittest.TestCase):
+    def test_dialect_is_sniffed_and_rows_cleaned(self):
+        rows, rejected = mule_mrd.parse()
+        self.assertEqual((len(rows), rejected), (34, []))
+        bed = {r[0]: r for r in rows}["MECH-BED-01"]
+        self.assertEqual(bed[4], "bed,dims,modular,mounting")
+        self.assertTrue(bed[5].startswith('Bed dimensions min 48" L'))
+        self.assertEqual(mule_mrd.sniff_dialect("req_id,category,threshold,unit,logic_trigger,description\n"),
+                         (",", csv.QUOTE_MINIMAL))
+        with self.assertRaises(ValueError):
+            mule_mrd.sniff_dialect("id;what;value\n")
+
+    def test_cache_reloads_when_the_file_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "requirements.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('req_id,category,threshold,unit,logic_trigger,description\n'
+                        'MECH-TOW-01,ME,250,lbs,"tow,haul",Payload capacity.\n')
+            cache = mule_mrd.RequirementsCache(path, recheck_s=0)
+            self.assertEqual(cache.get("MECH-TOW-01")[2], 250.0)
+            version = cache.version
+            self.assertEqual(cache.version, version)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write('MECH-TOW-02,ME,400,lbs,"trailer",Trailer capacity.\n')
+            self.assertEqual([r[0] for r in cache.rows()], ["MECH-TOW-01", "MECH-TOW-02"])
+            self.assertEqual(cache.version, version + 1)
+
+class TestMulePersonas(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        for name, text in (("pe.txt", "You are the PE."), ("me.txt", "You are the ME.")):
+            with open(os.path.join(self._tmp.name, name), "w") as f:
+                f.write(text)
+        self.registry = mule_personas.PersonaRegistry(self._tmp.name, requirements=mule_mrd.RequirementsCache())
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_system_instructions_carry_role_constraints(self):
+        self.assertIn("PE", self.registry)
+        self.assertNotIn("SW", self.registry)
+        me = self.registry.system_instruction("ME")
+        self.assertTrue(me.startswith("You are the ME."))
+        self.assertIn("MECH-TOW-01", me)
+        self.assertNotIn("SOFT-LAT-MAX", me)
+        self.assertIn("SOFT-LAT-MAX", self.registry.system_instruction("PE"))
+
+    def test_edits_reload_and_change_the_version(self):
+        version = self.registry.get("PE").version
+        self.assertEqual(self.registry.reload(), [])
+        with open(os.path.join(self._tmp.name, "pe.txt"), "w") as f:
+            f.write("You are the Principal Engineer.")
+        self.assertEqual(self.registry.reload(), ["PE"])
+        self.assertNotEqual(self.registry.get("PE").version, version)
+        self.assertTrue(self.registry.system_instruction("PE").startswith("You are the Principal Engineer."))
+        os.remove(os.path.join(self._tmp.name, "me.txt"))
+        self.assertEqual(self.registry.reload(), ["ME"])
+        self.assertEqual(self.registry.system_instruction("ME"), "")
+
+class _Usage:
+    def __init__(self, prompt_token_count, cached_content_token_count=None):
+        self.prompt_token_count = prompt_token_count
+        self.cached_content_token_count = cached_content_token_count
+
+class TestContextCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.backend = mule_context_cache.SimCacheBackend(clock=lambda: self.now)
+        self.cache = mule_context_cache.ContextCache(self.backend, project_files=[], clock=lambda: self.now)
+        self.instruction = "You are the PE.\n" + "- MECH-TOW-01: max 250 lbs\n" * 200
+
+    def test_prefix_is_uploaded_once_and_refreshed_before_expiry(self):
+        first = self.cache.handle_for("gemini-2.5-flash", "PE", self.instruction)
+        self.assertIs(self.cache.handle_for("gemini-2.5-flash", "PE", self.instruction), first)
+        self.now += mule_context_cache.TTL_S - mule_context_cache.REFRESH_MARGIN_S + 1
+        self.assertIs(self.cache.handle_for("gemini-2.5-flash", "PE", self.instruction), first)
+        self.assertEqual((self.backend.calls["create"], self.backend.calls["update"]), (1, 1))
+        self.assertGreater(first.expires_at, self.now + mule_context_cache.REFRESH_MARGIN_S)
+
+        edited = self.cache.handle_for("gemini-2.5-flash", "PE", self.instruction + "- NEW-REQ-01\n")
+        self.assertNotEqual(edited.name, first.name)
+        self.assertNotIn(first.name, self.backend.entries)
+
+    def test_later_sessions_adopt_the_live_cache(self):
+        first = self.cache.handle_for("gemini-2.5-flash", "PE", self.instruction)
+        session = mule_context_cache.ContextCache(self.backend, project_files=[], clock=lambda: self.now)
+        self.assertEqual(session.handle_for("gemini-2.5-flash", "PE", self.instruction).name, first.name)
+        self.assertEqual(self.backend.calls["create"], 1)
+        self.now += mule_context_cache.TTL_S + 1
+        expired = mule_context_cache.ContextCache(self.backend, project_files=[], clock=lambda: self.now)
+        self.assertNotEqual(expired.handle_for("gemini-2.5-flash", "PE", self.instruction).name, first.name)
+
+    def test_failed_handle_is_dropped_and_recreated(self):
+        first = self.cache.handle_for("gemini-2.5-flash", "PE", self.instruction)
+        self.backend.entries.clear()  # Evicted server-side.
+        self.cache.drop("gemini-2.5-flash", "PE")
+        second = self.cache.handle_for("gemini-2.5-flash", "PE", self.instruction)
+        self.assertNotEqual(second.name, first.name)
+        self.assertEqual(self.backend.calls["create"], 2)
+
+    def test_small_or_refused_prefixes_go_inline(self):
+        self.assertIsNone(self.cache.handle_for("gemini-2.5-flash", "TW", "You are the TW."))
+        self.assertIsNone(self.cache.handle_for("gemini-2.5-pro", "PE", self.instruction))
+        self.assertIsNone(self.cache.handle_for("gemini-2.0-flash", "PE", self.instruction))
+        self.assertEqual(self.backend.calls["create"], 0)
+        self.assertIsNone(mule_context_cache.ContextCache(None, project_files=[])
+                          .handle_for("gemini-2.5-flash", "PE", self.instruction))
+
+    def test_savings_are_measured_per_hop(self):
+        handle = self.cache.handle_for("gemini-2.5-flash", "PE", self.instruction)
+        self.cache.record("PE", "gemini-2.5-flash", None, _Usage(1400), 900.0)
+        self.cache.record("PE", "gemini-2.5-flash", handle, _Usage(1400, 1300), 600.0)
+        self.cache.record("ME", "gemini-2.5-flash", handle, _Usage(1400, 1300), 700.0)
+        summary = self.cache.summary()
+        self.assertEqual((summary["hops"], summary["cached_hops"], summary["tokens_saved"]), (3, 2, 2600))
+        self.assertEqual(summary["tokens_saved_per_hop"], 1300)
+        self.assertEqual(summary["latency_saved_ms_per_hop"], 250.0)
 
 if __name__ == '__main__':
     unittest.main()
-```
\ No newline at end of file